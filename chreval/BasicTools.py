@@ -8,6 +8,7 @@ Object:        None
 
 Functions:     copyPairList
                initialize_matrix
+               ncpu
                roundoff         
                sortPairListWRT_n
                tuple2PairList
@@ -27,6 +28,7 @@ are used.
 
 from copy import deepcopy
 import sys
+import os
 from math import sqrt
 
 
@@ -444,6 +446,16 @@ def invertDict(fwdDict):
     return invDict
 #
 
+
+def ncpu():
+    # number of processors this process may run on
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    #
+    
+    return os.cpu_count() or 1
+#
+
     
 
 def test0():
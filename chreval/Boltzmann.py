@@ -28,6 +28,10 @@ import string
 
 # main tool objects
 from Functions import KahanSumExp
+from Functions import LogSumExp
+from Functions import LogSumExpAcc
+from Functions import LogSumExpProb
+from Functions import LogSumExpShift
 
 
 # LThread object representation
@@ -94,8 +98,9 @@ class Boltzmann:
     def __init__(self, calc):
         self.debug_Boltzmann = False
         self.Z    = 1.0
+        self.logZ = 0.0
         self.explist = [] # to ensure that the exp doesn't over extend
-        self.shift   = 0  #
+        self.shift   = 0  # Z is reported as Z x 2^shift
         self.rewt    = 1.0
         self.kB   = kB
         self.calc = calc
@@ -133,19 +138,50 @@ class Boltzmann:
         
         The problem is that floats have a limit in size that can be
         easily exceeded. So we have first construct the exponents and
-        then analyze them through a subsidiary function KahanSumExp()
-        to add the exponentials together.
+        then add them up in log space with LogSumExp(); the
+        probabilities are then exp(-dG_k/kBT - log Z), so Z itself
+        is never formed. (Z, shift) are kept for reporting only.
         
         """
         
         # math.exp
-        self.explist = []
-        for ltk in lt:
-            self.explist += [ -ltk.dG / kBT ]
-        #
+        self.explist = [ -ltk.dG / kBT for ltk in lt ]
+        
+        self.logZ = LogSumExp(self.explist)
+        self.Z, self.shift = LogSumExpShift(self.logZ)
+        self.show_Z([ltk.dG for ltk in lt[:11]], T)
+    #
+    
+    def calc_Z_dG(self, dGlist, T):
+        """@
         
-        self.Z, self.shift = KahanSumExp(self.explist)
+        same as calc_Z(), but from the free energies alone (in the
+        order of the threads), so the threads themselves need not be
+        kept (see Trace.iter_traces_top). dGlist can be any iterable.
         
+        """
+        
+        kBT = self.kB * T
+        ksum = LogSumExpAcc()
+        self.explist = [] # only the first few, for show_Z()
+        first_dG = []
+        for dG in dGlist:
+            ksum.add(-dG / kBT)
+            if len(first_dG) <= 10:
+                self.explist += [ -dG / kBT ]
+                first_dG += [ dG ]
+            #
+            
+        #|endfor
+        
+        self.logZ = ksum.logsum()
+        self.Z, self.shift = LogSumExpShift(self.logZ)
+        self.show_Z(first_dG, T)
+    #
+    
+    def show_Z(self, dGlist, T):
+        # dGlist: the free energies of (at least) the first 11 threads
+        kBT = self.kB * T
         print ("\nBoltzmann distribution Q: %10.4g" % self.Z)
         print ("Kahan Summation shift:     %d\n" % self.shift)
         
@@ -170,7 +206,7 @@ class Boltzmann:
                 #
                 
                 print ("%2d  %8.2f   %8.2f  %12.2f    %8.3g" \
-                    % (k, self.explist[k], (-lt[k].dG/kBT), lt[k].dG, self.calc_p(lt[k], T)))
+                    % (k, self.explist[k], (-dGlist[k]/kBT), dGlist[k], self.calc_p_dG(dGlist[k], T)))
                 
             #|endfor
             
@@ -186,16 +222,7 @@ class Boltzmann:
         #
         
         for m in range(0, len(lt)):
-            lt[m].TdS = 0.0
-            for tr in lt[m].thread:
-                v = tr.ij_ndx
-                i = v[0]
-                j = v[1]
-                # print ("ij= ", i, j)
-                lt[m].TdS += self.fe.TdS(i,j,T)
-                
-            #|endfor
-            
+            self.set_TdS(lt[m], T)
         #|endfor
         
         if self.debug_Boltzmann:
@@ -212,6 +239,20 @@ class Boltzmann:
         return lt
     #
     
+    def set_TdS(self, ltk, T):
+        # entropy of one thread (see set_LThread_TdS)
+        ltk.TdS = 0.0
+        for tr in ltk.thread:
+            v = tr.ij_ndx
+            i = v[0]
+            j = v[1]
+            # print ("ij= ", i, j)
+            ltk.TdS += self.fe.TdS(i,j,T)
+            
+        #|endfor
+        
+    #
+    
     def set_LThread_p(self, lt, T):
         if not self.flag_set_Z:
             print ("ERROR(Boltzmann.calc_p()): Z is undefined")
@@ -220,39 +261,26 @@ class Boltzmann:
         
         # Note:
         # $p = exp( -dG_k / kBT ) / Z$ 
-        # $p = exp( -dG_k / kBT ) / \[ 1 + \sum_k {\exp(-dG_k / kBT)} \]$ 
+        # $p = exp( -dG_k / kBT - log Z )$ 
         
         kBT = self.kB * T
+        logZ = self.logZ
         
-        # math.exp
-        if self.shift > 0:
-            for k in range(0, len(lt)):
-                exponent = - (lt[k].dG / kBT)
-                if exponent - self.shift * log(2) < -708.396:
-                    lt[k].p = 0.0
-                else:
-                    lt[k].p = exp( exponent - float(self.shift)*log(2) ) / self.Z
-                #
-                
-            #|endfor
-            
-        else:
-            for k in range(0, len(lt)):
-                exponent = - (lt[k].dG / kBT)
-                if exponent - self.shift * log(2) < -708.396:
-                    lt[k].p = 0.0 # surely, this is neglectable
-                else:
-                    lt[k].p = exp( exponent ) / self.Z
-                #
-                
-            #|endfor
-            
-        #
+        # math.exp: the argument is <= 0 for any thread included in
+        # Z, so this cannot overflow, and it quietly goes to 0.0 for
+        # negligible weights.
+        for ltk in lt:
+            ltk.p = exp( -ltk.dG / kBT - logZ )
+        #|endfor
         
         return lt
     #
     
     def calc_p(self, ltk, T):
+        return self.calc_p_dG(ltk.dG, T)
+    #
+    
+    def calc_p_dG(self, dG, T):
         if not self.flag_set_Z:
             print ("ERROR(Boltzmann.calc_p()): Z is undefined")
             sys.exit(1)
@@ -260,26 +288,7 @@ class Boltzmann:
         
         kBT = self.kB * T
         # math.exp
-        if self.shift > 0:
-            # print ((float(self.shift)*log(2)))
-            exponent = - (ltk.dG / kBT)
-            if exponent - self.shift * log(2) < -708.396:
-                p = 0.0 # surely, this is neglectable
-            else:
-                p = exp( exponent - float(self.shift)*log(2) ) / self.Z
-            #
-            
-        else:
-            exponent = - (ltk.dG / kBT)
-            if exponent - self.shift * log(2) < -708.396:
-                p = 0.0 # surely, this is neglectable
-            else:
-                p = exp( exponent ) / self.Z
-            #
-            
-        #
-        
-        return p
+        return exp( -dG / kBT - self.logZ )
     #
 #
 
@@ -287,19 +296,19 @@ class Boltzmann:
 # make adjustments.
 
 def test5():
+    # compare the Kahan sum with the log-sum-exp on a list that
+    # overflows a double.
     global flag_KahanSumExp_USE_SORT
     flag_KahanSumExp_USE_SORT = True
     dG_vr_kBT = [10, 37, 34, 0.1, 0.0004, 34, 37.1, 37.2, 36.9, 709, 710, 711]
-    Z, shift = KahanSumExp(dG_vr_kBT)
-    print ("{0} x 2^{1}".format(Z, shift))
+    Z, shift = KahanSumExp(list(dG_vr_kBT))
+    print ("Kahan:         {0} x 2^{1}".format(Z, shift))
+    logZ, p = LogSumExpProb(dG_vr_kBT)
+    Z, shift = LogSumExpShift(logZ)
+    print ("log-sum-exp:   {0} x 2^{1}".format(Z, shift))
     wt = float(2**shift)
-    p = []
-    for k in range(0, len(dG_vr_kBT)):
-        p += [ exp( dG_vr_kBT[k] - float(shift)*log(2) ) / Z ]
-    summation = 0.0
-    for pk in p:
-        summation += pk
-        
+    summation = sum(p)
+    
     if shift > 1.0: # self.debug:
         print (Z)
         print ("shift: ", shift, "new exp wt: ", wt)
@@ -31,6 +31,8 @@ from math import exp
 import sys
 import os
 import string
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
 
 # main tool objects
 from GetOpts import GetOpts
@@ -51,12 +53,17 @@ from LoopRecords import MBLptr
 from LoopRecords import MBLHandle
 from LoopRecords import show_MBLHandle
 
+# the traceback of a single cell (trace_dG)
+from Trace   import Trace
+from LThread import LThread
+
 # Other objects and tools
 from FileTools   import getHeadExt
 from ChPair      import ChPairData
 from ChPair      import LThread2ChPair
 from Chromatin2SimRNA import SimRNARestraints #from SimRNATools import SimRNAData
 from BasicTools  import initialize_matrix
+from BasicTools  import ncpu
 
 
 # for Vienna object representation
@@ -112,6 +119,10 @@ DEBUG_find_best_PK      = False # True #
 # debugging find_ctcf_islands 
 DEBUG_find_ctcf_islands = False # True # 
 
+# use the batched split scan in searchForMBL (False -> the original
+# scalar scan, mainly for validation)
+USE_MBL_SPLIT_KERNEL    = True # False # 
+
 CHECK_ALL = False # True # 
 # if you want to debug all parts simultaneously, then set CHECK_ALL to True.
 def debug_all(fast_track):
@@ -168,6 +179,138 @@ def kickOn(i, i_set, j, j_set):
 #
 
 
+# ################################################################
+# ######  wavefront workers (used with -jobs N, see minFE)  #######
+# ################################################################
+# vvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvv
+
+"""@
+
+These are module level so that the worker processes of the pool can
+call them. The records of lookupBranches at each (p,q) (free energy,
+whether it is 'X', number of branches) are kept in shared memory
+arrays over the packed upper triangle
+
+   k(p,q) = rowptr[p] + (q - p)
+
+The master process writes the records after each stage (see
+Calculate.wf_stages()) is finished, and the workers only read them.
+
+"""
+
+wf_tables = {}
+
+def wf_init(recV, recX, recN, rowptr, mnHairPin, dG_lb, span):
+    wf_tables['V']  = recV
+    wf_tables['X']  = recX
+    wf_tables['n']  = recN
+    wf_tables['rowptr'] = rowptr
+    wf_tables['mnHairPin'] = mnHairPin
+    wf_tables['dG_lb'] = dG_lb
+    wf_tables['span'] = span
+#
+
+def wf_scan_cell(ij):
+    """@
+    
+    energy only version of Calculate.scanMBLsplits() for one cell
+    (i,j). Returns the list of splits (k, use1, use2) that improved
+    the best I-/J-loop (one branch) or M-/P-loop (several branches)
+    in the order in which they were found. The master rebuilds the
+    MBLptr objects from this list.
+    
+    """
+    i, j = ij
+    recV = wf_tables['V']; recX = wf_tables['X']; recN = wf_tables['n']
+    rowptr = wf_tables['rowptr']
+    mnHairPin = wf_tables['mnHairPin']; dG_lb = wf_tables['dG_lb']
+    
+    best_1 = INFINITY # one branch
+    best_m = INFINITY # more than one branch
+    splits = []
+    k1 = rowptr[i] - i # row i:    k = k1 + p
+    for k in range(max(1, j - i - 1 - wf_tables['span']), j - i - 1):
+        p = i+k; q = i+k+1
+        E1 = INFINITY; no_V1 = True; n1 = 0
+        if p - i > mnHairPin:
+            kp = k1 + p
+            E1 = recV[kp]; no_V1 = (recX[kp] == 1); n1 = recN[kp]
+        #
+        
+        E2 = INFINITY; no_V2 = True; n2 = 0
+        if j - q > mnHairPin:
+            kq = rowptr[q] + (j - q)
+            E2 = recV[kq]; no_V2 = (recX[kq] == 1); n2 = recN[kq]
+        #
+        
+        # see searchForMBL for the rules applied here
+        if (not no_V1) and (not no_V2):
+            if (E1 > 0) or (E2 > 0):
+                if (E1 <= E2):
+                    no_V2 = True
+                else:
+                    no_V1 = True
+                #
+            #
+        #
+        
+        if (not no_V1) and (not no_V2):
+            if E1 + E2 < dG_lb + 0.5:
+                if (E1 <= E2) and (E1 > dG_lb):
+                    no_V2 = True
+                elif (E2 < E1) and (E2 > dG_lb):
+                    no_V1 = True
+                else:
+                    no_V1 = True
+                    no_V2 = True
+                #
+            #
+            
+        elif (not no_V1) or (not no_V2):
+            if E1 <= E2:
+                if E1 < dG_lb + 0.5:
+                    no_V1 = True
+                #
+            else:
+                if E2 < dG_lb + 0.5:
+                    no_V2 = True
+                #
+            #
+        #
+        
+        if no_V1 and no_V2:
+            continue
+        #
+        
+        n = 0; V = 0.0
+        if not no_V1:
+            n += n1; V += E1
+        #
+        
+        if not no_V2:
+            n += n2; V += E2
+        #
+        
+        if n > 1:
+            if V < best_m and dG_lb < V:
+                best_m = V
+                splits += [(k, not no_V1, not no_V2)]
+            #
+        else:
+            if V < best_1 and dG_lb < V:
+                best_1 = V
+                splits += [(k, not no_V1, not no_V2)]
+            #
+        #
+    #|endfor
+    
+    return splits
+#
+
+# ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+# ################################################################
+
+
 # 3. tests
 TEST0 = False # True #
 TEST1 = True # False # 
@@ -211,6 +354,9 @@ class TestCalculate(object):
         # settings related to the PET clusters
         
         self.PETwt = 100.0  # PET wt scale
+        self.jobs  = 1      # number of processes used by minFE
+        self.topK      = 0   # traceback limits (0 = none)
+        self.dG_window = 0.0
         self.N = len(seqs[0])
         # print ("N = ", self.N)
     #
@@ -274,6 +420,30 @@ class Calculate(object):
         #
         
         
+        # memo of lookupBranches results at (p,q) used by scanMBLsplits
+        self.branch_memo = {}
+        
+        # number of processes used in minFE; jobs > 1 fills the DP
+        # tables in stages (see dp_cells())
+        self.jobs = min(cl.jobs, ncpu())
+        if cl.jobs > 1 and self.jobs < cl.jobs:
+            print ("-jobs %d: using %d process(es) (%d processors)" \
+                % (cl.jobs, self.jobs, ncpu()))
+        #
+        
+        # traceback limits (see Trace.rank_list_M): the topK structures
+        # (0 = all) within dG_window of the best one (0 = no limit)
+        self.topK      = cl.topK
+        self.dG_window = cl.dG_window
+        
+        self.wf_splits = {}   # split scans of the current stage
+        self.wf_klink  = {}   # K links at (i,j) with their source
+        
+        # free energy of the best structure of a cell as the traceback
+        # builds it (see trace_dG(), used by -island_max)
+        self.trace_W = None
+        self.zone_dG = {}
+        
         if flag_debug:
             print ("finished Calculate constructor")
         #
@@ -995,7 +1165,15 @@ class Calculate(object):
         # 190130: this should be removed, eventually
         # !!!AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
         
-        for k in range(1, j - i - 1):
+        kbeg = self.first_split(i, j)
+        kend = j - i - 1
+        if USE_MBL_SPLIT_KERNEL and \
+           not (DEBUG_searchForMBL or DEBUG_lookupBranches):
+            lmblh = self.scanMBLsplits(i, j, lmblh, mnHairPin, dG_lb, opt_iMBL)
+            kend = kbeg # all splits k are done, skip the scalar scan
+        #
+        
+        for k in range(kbeg, kend):
             # (int k = 1; k <= j - i - 2; k++) { } # (j - i - 2 + 1)
             no_V1 = False
             no_V2 = False
@@ -1630,6 +1808,508 @@ class Calculate(object):
     
     
     
+    def getBranchRecord(self, p, q):
+        """@
+        
+        Returns the result of lookupBranches at (p,q) as a record
+        [V, nm, dr, Q, lg0, nmtf], where lg0 and nmtf are the link and
+        the number of motifs at (p,q) when the record was made.
+        
+        lookupBranches only depends on what is stored at (p,q), so
+        the result is kept in self.branch_memo and only recomputed if
+        something new has been put on the stack at (p,q).
+        
+        """
+        
+        lg = self.fe.smap.glink[p][q].lg
+        lg0 = None; nmtf = 0
+        if len(lg) > 0:
+            lg0 = lg[0]; nmtf = len(lg0.motif)
+        #
+        
+        rec = self.branch_memo.get((p, q))
+        if not rec == None and rec[4] is lg0 and rec[5] == nmtf:
+            return rec
+        #
+        
+        mbl = self.lookupBranches(p, q, p, q, MBLptr(p, q))
+        rec = [mbl.V, mbl.nm, mbl.dr, mbl.Q, lg0, nmtf]
+        self.branch_memo[(p, q)] = rec
+        return rec
+    #
+    
+    
+    def scanMBLsplits(self, i, j, lmblh, mnHairPin, dG_lb, opt_iMBL):
+        """@
+        
+        Batched version of the split scan in searchForMBL: evaluates
+        all the splits
+        
+           {V(i,i+k), V(i+k+1,j)} for k = 1 ... j - i - 2
+        
+        For a fixed (i,j), the records along row i (sector 1) and
+        column j (sector 2) are collected in one pass and the
+        candidate free energies of all the splits are compared in one
+        tight loop. An MBLptr is only constructed for the splits that
+        actually improve the best result in lmblh, the rest are
+        discarded without building any objects.
+        
+        The selection rules (positive branches, dG_lb) are the same
+        as in searchForMBL, so the outcome is identical to the scalar
+        scan. This assumes that trim_53pStems() does not change the
+        free energy, which is presently the case for chromatin.
+        
+        """
+        
+        if (i, j) in self.wf_splits:
+            # the energies were already scanned by the worker pool
+            return self.replaySplits(i, j, lmblh, self.wf_splits.pop((i, j)), opt_iMBL)
+        #
+        
+        X_rec = [INFINITY, 'X', 's', [], None, 0] # p - i <= mnHairPin
+        
+        # sector 1: (i, i+k),  sector 2: (i+k+1, j)
+        row = []; col = []
+        for k in range(self.first_split(i, j), j - i - 1):
+            p = i+k; q = i+k+1
+            if p - i > mnHairPin:
+                row += [self.getBranchRecord(i, p)]
+            else:
+                row += [X_rec]
+            #
+            
+            if j - q > mnHairPin:
+                col += [self.getBranchRecord(q, j)]
+            else:
+                col += [X_rec]
+            #
+            
+        #|endfor
+        
+        mblh_IJ = lmblh[self.fe.dSearchK['IJ']]
+        mblh_MP = lmblh[self.fe.dSearchK['MP']]
+        
+        for kk in range(0, len(row)):
+            r1 = row[kk]; r2 = col[kk]
+            E1 = r1[0]; E2 = r2[0]
+            no_V1 = (r1[1] == 'X')
+            no_V2 = (r2[1] == 'X')
+            
+            # see searchForMBL for the rules applied here
+            if (not no_V1) and (not no_V2):
+                if (E1 > 0) or (E2 > 0):
+                    if (E1 <= E2):
+                        no_V2 = True
+                    else:
+                        no_V1 = True
+                    #
+                #
+            #
+            
+            if (not no_V1) and (not no_V2): # both are found
+                if E1 + E2 < dG_lb + 0.5:
+                    if (E1 <= E2) and (E1 > dG_lb):
+                        no_V2 = True
+                    elif (E2 < E1) and (E2 > dG_lb):
+                        no_V1 = True
+                    else:
+                        no_V1 = True
+                        no_V2 = True
+                    #
+                #
+                
+            elif (not no_V1) or (not no_V2):
+                if E1 <= E2:
+                    if E1 < dG_lb + 0.5:
+                        no_V1 = True
+                    #
+                else:
+                    if E2 < dG_lb + 0.5:
+                        no_V2 = True
+                    #
+                #
+            #
+            
+            if no_V1 and no_V2:
+                continue # nothing found over (i,j)
+            #
+            
+            n = 0; V = 0.0
+            if not no_V1:
+                n += len(r1[3]); V += E1
+            #
+            
+            if not no_V2:
+                n += len(r2[3]); V += E2
+            #
+            
+            if n == 0:
+                print ("ERROR searchForMBL(%d,%d): really shouldn't be here." % (i, j))
+                print ("      This operation is after the search claimed at least")
+                print ("      one branch to be present. So why would the number of")
+                print ("      branches now be %d? Something is seriously wrong." % (n))
+                sys.exit(1);
+            #
+            
+            # only splits that can enter lmblh are built
+            mblh = mblh_IJ
+            if n > 1:
+                mblh = mblh_MP
+            #
+            
+            if not (V < mblh.best_iMBL_dG and mblh.dG_lb < V):
+                continue
+            #
+            
+            new_MBL = MBLptr(i, j)
+            if not no_V1:
+                for br in r1[3]:
+                    new_MBL.pushBranch(br)
+                #
+            #
+            
+            if not no_V2:
+                for br in r2[3]:
+                    new_MBL.pushBranch(br)
+                #
+            #
+            
+            new_MBL.V = V
+            new_MBL.V = self.fe.trim_53pStems(i, j,      # 5' to 3' [i/p]MBL bounds 
+                                              new_MBL,   # mbl branch info
+                                              self.fe.smap, # the general mapping
+                                              opt_iMBL)  # iMBL or pMBL? B.Cs
+            if new_MBL.n > 1:
+                new_MBL.nm = 'P'
+                new_MBL.dr = '-'
+            else:
+                new_MBL.nm = 'J'
+                new_MBL.dr = '-'
+            #
+            
+            lmblh = self.check_MBLHandle(new_MBL, i, j, lmblh, False, False, "v1+v2")
+        #|endfor
+        
+        return lmblh
+    #
+    
+    
+    def replaySplits(self, i, j, lmblh, splits, opt_iMBL):
+        # builds the MBLptr for the splits (k, use1, use2) found by
+        # wf_scan_cell() and records them in lmblh
+        for k, use1, use2 in splits:
+            new_MBL = MBLptr(i, j)
+            V = 0.0
+            if use1:
+                r1 = self.getBranchRecord(i, i+k)
+                for br in r1[3]:
+                    new_MBL.pushBranch(br)
+                #
+                
+                V += r1[0]
+            #
+            
+            if use2:
+                r2 = self.getBranchRecord(i+k+1, j)
+                for br in r2[3]:
+                    new_MBL.pushBranch(br)
+                #
+                
+                V += r2[0]
+            #
+            
+            new_MBL.V = V
+            new_MBL.V = self.fe.trim_53pStems(i, j,      # 5' to 3' [i/p]MBL bounds 
+                                              new_MBL,   # mbl branch info
+                                              self.fe.smap, # the general mapping
+                                              opt_iMBL)  # iMBL or pMBL? B.Cs
+            if new_MBL.n > 1:
+                new_MBL.nm = 'P'
+                new_MBL.dr = '-'
+            else:
+                new_MBL.nm = 'J'
+                new_MBL.dr = '-'
+            #
+            
+            lmblh = self.check_MBLHandle(new_MBL, i, j, lmblh, False, False, "v1+v2")
+        #|endfor
+        
+        return lmblh
+    #
+    
+    
+    def set_empty(self, i, j):
+        """@
+        
+        Sparse contacts: the region (i,j) contains no contact (see
+        FreeEnergy.build_contact_index()), so the only result that
+        searchForMBL can return is the fake motif 'X' with the H-loop
+        free energy. This is set up directly without building the
+        MBLHandle list or scanning the splits. Returns False (nothing
+        done) if (i,j) already holds links (e.g., K links from the PK
+        search) or belongs to the CTCF sites, which need the full
+        treatment.
+        
+        """
+        
+        if len(self.fe.smap.glink[i][j].lg) > 0 or (i, j) in self.fe.all_ctcf:
+            return False
+        #
+        
+        V_X = self.fe.cle_HloopE(i, j, MBLptr(i, j))
+        link_X = Link(i, j, V_X, 'X', '-', [(i, j)])
+        self.fe.smap.glink[i][j].add_link(link_X)
+        self.fe.dG[i][j] = V_X
+        return True
+    #
+    
+    def first_split(self, i, j):
+        # banded mode: the splits k of (i,j) for which (i+k+1,j) lies
+        # in the band start here
+        return max(1, j - i - 1 - self.fe.max_span)
+    #
+    
+    def dp_cells(self):
+        """@
+        
+        Generates the order (i,j) in which minFE fills the tables.
+        
+        With jobs = 1 (default), this is the usual order: j = 1 to
+        N-1 and i = j-1 down to 0.
+        
+        In banded mode (-max_span W), only the cells with j - i <= W
+        and the exterior row (i = 0) are generated.
+        
+        With jobs > 1, the cells are filled in stages (wf_stages()).
+        All the cells of a stage are independent of each other, so
+        the split scans of searchForMBL for a stage are evaluated by a
+        pool of worker processes (wf_scan_cell) from the records kept
+        in shared memory. The rest of the work at each cell (stems,
+        caps, islands, PKs, sorting) is still done here in the master
+        process.
+        
+        The PK search looks ahead (-pkLead) and places K links at
+        (i_pk, j_pk) with j_pk > j. A cell that can receive such a
+        link is therefore only evaluated after all the cells that can
+        place one there, and its K links are put in the order the
+        usual scan would have placed them (wf_order_pk()). So the
+        result is the same as with jobs = 1.
+        
+        """
+        
+        N = self.N
+        W = self.fe.max_span # banded mode: only j - i <= W and i = 0
+        if self.jobs <= 1:
+            for j in range(1, N):
+                for i in range(j-1, max(0, j-W)-1, -1):
+                    yield i, j
+                #|endfor
+                
+                if j - W > 0:
+                    yield 0, j
+                #
+                
+            #|endfor
+            
+            return
+        #
+        
+        rowptr = RawArray('l', N+1)
+        for i in range(0, N):
+            rowptr[i+1] = rowptr[i] + (N - i)
+        #
+        
+        size = rowptr[N]
+        recV = RawArray('d', size)
+        recX = RawArray('b', size)
+        recN = RawArray('i', size)
+        
+        # fork where the platform has it, spawn otherwise
+        method = "spawn"
+        if "fork" in multiprocessing.get_all_start_methods():
+            method = "fork"
+        #
+        
+        ctx = multiprocessing.get_context(method)
+        pool = ctx.Pool(self.jobs, wf_init,
+                        (recV, recX, recN, rowptr, self.fe.minLoopLen, -1.0e6,
+                         self.fe.max_span))
+        
+        stages, stage_of = self.wf_stages()
+        self.fe.pk_added = []
+        self.wf_klink = {} # (i,j): [(serial position of the source, K link)]
+        try:
+            for s in range(0, len(stages)):
+                cells = stages[s]
+                
+                # small stages are not worth sending to the pool
+                scan = [(i, j) for i, j in cells if j - i > 2]
+                if len(scan) >= 2*self.jobs:
+                    chunk = max(1, len(scan)//(4*self.jobs))
+                    splits = pool.map(wf_scan_cell, scan, chunk)
+                    self.wf_splits = dict(zip(scan, splits))
+                #
+                
+                for i, j in cells:
+                    self.wf_order_pk(i, j)
+                    yield i, j
+                    
+                    # collect the K links placed from (i,j)
+                    for i_pk, j_pk, link_K in self.fe.pk_added:
+                        if not stage_of[(i_pk, j_pk)] > s:
+                            print ("ERROR: minFE(-jobs %d): K link at (%d,%d) from (%d,%d) arrived after the cell was evaluated" \
+                                % (self.jobs, i_pk, j_pk, i, j))
+                            sys.exit(1)
+                        #
+                        
+                        if not (i_pk, j_pk) in self.wf_klink:
+                            self.wf_klink[(i_pk, j_pk)] = []
+                        #
+                        
+                        self.wf_klink[(i_pk, j_pk)] += [((j, -i), link_K)]
+                    #|endfor
+                    
+                    self.fe.pk_added = []
+                #|endfor
+                
+                # records of the new stage for the next ones
+                for i, j in cells:
+                    self.wf_record(i, j, rowptr, recV, recX, recN)
+                #|endfor
+                
+            #|endfor
+            
+        finally:
+            pool.close()
+            pool.join()
+            self.wf_splits = {}
+            self.wf_klink  = {}
+            self.fe.pk_added = None
+        #
+        
+    #
+    
+    def trace_dG(self, i, j):
+        """@
+        
+        free energy of the best structure at (i,j) (lg[0]) as the
+        traceback builds it (Trace.get_traces()), which is what the
+        zones of a CTCF island add to the final structure (see
+        ChromatinModules.best_ctcf_subset). This is not V: the
+        traceback evaluates the islands inside again. The cells inside
+        an island are finished before the island, so the result is
+        kept.
+        
+        """
+        
+        if not (i,j) in self.zone_dG:
+            dG = 0.0
+            lg = self.fe.smap.glink[i][j].lg
+            if len(lg) > 0:
+                if self.trace_W == None:
+                    self.trace_W = Trace(self)
+                #
+                
+                tr = self.trace_W
+                tr.lt = [LThread(self.N, self.fe.molsys)]
+                tr.get_traces(i, j, lg[0].motif[0].get_ctp(), lg[0].Vij, 0, 0)
+                dG = tr.lt[0].compute_dG()
+                tr.lt = []
+            #
+            
+            self.zone_dG[(i,j)] = dG
+        #
+        
+        return self.zone_dG[(i,j)]
+    #
+    
+    def wf_stages(self):
+        """@
+        
+        Groups the cells of minFE into stages for jobs > 1. A cell
+        (i,j) comes after
+        
+           (i+1,j) and (i,j-1), and so all the cells inside (i,j)
+           that searchForMBL reads,
+        
+           (0,j-1) if a K link can land at (i,j) (row i passes
+           dGpk_threshold in column j, see pk_candidates()). The
+           sources of such a link are the cells (i',j') with i' < i
+           and j - pkLead <= j' < j, and (0,j-1) is the last of them.
+        
+        The stage of a cell is one more than the latest of these, so
+        the cells of one stage do not depend on each other. Returns
+        the list of stages (cells in the usual order) and the stage of
+        each cell.
+        
+        """
+        
+        N = self.N
+        W = self.fe.max_span
+        stage_of = {}
+        nstage = 0
+        for j in range(1, N):
+            pk_rows = set(self.fe.pk_candidates(j))
+            for i in range(j-1, max(0, j-W)-1, -1):
+                s = 0
+                if j - i > 1:
+                    s = max(stage_of[(i+1, j)], stage_of[(i, j-1)]) + 1
+                    if i in pk_rows:
+                        s = max(s, stage_of[(0, j-1)] + 1)
+                    #
+                    
+                #
+                
+                stage_of[(i, j)] = s
+            #|endfor
+            
+            if j - W > 0:
+                stage_of[(0, j)] = max(stage_of[(0, j-1)], stage_of[(j-W, j)]) + 1
+            #
+            
+            nstage = max(nstage, stage_of[(0, j)] + 1)
+        #|endfor
+        
+        stages = [[] for s in range(0, nstage)]
+        for j in range(1, N):
+            for i in range(j-1, max(0, j-W)-1, -1):
+                stages[stage_of[(i, j)]] += [(i, j)]
+            #|endfor
+            
+            if j - W > 0:
+                stages[stage_of[(0, j)]] += [(0, j)]
+            #
+            
+        #|endfor
+        
+        return stages, stage_of
+    #
+    
+    def wf_order_pk(self, i, j):
+        # before (i,j) is evaluated, it only holds K links; put them
+        # in the order add_link() would have given them in the usual
+        # order of the cells
+        if (i, j) in self.wf_klink:
+            lgij = self.fe.smap.glink[i][j]
+            klist = sorted(self.wf_klink[(i, j)], key = lambda x: x[0])
+            lgij.lg = []
+            for kl in klist:
+                lgij.add_link(kl[1])
+            #|endfor
+            
+        #
+        
+    #
+    
+    def wf_record(self, i, j, rowptr, recV, recX, recN):
+        # writes the lookupBranches record of (i,j) to shared memory
+        rec = self.getBranchRecord(i, j)
+        k = rowptr[i] + (j - i)
+        recV[k] = rec[0]
+        recX[k] = 1 if rec[1] == 'X' else 0
+        recN[k] = len(rec[3])
+    #
+    
     def show_lmblh(self, i, j, lmblh, callpt = "not specified"):
         for gid in range(0, len(lmblh)):
             
@@ -1711,382 +2391,386 @@ class Calculate(object):
         self.T = T
         
         self.fe.T = T
-        for j in range(1, self.N):
-            for i in range(j-1, -1, -1):
-                #DEBUG_find_best_PK   = kickOn(i, 9, j, 14)
-                #DEBUG_find_ifStem    = kickOn(i, 9, j, 14)
-                
-                #DEBUG_searchForMBL   = kickOn(i, 45, j, 65)
-                #DEBUG_lookupBranches = kickOn(i, 45, j, 65)
-                
-                # build search weighting handle
-                lmblh = []
-                ndx = 0
-                for pp in self.fe.dSearchK.keys():
-                    if DEBUG_minFE:
-                        print ("building assigning %d, %s" % (self.fe.dSearchK[pp], pp))
-                    #
-                    mblh = MBLHandle(ndx, i, j, -1.0e6) # tester
-                    # 90103: Unfortunately, we have to pass this
-                    # shit (fe and smap) for various reasons that
-                    # are unavoidable. The object smap probably
-                    # can be defind as None if no debugging is
-                    # required.
-                    
-                    lmblh += [mblh]
-                    ndx += 1
-                # 
-                
-                lmblh = self.searchForMBL(i, j,     # search region
-                                          lmblh,    # MBLHandle()
-                                          opt_iMBL) # opt_iMBL (True -> iMBL)
-                # to get branchlist as (i1,j1), (i2,j2) etc. ==>  mbl.getBranchlist()
-                
-                # 190101: I see now that I probably can store the
-                # degenerate solutions even right here! Therefore,
-                # I don't really need glink. What is important is
-                # having a consistent way to construct the data.
-                link_X = None
-                for gid in range(0, len(lmblh)):
-                    if len(lmblh[gid].mbls) == 0:
-                        continue
-                    #
-                    
-                    flag_link_initialized = False
-                    for kv in range(0, len(lmblh[gid].mbls)):
-                        if not flag_link_initialized:
-                            # first on is always the case
-                            ctp_X  = lmblh[gid].mbls[kv].nm
-                            btp_X  = lmblh[gid].mbls[kv].dr
-                            cp_X   = lmblh[gid].mbls[kv].getBranchlist()
-                            V_X    = lmblh[gid].mbls[kv].V
-                            if (ctp_X == 'I' or ctp_X == 'M') and btp_X == '-':
-                                print ("1, found btp_X = %s for I-loop" % btp_X)
-                                sys.exit(0)
-                            #
-                            
-                            link_X = Link(i, j,
-                                          V_X,
-                                          ctp_X,
-                                          btp_X,
-                                          cp_X)
-                            flag_link_initialized = True
-                            
-                        else:
-                            # if there are structures of a degenerate FE
-                            V_X   = lmblh[gid].mbls[kv].V
-                            cp_X  = lmblh[gid].mbls[kv].getBranchlist()
-                            ctp_X = lmblh[gid].mbls[kv].nm
-                            btp_X = lmblh[gid].mbls[kv].dr
-                            if (ctp_X == 'I' or ctp_X == 'M') and btp_X == '-':
-                                print ("2, found btp_X = %s for I-loop" % btp_X)
-                                sys.exit(0)
-                            #
-                            
-                            link_X.add_Motif(i, j, V_X, ctp_X, btp_X, cp_X)
-                            self.fe.save_best_iloops(link_X)
-                            
+        self.branch_memo = {}
+        for i, j in self.dp_cells():
+            if self.fe.ctc_reach[i] > j and self.set_empty(i, j):
+                # no contact anywhere in (i,j)
+                continue
+            #
+            
+            #DEBUG_find_best_PK   = kickOn(i, 9, j, 14)
+            #DEBUG_find_ifStem    = kickOn(i, 9, j, 14)
+            
+            #DEBUG_searchForMBL   = kickOn(i, 45, j, 65)
+            #DEBUG_lookupBranches = kickOn(i, 45, j, 65)
+            
+            # build search weighting handle
+            lmblh = []
+            ndx = 0
+            for pp in self.fe.dSearchK.keys():
+                if DEBUG_minFE:
+                    print ("building assigning %d, %s" % (self.fe.dSearchK[pp], pp))
+                #
+                mblh = MBLHandle(ndx, i, j, -1.0e6) # tester
+                # 90103: Unfortunately, we have to pass this
+                # shit (fe and smap) for various reasons that
+                # are unavoidable. The object smap probably
+                # can be defind as None if no debugging is
+                # required.
+                
+                lmblh += [mblh]
+                ndx += 1
+            # 
+            
+            lmblh = self.searchForMBL(i, j,     # search region
+                                      lmblh,    # MBLHandle()
+                                      opt_iMBL) # opt_iMBL (True -> iMBL)
+            # to get branchlist as (i1,j1), (i2,j2) etc. ==>  mbl.getBranchlist()
+            
+            # 190101: I see now that I probably can store the
+            # degenerate solutions even right here! Therefore,
+            # I don't really need glink. What is important is
+            # having a consistent way to construct the data.
+            link_X = None
+            for gid in range(0, len(lmblh)):
+                if len(lmblh[gid].mbls) == 0:
+                    continue
+                #
+                
+                flag_link_initialized = False
+                for kv in range(0, len(lmblh[gid].mbls)):
+                    if not flag_link_initialized:
+                        # first on is always the case
+                        ctp_X  = lmblh[gid].mbls[kv].nm
+                        btp_X  = lmblh[gid].mbls[kv].dr
+                        cp_X   = lmblh[gid].mbls[kv].getBranchlist()
+                        V_X    = lmblh[gid].mbls[kv].V
+                        if (ctp_X == 'I' or ctp_X == 'M') and btp_X == '-':
+                            print ("1, found btp_X = %s for I-loop" % btp_X)
+                            sys.exit(0)
                         #
                         
-                        if DEBUG_minFE:
-                            print ("assigned %s(%s): (%2d,%2d)[%8.2f]" \
-                                % (ctp_X, btp_X, i, j, V_X), cp_X)
-                        #endif
+                        link_X = Link(i, j,
+                                      V_X,
+                                      ctp_X,
+                                      btp_X,
+                                      cp_X)
+                        flag_link_initialized = True
                         
-                    #|endfor kv
+                    else:
+                        # if there are structures of a degenerate FE
+                        V_X   = lmblh[gid].mbls[kv].V
+                        cp_X  = lmblh[gid].mbls[kv].getBranchlist()
+                        ctp_X = lmblh[gid].mbls[kv].nm
+                        btp_X = lmblh[gid].mbls[kv].dr
+                        if (ctp_X == 'I' or ctp_X == 'M') and btp_X == '-':
+                            print ("2, found btp_X = %s for I-loop" % btp_X)
+                            sys.exit(0)
+                        #
+                        
+                        link_X.add_Motif(i, j, V_X, ctp_X, btp_X, cp_X)
+                        self.fe.save_best_iloops(link_X)
+                        
+                    #
                     
-                    self.fe.smap.glink[i][j].add_link(link_X)
+                    if DEBUG_minFE:
+                        print ("assigned %s(%s): (%2d,%2d)[%8.2f]" \
+                            % (ctp_X, btp_X, i, j, V_X), cp_X)
+                    #endif
                     
-                #|endfor gid
+                #|endfor kv
                 
-                self.fe.smap.mergeSortLinks(self.fe.smap.glink[i][j].lg)
+                self.fe.smap.glink[i][j].add_link(link_X)
                 
+            #|endfor gid
+            
+            self.fe.smap.sort_links(i, j)
+            
+            
+            if self.fe.btype[i][j].pair > 0: # if hvij > 0.0:
+                link_Q = None
+                flag_link_initialized = False
+                bondtype = self.fe.btype[i][j].btp
+                # was: self.get_bondtype(self.fe.btype[i][j].wt)
+                # self.fe.hv[i][j] -> self.fe.btype[i][j].wt
+                # 190524 was dGij = self.fe.calc_dG(i, j, self.fe.btype[i][j].wt, T)
+                dGij = self.fe.btype[i][j].dGp
+                # self.fe.hv[i][j] -> self.fe.btype[i][j].wt
                 
-                if self.fe.btype[i][j].pair > 0: # if hvij > 0.0:
-                    link_Q = None
-                    flag_link_initialized = False
-                    bondtype = self.fe.btype[i][j].btp
-                    # was: self.get_bondtype(self.fe.btype[i][j].wt)
-                    # self.fe.hv[i][j] -> self.fe.btype[i][j].wt
-                    # 190524 was dGij = self.fe.calc_dG(i, j, self.fe.btype[i][j].wt, T)
-                    dGij = self.fe.btype[i][j].dGp
-                    # self.fe.hv[i][j] -> self.fe.btype[i][j].wt
-                    
-                    if DEBUG_minFE:
-                        # print (self.fe.btype[i][j].wt)
-                        # print (self.fe.hv[i][j])
-                        print ("assigned B: (%2d,%2d)[%8.3f]" % (i, j, dGij), [(i,j)])
-                        # sys.exit(0)
-                    #
-                    
-                    # ######  since 'B' _exists_, must be recorded  ######
-                    
-                    if bondtype == 's' or bondtype == 'sa' or bondtype == 'sp': 
-                        if dGij < self.fe.dGMI_threshold:
-                            has_cap, ctpB, btpB, dGB, jnB \
-                                = self.fe.lookupCap(i, j, dGij, DEBUG_minFE)
-                            if has_cap:
-                                if DEBUG_minFE:
-                                    print ("Q: btpB = ", btpB, ", B:", has_cap)
-                                #
-                                
-                                link_X = Link(i, j, dGB, ctpB, btpB, jnB)
-                                self.fe.smap.glink[i][j].add_link(link_X)
-                                if len(jnB) == 1:
-                                    self.fe.save_best_iloops(link_X)
-                                #
-                                
+                if DEBUG_minFE:
+                    # print (self.fe.btype[i][j].wt)
+                    # print (self.fe.hv[i][j])
+                    print ("assigned B: (%2d,%2d)[%8.3f]" % (i, j, dGij), [(i,j)])
+                    # sys.exit(0)
+                #
+                
+                # ######  since 'B' _exists_, must be recorded  ######
+                
+                if bondtype == 's' or bondtype == 'sa' or bondtype == 'sp': 
+                    if dGij < self.fe.dGMI_threshold:
+                        has_cap, ctpB, btpB, dGB, jnB \
+                            = self.fe.lookupCap(i, j, dGij, DEBUG_minFE)
+                        if has_cap:
+                            if DEBUG_minFE:
+                                print ("Q: btpB = ", btpB, ", B:", has_cap)
+                            #
+                            
+                            link_X = Link(i, j, dGB, ctpB, btpB, jnB)
+                            self.fe.smap.glink[i][j].add_link(link_X)
+                            if len(jnB) == 1:
+                                self.fe.save_best_iloops(link_X)
                             #
                             
                         #
                         
-                        link_Q = Link(i, j, dGij, 'B', bondtype, [(i,j)])
-                        self.fe.smap.glink[i][j].add_link(link_Q)
-                        self.fe.save_best_iloops(link_Q)
-                        if DEBUG_minFE:
-                            self.show_smap_xy(i,j)
-                        #
-                        
-                        flag_link_initialized = True
-                        
-                    elif (bondtype == 'c' or
-                          bondtype == 't' or
-                          bondtype == 'r' or
-                          bondtype == 'l'):
-                        link_Q = Link(i, j, dGij, 'W', bondtype, [(i,j)])
-                        self.fe.smap.glink[i][j].add_link(link_Q)
-                        self.fe.save_best_iloops(link_Q)
-                        flag_link_initialized = True
-                        
-                    else:
-                        link_Q = Link(i, j, dGij, 'X', '-', [(i,j)])
-                        self.fe.smap.glink[i][j].add_link(link_Q)
-                        self.fe.save_best_iloops(link_Q)
-                        print ("called X in H loop ij=(%d,%d)" % (i,j))
-                        sys.exit(0)
-                        
                     #
                     
-                    flag_link_initialized = True
-                    
-                    stem_aa, stem_pp = self.fe.find_ifStem(i, j, dGij, bondtype,
-                                                           DEBUG_find_ifStem)
-                    # print (stem_aa, len(stem_aa), stem_pp, len(stem_pp))
-                    if len(stem_aa) > 0:
-                        self.fe.make_StemMotif(stem_aa, DEBUG_make_StemMotif)
-                        # !!!XXX
-                    #
-                    
-                    if len(stem_pp) > 0:
-                        self.fe.make_StemMotif(stem_pp, DEBUG_make_StemMotif)
+                    link_Q = Link(i, j, dGij, 'B', bondtype, [(i,j)])
+                    self.fe.smap.glink[i][j].add_link(link_Q)
+                    self.fe.save_best_iloops(link_Q)
+                    if DEBUG_minFE:
+                        self.show_smap_xy(i,j)
                     #
                     
-                    # /home/yuriv/cent/loops_CCDs/paper_examples_try161012/190514/test1.heat
-                    #self.fe.stopWhenMatchFound(i, j, 3, 6, "after find_ifStem")
+                    flag_link_initialized = True
                     
-                    # testB-1Sp.heat
-                    # self.fe.stopWhenMatchFound(i, j, 2, 13, "after find_ifStem")
+                elif (bondtype == 'c' or
+                      bondtype == 't' or
+                      bondtype == 'r' or
+                      bondtype == 'l'):
+                    link_Q = Link(i, j, dGij, 'W', bondtype, [(i,j)])
+                    self.fe.smap.glink[i][j].add_link(link_Q)
+                    self.fe.save_best_iloops(link_Q)
+                    flag_link_initialized = True
                     
-                    # chr1_10751707_10970928_res5kb.heat
-                    #self.fe.stopWhenMatchFound(i, j, 25, 41, "after find_ifStem")
-                    #self.fe.stopWhenMatchFound(i, j, 36, 41, "after find_ifStem")
-                    #self.fe.stopWhenMatchFound(i, j, 35, 42, "after find_ifStem")
-                    #self.fe.stopWhenMatchFound(i, j, 0, 35, "after find_ifStem")
+                else:
+                    link_Q = Link(i, j, dGij, 'X', '-', [(i,j)])
+                    self.fe.smap.glink[i][j].add_link(link_Q)
+                    self.fe.save_best_iloops(link_Q)
+                    print ("called X in H loop ij=(%d,%d)" % (i,j))
+                    sys.exit(0)
                     
+                #
+                
+                flag_link_initialized = True
+                
+                stem_aa, stem_pp = self.fe.find_ifStem(i, j, dGij, bondtype,
+                                                       DEBUG_find_ifStem)
+                # print (stem_aa, len(stem_aa), stem_pp, len(stem_pp))
+                if len(stem_aa) > 0:
+                    self.fe.make_StemMotif(stem_aa, DEBUG_make_StemMotif)
+                    # !!!XXX
+                #
+                
+                if len(stem_pp) > 0:
+                    self.fe.make_StemMotif(stem_pp, DEBUG_make_StemMotif)
+                #
+                
+                # /home/yuriv/cent/loops_CCDs/paper_examples_try161012/190514/test1.heat
+                #self.fe.stopWhenMatchFound(i, j, 3, 6, "after find_ifStem")
+                
+                # testB-1Sp.heat
+                # self.fe.stopWhenMatchFound(i, j, 2, 13, "after find_ifStem")
+                
+                # chr1_10751707_10970928_res5kb.heat
+                #self.fe.stopWhenMatchFound(i, j, 25, 41, "after find_ifStem")
+                #self.fe.stopWhenMatchFound(i, j, 36, 41, "after find_ifStem")
+                #self.fe.stopWhenMatchFound(i, j, 35, 42, "after find_ifStem")
+                #self.fe.stopWhenMatchFound(i, j, 0, 35, "after find_ifStem")
+                
+                
+                if (i,j) in self.fe.all_ctcf:
+                    dGbest = link_Q.Vij
+                    # if it doesn't have the key, then forget it!
+                    island = self.fe.find_ctcf_islands(i, j, dGbest,
+                                                       DEBUG_find_ctcf_islands,
+                                                       self.trace_dG)
                     
-                    if (i,j) in self.fe.all_ctcf:
-                        dGbest = self.fe.smap.glink[i][j].lg[0].Vij
-                        # if it doesn't have the key, then forget it!
-                        island = self.fe.find_ctcf_islands(i, j, dGbest,
-                                                           DEBUG_find_ctcf_islands)
+                    # print (dGbest, island)
+                    if len(island) > 0:
                         
-                        # print (dGbest, island)
-                        if len(island) > 0:
-                            
-                            # if there's nothing there, then don't bother with it!
-                            for ff in island:
-                                wyspa = ff[0]; join = ff[1]; dGW = ff[2] 
-                                link_W = Link(i, j, dGW, 'W', 'wyspa', join, [], wyspa)
-                                self.fe.smap.glink[i][j].add_link(link_W)
-                            #|endfor
-                            
-                            # self.traceback_mFE(i,j, 0, True)
-                            
-                        #
+                        # if there's nothing there, then don't bother with it!
+                        for ff in island:
+                            wyspa = ff[0]; join = ff[1]; dGW = ff[2] 
+                            link_W = Link(i, j, dGW, 'W', 'wyspa', join, [], wyspa)
+                            self.fe.smap.glink[i][j].add_link(link_W)
+                        #|endfor
+                        
+                        # self.traceback_mFE(i,j, 0, True)
                         
-                        #self.fe.stopWhenMatchFound(i, j, 0, 32, "in find_ctcf_islands")
-                        #print ("island: planned exit")
-                        #sys.exit(0)
                     #
                     
-                    #self.fe.stopWhenMatchFound(i, j, 1, 14, "after find_ctcf_islands")
+                    #self.fe.stopWhenMatchFound(i, j, 0, 32, "in find_ctcf_islands")
+                    #print ("island: planned exit")
+                    #sys.exit(0)
                 #
                 
-                # To do the pseudoknot part, we have to sort the current data
-                self.fe.smap.mergeSortLinks(self.fe.smap.glink[i][j].lg)
+                #self.fe.stopWhenMatchFound(i, j, 1, 14, "after find_ctcf_islands")
+            #
+            
+            # To do the pseudoknot part, we have to sort the current data
+            self.fe.smap.sort_links(i, j)
+            
+            # pseudoknot and CTCF-island solutions
+            ctp = self.fe.smap.glink[i][j].lg[0].motif[0].get_ctp()
+            
+            check_PK = False
+            if ctp in dconnection:
+                """@
                 
-                # pseudoknot and CTCF-island solutions
-                ctp = self.fe.smap.glink[i][j].lg[0].motif[0].get_ctp()
+                Have to decide if we will check for PKs or not.
+                Originally, the test was
                 
-                check_PK = False
-                if ctp in dconnection:
-                    """@
-                    
-                    Have to decide if we will check for PKs or not.
-                    Originally, the test was
-                    
-                    if self.fe.btype[i][j].pair > 0:
-                    
-                    and before that, it was 
+                if self.fe.btype[i][j].pair > 0:
+                
+                and before that, it was 
+                
+                if hvij > 0.0:
+                
+                so it always has had some problems.
+                """
+                check_PK = True 
+                if ctp == 'M' or ctp == 'I':
+                    dGijH = self.fe.btype[i][j].dGp
                     
-                    if hvij > 0.0:
+                    """190524 was
                     
-                    so it always has had some problems.
+                    dGijH = self.fe.calc_dG(i, j,
+                                            self.fe.btype[i][j].wt,
+                                            T) 
                     """
-                    check_PK = True 
-                    if ctp == 'M' or ctp == 'I':
-                        dGijH = self.fe.btype[i][j].dGp
-                        
-                        """190524 was
-                        
-                        dGijH = self.fe.calc_dG(i, j,
-                                                self.fe.btype[i][j].wt,
-                                                T) 
-                        """
-                        
-                        if dGijH >= 0.0:
-                            # the basic structure at ij should at
-                            # least have a favorable FE at the
-                            # closing position to make a PK a
-                            # feasible possibility
-                            if DEBUG_find_best_PK:
-                                print (dGijH)
-                                print ("check for PK: skipping (%d,%d)[%s]" % (i, j, ctp))
-                                #self.fe.stopWhenMatchFound(i, j, i, j, "test_PK")
-                                # sys.exit(0)
-                            #
-                            
-                            check_PK = False
-                            
+                    
+                    if dGijH >= 0.0:
+                        # the basic structure at ij should at
+                        # least have a favorable FE at the
+                        # closing position to make a PK a
+                        # feasible possibility
+                        if DEBUG_find_best_PK:
+                            print (dGijH)
+                            print ("check for PK: skipping (%d,%d)[%s]" % (i, j, ctp))
+                            #self.fe.stopWhenMatchFound(i, j, i, j, "test_PK")
+                            # sys.exit(0)
                         #
                         
-                    #
-                    
-                    if check_PK:
-                        #print ("call searchForPKs(%d,%d):" % (i, j))
-                        self.fe.searchForPKs(i, j, DEBUG_find_best_PK)
                         check_PK = False
+                        
                     #
                     
                 #
                 
-                # for longer sequences, we also simply check each time
-                # we go through this cyle at i = 0.
-                if i == 0 and j-i > 15:
-                    if DEBUG_find_best_PK:
-                        print ("searching the full span for PK")
-                    #
-                    
+                if check_PK:
+                    #print ("call searchForPKs(%d,%d):" % (i, j))
                     self.fe.searchForPKs(i, j, DEBUG_find_best_PK)
+                    check_PK = False
                 #
                 
-                # /home/yuriv/cent/loops_CCDs/paper_examples_try161012/190514/test1.heat
-                # self.fe.stopWhenMatchFound(i, j, 3, 6, "after searchForPKs")
-                # self.fe.stopWhenMatchFound(i, j, 3, 7, "after searchForPKs")
-                # /home/yuriv/cent/loops_CCDs/paper_examples_try161012/190514/check3.heat
-                # self.fe.stopWhenMatchFound(i, j, 3, 8, "after searchForPKs")
-                
-                
-                
-                self.fe.smap.mergeSortLinks(self.fe.smap.glink[i][j].lg)
-                self.fe.dG[i][j] = self.fe.smap.glink[i][j].lg[0].motif[0].Vij # !!!!!
-                
-                # corePKwithbranch.heat
-                #self.fe.stopWhenMatchFound(i, j,   0,  46, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  11,  52, "finishing minFE loop at pos ij")
-                
-                # chr10_3894786_4781825_res5kb.heat
-                #self.fe.stopWhenMatchFound(i, j,   0,   5, "finishing minFE loop at pos ij")
-                # result: S, sa, -1.32 (0,5) .. (2,3)
-                #self.fe.stopWhenMatchFound(i, j,   0,   6, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,   0,   7, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,   0,   8, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,   4,   9, "finishing minFE loop at pos ij")
-                
-                #self.fe.stopWhenMatchFound(i, j,   2,   7, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,   2,   8, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,   2,   9, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,   0,   9, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,   6,  16, "finishing minFE loop at pos ij")
-                
-                #self.fe.stopWhenMatchFound(i, j,  30,  36, "finishing minFE loop at pos ij")
-                #self.show_smap_xy(38,41)
-                #self.fe.stopWhenMatchFound(i, j,  37,  42, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  38,  41, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  37,  43, "finishing minFE loop at pos ij")
-                # result: S, sa, -2.11 (6,16) ... (10,12)
-                
-                #self.fe.stopWhenMatchFound(i, j,  52,  59, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  51,  59, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  50,  59, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  46,  60, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  51,  61, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  48,  62, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  47,  62, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  52,  63, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  45,  64, "finishing minFE loop at pos ij")
-                
-                #self.fe.stopWhenMatchFound(i, j,  45,  65, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  10,  99, "finishing minFE loop at pos ij")
-                
-                #self.fe.stopWhenMatchFound(i, j, 125, 132, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 125, 134, "finishing minFE loop at pos ij")
-                
-                
-                # chr1_10751707_10970928_res5kb.heat
-                #self.fe.stopWhenMatchFound(i, j, 0, 8, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j,  0, 42, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 27, 42, "finishing minFE loop at pos ij")
-                
-                # chr10_106061350_106114340_res5kb.heat
-                #self.fe.stopWhenMatchFound(i, j, 2,  8, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 1,  9, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 0, 10, "finishing minFE loop at pos ij")
-                
-                
-                # testP-3B.heat
-                #self.fe.stopWhenMatchFound(i, j, 2, 35, "finishing minFE loop at pos ij")
-                
-                
-                # testB-1S.heat
-                #self.fe.stopWhenMatchFound(i, j, 4, 13, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 3, 14, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 2, 15, "finishing minFE loop at pos ij")
-                
-                # testI-2S.heat
-                #self.fe.stopWhenMatchFound(i, j, 5, 24, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 4, 25, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 3, 26, "finishing minFE loop at pos ij")
-                
-                # test1.heat
-                #self.fe.stopWhenMatchFound(i, j, 3, 11, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 1, 14, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 1, 19, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 0, 24, "finishing minFE loop at pos ij")
-                # test4.heat
-                #self.fe.stopWhenMatchFound(i, j, 5, 25, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 3, 28, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 2, 29, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 1, 30, "finishing minFE loop at pos ij")
-                #self.fe.stopWhenMatchFound(i, j, 0, 32, "finishing minFE loop at pos ij")
-
-                # chr10_1462921_1758490_res5kb.heat
-                #self.fe.stopWhenMatchFound(i, j, 9, 15, "finishing minFE loop at pos ij")
-                
+            #
+            
+            # for longer sequences, we also simply check each time
+            # we go through this cyle at i = 0.
+            if i == 0 and j-i > 15:
+                if DEBUG_find_best_PK:
+                    print ("searching the full span for PK")
+                #
                 
-            #|endfor i in range(j-1, -1, -1):
+                self.fe.searchForPKs(i, j, DEBUG_find_best_PK)
+            #
             
-        #|endfor j in range(1, self.N):
+            # /home/yuriv/cent/loops_CCDs/paper_examples_try161012/190514/test1.heat
+            # self.fe.stopWhenMatchFound(i, j, 3, 6, "after searchForPKs")
+            # self.fe.stopWhenMatchFound(i, j, 3, 7, "after searchForPKs")
+            # /home/yuriv/cent/loops_CCDs/paper_examples_try161012/190514/check3.heat
+            # self.fe.stopWhenMatchFound(i, j, 3, 8, "after searchForPKs")
+            
+            
+            
+            self.fe.smap.sort_links(i, j)
+            self.fe.dG[i][j] = self.fe.smap.glink[i][j].lg[0].motif[0].Vij # !!!!!
+            
+            # corePKwithbranch.heat
+            #self.fe.stopWhenMatchFound(i, j,   0,  46, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  11,  52, "finishing minFE loop at pos ij")
+            
+            # chr10_3894786_4781825_res5kb.heat
+            #self.fe.stopWhenMatchFound(i, j,   0,   5, "finishing minFE loop at pos ij")
+            # result: S, sa, -1.32 (0,5) .. (2,3)
+            #self.fe.stopWhenMatchFound(i, j,   0,   6, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,   0,   7, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,   0,   8, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,   4,   9, "finishing minFE loop at pos ij")
+            
+            #self.fe.stopWhenMatchFound(i, j,   2,   7, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,   2,   8, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,   2,   9, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,   0,   9, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,   6,  16, "finishing minFE loop at pos ij")
+            
+            #self.fe.stopWhenMatchFound(i, j,  30,  36, "finishing minFE loop at pos ij")
+            #self.show_smap_xy(38,41)
+            #self.fe.stopWhenMatchFound(i, j,  37,  42, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  38,  41, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  37,  43, "finishing minFE loop at pos ij")
+            # result: S, sa, -2.11 (6,16) ... (10,12)
+            
+            #self.fe.stopWhenMatchFound(i, j,  52,  59, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  51,  59, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  50,  59, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  46,  60, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  51,  61, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  48,  62, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  47,  62, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  52,  63, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  45,  64, "finishing minFE loop at pos ij")
+            
+            #self.fe.stopWhenMatchFound(i, j,  45,  65, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  10,  99, "finishing minFE loop at pos ij")
+            
+            #self.fe.stopWhenMatchFound(i, j, 125, 132, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 125, 134, "finishing minFE loop at pos ij")
+            
+            
+            # chr1_10751707_10970928_res5kb.heat
+            #self.fe.stopWhenMatchFound(i, j, 0, 8, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j,  0, 42, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 27, 42, "finishing minFE loop at pos ij")
+            
+            # chr10_106061350_106114340_res5kb.heat
+            #self.fe.stopWhenMatchFound(i, j, 2,  8, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 1,  9, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 0, 10, "finishing minFE loop at pos ij")
+            
+            
+            # testP-3B.heat
+            #self.fe.stopWhenMatchFound(i, j, 2, 35, "finishing minFE loop at pos ij")
+            
+            
+            # testB-1S.heat
+            #self.fe.stopWhenMatchFound(i, j, 4, 13, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 3, 14, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 2, 15, "finishing minFE loop at pos ij")
+            
+            # testI-2S.heat
+            #self.fe.stopWhenMatchFound(i, j, 5, 24, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 4, 25, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 3, 26, "finishing minFE loop at pos ij")
+            
+            # test1.heat
+            #self.fe.stopWhenMatchFound(i, j, 3, 11, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 1, 14, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 1, 19, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 0, 24, "finishing minFE loop at pos ij")
+            # test4.heat
+            #self.fe.stopWhenMatchFound(i, j, 5, 25, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 3, 28, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 2, 29, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 1, 30, "finishing minFE loop at pos ij")
+            #self.fe.stopWhenMatchFound(i, j, 0, 32, "finishing minFE loop at pos ij")
+
+            # chr10_1462921_1758490_res5kb.heat
+            #self.fe.stopWhenMatchFound(i, j, 9, 15, "finishing minFE loop at pos ij")
+            
+            
+        #|endfor i, j in self.dp_cells()
         
         if DEBUG_minFE:
             print ("finished minFE")
@@ -38,6 +38,7 @@ seg_len = 5000.0  # [bps] segment length (bead-to-bead distance)
 # constants: in entropy evaluation
 xi       = 5.0    # # [bp] default stem Kuhn length
 xi_fs    = 5.0    # [nt] free strand Kuhn length (basically useless)
+xi_max   = 150.0  # [bp] maximum stem Kuhn length (see Xi_L.Xi_stem)
 lmbd     = 0.002  # ratio "bond distance"/"segment length": 10 bp/5000 bp
 """@
 
@@ -39,6 +39,8 @@ from math import exp
 import sys
 import os
 import string
+from bisect import bisect_left
+from bisect import bisect_right
 
 # main tool objects
 from GetOpts import GetOpts
@@ -46,6 +48,7 @@ from GetOpts import GetOpts
 # Free energy parameters
 from EffectiveStem import EffectiveStem
 from FreeEnergy    import FreeEnergy
+from FreeEnergy    import PairDef
 from HeatMapTools  import HeatMapTools
 
 # Motif object representation
@@ -479,8 +482,23 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
             
         #
         
-        # build map layout
-        self.smap       = Map(self.N)
+        # K links placed by searchForPKs (only collected when Calculate
+        # fills the tables in stages, -jobs)
+        self.pk_added = None
+        
+        # rows passing dGpk_threshold by column (see pk_candidates())
+        self.pk_cand = {}
+        
+        # maximum span of the DP (banded mode, -max_span)
+        self.max_span   = self.set_max_span(cl.max_span)
+        
+        # build map layout (at most max_links links at each (i,j))
+        self.smap       = Map(self.N, cl.max_links)
+        
+        # CTCF islands with at most this many anchors are solved
+        # exactly (see best_ctcf_subset())
+        self.island_max = cl.island_max
+        
         # build map layout
         # print ("(3) N = ", self.N)
         
@@ -563,6 +581,72 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
     #
     
     
+    def set_max_span(self, max_span):
+        """@
+        
+        Banded mode: returns the maximum span W = j - i used in the
+        DP. With "full", W = N - 1 (everything). With "auto", W is the
+        widest nonzero contact in hv, so no contact is lost. With an
+        integer W, the contacts wider than W are removed from btype
+        and all_ctcf, so that minFE and the PK search never use them.
+        
+        In Calculate, only the band j - i <= W and the exterior row
+        (i = 0) are evaluated.
+        
+        """
+        
+        W = self.N - 1
+        if max_span == "full":
+            return W
+        
+        elif max_span == "auto":
+            W = 1
+            for i in range(0, self.N):
+                # the last contact of row i is the widest one
+                if self.ctc_ptr[i+1] > self.ctc_ptr[i]:
+                    W = max(W, self.ctc_j[self.ctc_ptr[i+1] - 1] - i)
+                #
+                
+            #|endfor
+            
+        else:
+            W = int(max_span)
+        #
+        
+        if W >= self.N - 1:
+            return self.N - 1
+        #
+        
+        for i in range(0, self.N):
+            for j in range(i + W + 1, self.N):
+                if self.btype[i][j].pair > 0:
+                    dGij = self.calc_dG(i, j, 0.0, self.T)
+                    self.btype[i][j] = PairDef(0, '-', 'X', dGij)
+                    self.btype[j][i] = PairDef(0, '-', 'X', dGij)
+                #
+                
+            #|endfor
+            
+        #|endfor
+        
+        for ij in list(self.all_ctcf.keys()):
+            if ij[1] - ij[0] > W:
+                del self.all_ctcf[ij]
+            #
+            
+        #|endfor
+        
+        self.build_contact_index()
+        self.build_stem_index()
+        print ("banded DP: maximum span %d (N = %d)" % (W, self.N))
+        return W
+    #
+    
+    def in_band(self, i, j):
+        # True if (i,j) is evaluated in minFE (see set_max_span())
+        return i == 0 or j - i <= self.max_span
+    #
+    
     def save_best_iloops(self, link):
         """@
         
@@ -2160,8 +2244,6 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
         
         
         # search for an antiparallel connection
-        flag_pairs_aa = True
-        k = 1
         
         if DEBUG_find_ifStem:
             wt_aa = self.hv[i][j] # self.hv[iaa][jaa]
@@ -2169,14 +2251,20 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
                    % (i, j, self.btype[i][j].dGp, wt_aa))
         #
         
-        while flag_pairs_aa:
-            # i+k -?- j-k 
-            #  ..........
-            # i+2 -?- j-2
-            # i+1 -?- j-1
-            #   i --- j
-            
-            
+        # i+k -?- j-k 
+        #  ..........
+        # i+2 -?- j-2
+        # i+1 -?- j-1
+        #   i --- j
+        
+        # The stem extends while dGp < 0 (the run in stem_aa) and the
+        # loop stays longer than minLoopLen ((j-k)-(i+k) > 1 +
+        # minLoopLen); both are prefixes in k, so the extent is the
+        # smaller of the two.
+        kaa = min(self.stem_aa.get((i+1, j-1), 0),
+                  max(0, (j - i - 2 - self.minLoopLen)//2))
+        
+        for k in range(1, kaa + 1):
             iaa = i + k; jaa = j - k
             dGijaa = self.btype[iaa][jaa].dGp # self.hv[iaa][jaa]
             
@@ -2186,24 +2274,21 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
                        % (iaa, jaa, self.btype[iaa][jaa].dGp, wt_aa))
             #
             
-            if dGijaa < 0.0 and (jaa - iaa) > (1 + self.minLoopLen):
-                btpx = self.btype[iaa][jaa].btp 
-                if btpx == 's':
-                    btpx = 'sa'
-                else:
-                    # have to enforce this, even if the prediction is
-                    # 't' from get_bondtype()!
-                    btpx = 'c'
-                #
-                
-                pairs_aa += [((iaa, jaa), dGijaa, btpx)]
-                if DEBUG_find_ifStem:
-                    print ("ijaa: ", iaa, jaa)
-                k += 1
+            btpx = self.btype[iaa][jaa].btp 
+            if btpx == 's':
+                btpx = 'sa'
             else:
-                flag_pairs_aa = False
+                # have to enforce this, even if the prediction is
+                # 't' from get_bondtype()!
+                btpx = 'c'
             #
-        #
+            
+            pairs_aa += [((iaa, jaa), dGijaa, btpx)]
+            if DEBUG_find_ifStem:
+                print ("ijaa: ", iaa, jaa)
+            #
+            
+        #|endfor
         
         if len(pairs_aa) > 0:
             btpx = btp
@@ -2354,43 +2439,39 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
             
         # !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
         # search for an parallel connection
-        flag_pairs_pp = True
-        k = 1
         i_t = i;     j_t = j
         if DEBUG_find_ifStem:
             print ("ijpp: (%2d,%2d)" % (i, j))
         #
         
-        while flag_pairs_pp:
-            # we only search backwards with this because we go over
-            # old solutions.
+        if self.stem_pp == None:
+            self.build_stem_index_pp()
+        #
+        
+        # we only search backwards with this because we go over old
+        # solutions.
+        kpp = self.stem_pp.get((i+1, j+1), 0)
+        for k in range(1, kpp + 1):
             ipp = i   + k; jpp = j   + k
-            if jpp == self.N:
-                flag_pairs_pp = False
-                break
-            #
             dGp_pp = self.btype[ipp][jpp].dGp # self.hv[ipp][jpp]
-            if dGp_pp > 0.0 and (jpp < self.N):
-                btpx = self.btype[ipp][jpp].btp # was self.get_bondtype(dGp_pp)
-                if btpx == 's':
-                    btpx = 'sp'
-                else:
-                    # have to enforce this, even if the prediction is
-                    # 'c' from get_bondtype()!
-                    btpx = 't'
-                #
-                dGijpp  = dGp_pp
-                # 190524 was self.calc_dG(ipp, jpp, dGp_pp, self.T, "find_ifStem 2")
-                pairs_pp += [((ipp, jpp), dGijpp, btpx)]
-                if DEBUG_find_ifStem:
-                    print ("ijpp: (%2d,%2d)" % (ipp, jpp))
-                #
-                k += 1
+            btpx = self.btype[ipp][jpp].btp # was self.get_bondtype(dGp_pp)
+            if btpx == 's':
+                btpx = 'sp'
             else:
-                flag_pairs_pp = False
+                # have to enforce this, even if the prediction is
+                # 'c' from get_bondtype()!
+                btpx = 't'
             #
-        #
+            dGijpp  = dGp_pp
+            # 190524 was self.calc_dG(ipp, jpp, dGp_pp, self.T, "find_ifStem 2")
+            pairs_pp += [((ipp, jpp), dGijpp, btpx)]
+            if DEBUG_find_ifStem:
+                print ("ijpp: (%2d,%2d)" % (ipp, jpp))
+            #
+            
+        #|endfor
         
+        k = kpp + 1
         stmlenpp = k 
         
         if len(pairs_pp) > 0:
@@ -2631,6 +2712,10 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
         for k in range(0, len(ijzlist)):
             irt = ijrtlist[k][0]; jrt = ijrtlist[k][1]
             iz  = ijzlist[k][0];  jz  = ijzlist[k][1]
+            if not self.in_band(iz, jz):
+                # banded mode: (iz,jz) was never evaluated
+                continue
+            #
             
             pkaa, pkpp = self.find_best_PK(k, ijzlist, ijrtlist, \
                                            edgebase, debug_searchForPKs)
@@ -2644,7 +2729,13 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
                     domains += [(ijrtlist[kd][0], ijrtlist[kd][1])]
                 #
                 link_K = Link(i_pk, j_pk, dGpk, 'K', 'sa', domains, pkaa[2])
-                self.smap.glink[i_pk][j_pk].add_link(link_K)
+                if self.in_band(i_pk, j_pk):
+                    self.smap.glink[i_pk][j_pk].add_link(link_K)
+                    if not self.pk_added == None:
+                        self.pk_added += [(i_pk, j_pk, link_K)]
+                    #
+                    
+                #
                 
                 if debug_searchForPKs:
                     L = self.scan_ahead
@@ -2670,7 +2761,13 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
                     domains += [(ijrtlist[kd][0], ijrtlist[kd][1])]
                 #
                 link_K = Link(i_pk, j_pk, dGpk, 'K', 'sp', domains, pkpp[2])
-                self.smap.glink[i_pk][j_pk].add_link(link_K)
+                if self.in_band(i_pk, j_pk):
+                    self.smap.glink[i_pk][j_pk].add_link(link_K)
+                    if not self.pk_added == None:
+                        self.pk_added += [(i_pk, j_pk, link_K)]
+                    #
+                    
+                #
                 
                 if debug_searchForPKs:
                     L = self.scan_ahead
@@ -2729,6 +2826,26 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
         return is_inside
     #
     
+    def pk_candidates(self, jp):
+        """@
+        
+        sorted list of the rows i < jp where btype[i][jp].dGp <
+        dGpk_threshold; only these rows can anchor a PK link at column
+        jp in find_best_PK(). A column is built the first time the hot
+        lead reaches it and then reused by every later window, so the
+        index grows along with j instead of being rescanned.
+        
+        """
+        cand = self.pk_cand.get(jp)
+        if cand == None:
+            thr = self.dGpk_threshold
+            cand = [i for i in range(0, jp) if self.btype[i][jp].dGp < thr]
+            self.pk_cand[jp] = cand
+        #
+        
+        return cand
+    #
+    
     def find_best_PK(self, k, ijzlist, ijrtlist, edgebase, debug = False):
         irt = ijrtlist[k][0]; jrt = ijrtlist[k][1] # scan window for PK
         iz  = ijzlist[k][0];  jz  = ijzlist[k][1]  # region between irt and edgebase
@@ -2743,6 +2860,27 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
             L = self.N - edgebase - 1
         #
         
+        # rows irt < ip < jrt that pass dGpk_threshold in each column
+        # of the hot lead (see pk_candidates())
+        cands = []
+        for jp in range(edgebase+L, edgebase, -1):
+            cand = self.pk_candidates(jp)
+            lo = bisect_right(cand, irt); hi = bisect_left(cand, jrt)
+            if lo < hi:
+                cands += [(jp, cand[lo:hi])]
+            #
+            
+        #|endfor
+        
+        if len(cands) == 0:
+            # nothing in the hot lead can beat dGpk_threshold, so the
+            # window cannot hold a PK; skip the traceback as well.
+            if flag_debug_PK:
+                print ("Exiting find_best_PK(%d,%d): no candidates" % (irt, jrt))
+            #
+            return [], []
+        #
+        
         branches = None
         dGmin = self.traceback_mFE(iz, jz, 0, flag_debug_PK)
         if self.smap.glink[iz][jz].lg[0].motif[0].get_ctp() == 'W':
@@ -2791,7 +2929,7 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
         
         
         # first, scan to find the best attachment point
-        for jp in range(edgebase+L, edgebase, -1):
+        for jp, cand in cands:
             if flag_debug_PK:
                 print ("jp = %2d" % jp)
             #
@@ -2809,12 +2947,9 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
             best_daa = ()
             best_dpp = ()
             
-            # find best PK along iaa for given jp
-            for ip in range(irt+1, jrt):
-                iaa = ip
-                ipp = jrt - iaa + irt
-                # print ("ijpp = (%3d,%3d), ijaa = (%3d,%3d)" % (ipp, jp, iaa, jp))
-                
+            # find best PK along iaa for given jp (only the rows in
+            # cand can pass the threshold test below)
+            for iaa in cand:
                 """
                 
                 #############################
@@ -2878,7 +3013,11 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
                         #
                     #
                 #
-                
+            #|endfor
+            
+            # the parallel scan visits ipp = jrt - ip + irt for
+            # ascending ip, i.e., the same rows in descending order
+            for ipp in reversed(cand):
                 # #############################
                 # now the parallel case:
                 # #############################
@@ -2930,7 +3069,12 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
                         #
                     #
                 #
-            #
+            #|endfor
+            
+            # as in the full row scan, the tests below compare against
+            # the last row of the scan
+            iaa = jrt - 1
+            ipp = irt + 1
             
             # anti-parallel result
             if best_ddGaa < 0.0:
@@ -3323,7 +3467,121 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
         return V 
     #
     
-    def find_ctcf_islands(self, i, j, best_dG, DEBUG_find_ctcf_islands = False):
+    def best_ctcf_subset(self, i, j, anchors, trace_dG):
+        """@
+        
+        Finds the subset of the CTCF anchors of the island (i,j) (the
+        contacts (i,p) or (p,j) inside (i,j)) that gives the island
+        the lowest free energy.
+        
+        The free energy is the one the traceback gives the island
+        (Trace.make_Islandtrace): the dGp of every contact of the
+        island plus the structure built in each zone between two kept
+        anchor positions, trace_dG(ih+1, jh-1) (Calculate.trace_dG).
+        
+        There are 2^n subsets, but this free energy adds up zone by
+        zone: for the anchor positions i < p1 < ... < pm < j that are
+        kept, each zone (p_k, p_k+1) contributes the structure inside
+        it (plus its own dGp if the zone is itself a CTCF contact) and
+        each kept position contributes the dGp of its anchors. So the
+        best island that ends at position p only needs the best one
+        ending at each earlier position q, which is memoized in
+        best[q]; any subset that passes through q on a worse energy is
+        cut there. The search is exact and takes O(m^2) zone
+        evaluations for m anchor positions.
+        
+        At a kept position, all the anchors with dGp < 0 bind (or the
+        least unfavorable one when none do). Keeping every position
+        is one of the subsets searched, so the island is never worse
+        than the one with all the anchors.
+        
+        """
+        
+        # the anchors grouped by their position inside (i,j)
+        at = {}
+        for h in anchors:
+            if h[0] == i:
+                p = h[1]
+            else:
+                p = h[0]
+            #
+            
+            if not p in at:
+                at[p] = []
+            #
+            
+            at[p] += [h]
+        #|endfor
+        
+        pos = sorted(at.keys())
+        
+        keep = {} # anchors kept at p
+        dGk  = {} # their free energy
+        for p in pos:
+            keep[p] = [h for h in at[p] if self.btype[h[0]][h[1]].dGp < 0.0]
+            if len(keep[p]) == 0:
+                keep[p] = [min(at[p], key = lambda h: self.btype[h[0]][h[1]].dGp)]
+            #
+            
+            dGk[p] = 0.0
+            for h in keep[p]:
+                dGk[p] += self.btype[h[0]][h[1]].dGp
+            #
+            
+        #|endfor
+        
+        # free energy of the zone between two kept positions (the
+        # contact (ih,jh) and the joint (ih+1,jh-1) that
+        # find_ctcf_islands() adds to the island)
+        def dGzone(ih, jh):
+            dG = 0.0
+            if (ih,jh) in self.all_ctcf and i < ih and jh < j:
+                dG += self.btype[ih][jh].dGp
+            #
+            
+            if (jh - ih) > 2:
+                dG += trace_dG(ih+1, jh-1)
+            #
+            
+            return dG
+        #
+        
+        # best[p] = (dG of the best island from i up to p, previous p)
+        best = {i : (0.0, i)}
+        for k in range(0, len(pos)):
+            p = pos[k]
+            for q in [i] + pos[:k]:
+                dG = best[q][0] + dGzone(q, p) + dGk[p]
+                # on a tie, keep more anchors
+                if not p in best or dG <= best[p][0]:
+                    best[p] = (dG, q)
+                #
+                
+            #|endfor
+            
+        #|endfor
+        
+        # close the island at j
+        dGend = INFINITY; q = pos[-1]
+        for p in pos:
+            dG = best[p][0] + dGzone(p, j)
+            if dG <= dGend:
+                dGend = dG; q = p
+            #
+            
+        #|endfor
+        
+        subset = []
+        while not q == i:
+            subset = keep[q] + subset
+            q = best[q][1]
+        #
+        
+        return subset
+    #
+    
+    def find_ctcf_islands(self, i, j, best_dG, DEBUG_find_ctcf_islands = False,
+                          trace_dG = None):
         
         if DEBUG_find_ctcf_islands:
             print ("find_ctcf_islands(%d,%d), best_dG = %8.2f" % (i,j, best_dG))
@@ -3366,6 +3624,15 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
         
         """
         
+        """@
+        
+        When a domain has at most island_max anchors (-island_max) and
+        trace_dG (Calculate.trace_dG) is given, the anchors that bind
+        are no longer assumed to be all of them; best_ctcf_subset()
+        picks the subset with the lowest free energy in the traceback.
+        
+        """
+        
         keylist = self.all_ctcf.keys()
         if DEBUG_find_ctcf_islands:
             print ("keylist: ", keylist)
@@ -3438,6 +3705,24 @@ class BranchEntropy(FreeEnergy, HeatMapTools, EffectiveStem):
             return islands
         #
         
+        if len(wyspa) <= self.island_max and not trace_dG == None:
+            wyspa = self.best_ctcf_subset(i, j, wyspa, trace_dG)
+            vrlps = []
+            for h in wyspa:
+                if h[0] == i:
+                    vrlps += [h[1]]
+                else:
+                    vrlps += [h[0]]
+                #
+                
+            #|endfor
+            
+            if DEBUG_find_ctcf_islands:
+                print ("best subset: ", wyspa)
+            #
+            
+        #
+        
         wyspa += [(i,j)]
         
         
@@ -69,11 +69,26 @@ import os
 # #####  configuration variables  #####
 # #####################################
 # vvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvv
-EXTS = ["clust","heat", "eheat", "cpif", "csv"] # extension for the input file
+EXTS = ["clust","heat", "eheat", "bheat", "cpif", "csv"] # extension for the input file
 PROGRAM = "Cluster.py" # name of the program
 # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
 
+# nodes of a thread that are not contacts of their own: the linkage
+# information (P, J) and the beginning and end markers of the K, W and
+# S motifs.
+SKIP_CTP = ('P', 'J')
+MARK_CTP = ('K', 'W', 'S')
+MARK_BTP = ('bgn', 'end')
+
+def thread_contacts(ltk):
+    # the contacts (i,j) of thread ltk counted in clusters and cpif
+    return [tr.ij_ndx for tr in ltk.thread
+            if not (tr.ctp in SKIP_CTP
+                    or (tr.btp in MARK_BTP and tr.ctp in MARK_CTP))]
+#
+
+
 class Cluster:
     def __init__(self, calc):
         self.calc = calc
@@ -86,54 +101,64 @@ class Cluster:
         self.debug = False
     #
     
-    def clusterlist(self, ltlist):
-        
+    """@
+    
+    the *_BDwt.clust map in steps, for when the threads are not kept
+    in a list (Trace.iter_traces_top): start_clusters(), then
+    add_cluster() for each thread (after its Boltzmann probability is
+    set) and finish_clusters() at the end.
+    
+    """
+    def start_clusters(self):
         htools = HeatMapTools()
-        wt = htools.normalize_matrix(self.calc.fe.dG, "neg")
-        if self.debug:
-            print (len(ltlist))
-        #
+        self.cl_wt = htools.normalize_matrix(self.calc.fe.dG, "neg")
+    #
+    
+    def add_cluster(self, ltk):
+        wt = self.cl_wt
+        clusters = self.clusters
+        pBoltz = ltk.p
+        for i, j in thread_contacts(ltk):
+            x = 1.0*pBoltz*wt[i][j]
+            clusters[i][j] += x #  ij
+            clusters[j][i] += x #  ji
+        #|endfor
         
-        ij_min = 100000.0
-        for ltk in ltlist:
-            pBoltz = ltk.p
-            for tr in ltk.thread:
-                
-                # ignore linking information
-                ctp = tr.ctp
-                btp = tr.btp
-                if tr.ctp == 'P' or tr.ctp == 'J':
-                    # print ("found a P at ", tr.ij_ndx)
-                    continue
-                #
-                
-                if ctp == 'K' and (btp == 'bgn' or btp == 'end'):
-                    continue
-                #
-                
-                if ctp == 'W' and (btp == 'bgn' or btp == 'end'):
-                    continue
-                #
-                
-                if ctp == 'S' and (btp == 'bgn' or btp == 'end'):
+    #
+    
+    def clusterpf(self, P):
+        """@
+
+        the *_BDwt.clust map from the contact probabilities P of the whole
+        ensemble (PartitionFunction.calc_PF) rather than from the
+        enumerated threads: the weight of (i,j) is P[i][j] in place of
+        the sum of the Boltzmann probabilities of the threads that
+        contain (i,j).
+
+        """
+
+        self.start_clusters()
+        wt = self.cl_wt
+        for i in range(0, self.N):
+            for j in range(i+1, self.N):
+                if P[i][j] == 0.0:
                     continue
                 #
-                
-                
-                
-                v = tr.ij_ndx
-                i = v[0]; j = v[1]
-                # print (v)
-                self.clusters[i][j] += 1.0*pBoltz*wt[i][j] #  ij
-                self.clusters[j][i] += 1.0*pBoltz*wt[i][j] #  ji
-                if self.clusters[i][j] < ij_min:
-                    ij_min = self.clusters[i][j]
-                #
-                
-            #|endfor tr in ltk.thread:
-            
-        #|endfor tr in ltk.thread:
-        
+
+                self.clusters[i][j] += P[i][j]*wt[i][j] #  ij
+                self.clusters[j][i] += P[i][j]*wt[i][j] #  ji
+            #|endfor
+
+        #|endfor
+
+        self.finish_clusters()
+    #
+
+    def finish_clusters(self):
+        # only a negative entry matters here, and the entries that
+        # were never touched are 0.0, so the minimum of the whole
+        # matrix serves as well as tracking it entry by entry.
+        ij_min = min([min(row) for row in self.clusters] + [0.0])
         if ij_min < 0.0:
             shift = - ij_min
             print ("encountered positive entropy values")
@@ -149,6 +174,32 @@ class Cluster:
         #
     #
     
+    def ensemblelist(self, ltlist):
+        """@
+        
+        the *_BDwt.clust map (add_cluster) and cpiflist() together,
+        in one pass over the contacts of the threads.
+        
+        """
+        
+        self.start_clusters()
+        wt   = self.cl_wt
+        clusters = self.clusters
+        cpif = self.cpif
+        for ltk in ltlist:
+            pBoltz = ltk.p
+            for i, j in thread_contacts(ltk):
+                x = 1.0*pBoltz*wt[i][j]
+                clusters[i][j] += x   #  ij
+                clusters[j][i] += x   #  ji
+                cpif[i][j]     += 1.0 #  ij
+                cpif[j][i]     += 1.0 #  ji
+            #|endfor
+            
+        #|endfor
+        
+        self.finish_clusters()
+    #
     
     def cpiflist(self, ltlist):
         debug_cpiflist = False
@@ -168,56 +219,7 @@ class Cluster:
                 disthr.disp_LThread(ltk)
             #
             
-            for tr in ltk.thread:
-                # ignore linking information
-                ctp = tr.ctp
-                btp = tr.btp
-                if ctp == 'P' or ctp == 'J':
-                    # print ("found a P for ", tr.ij_ndx)
-                    continue
-                #
-                
-                if ctp == 'K' and (btp == 'bgn' or btp == 'end'):
-                    if debug_cpiflist:
-                        # verify that data is handled correctly
-                        print (kk, tr.disp_lnode())
-                    #
-                    
-                    continue
-                
-                elif ctp == 'K':
-                    if debug_cpiflist:
-                        # verify that data is handled correctly
-                        print (kk, tr.disp_lnode())
-                    #
-                    
-                #
-                
-                if ctp == 'W' and (btp == 'bgn' or btp == 'end'):
-                    if debug_cpiflist:
-                        # verify that data is handled correctly
-                        print (kk, tr.disp_lnode())
-                    #
-                    
-                    continue
-                
-                elif ctp == 'W':
-                    if debug_cpiflist:
-                        # verify that data is handled correctly
-                        print (kk, tr.disp_lnode())
-                    #
-                #
-                
-                if ctp == 'S' and (btp == 'bgn' or btp == 'end'):
-                    continue
-                #
-                
-                v = tr.ij_ndx
-                i = v[0]; j = v[1]
-                # print (v)
-                self.cpif[i][j] += 1.0 #  ij
-                self.cpif[j][i] += 1.0 #  ji
-            #|endfor tr in ltk.thread:
+            self.add_cpif(ltk, kk, debug_cpiflist)
             
             if debug_cpiflist:
                 print ("planned exit")
@@ -229,6 +231,27 @@ class Cluster:
         return 0
         
     #
+    
+    def add_cpif(self, ltk, kk = 0, debug_cpiflist = False):
+        # cpiflist() for one thread (kk: structure count, debugging)
+        if debug_cpiflist:
+            # verify that the K and W data is handled correctly
+            for tr in ltk.thread:
+                if tr.ctp == 'K' or tr.ctp == 'W':
+                    print (kk, tr.disp_lnode())
+                #
+                
+            #|endfor
+            
+        #
+        
+        cpif = self.cpif
+        for i, j in thread_contacts(ltk):
+            cpif[i][j] += 1.0 #  ij
+            cpif[j][i] += 1.0 #  ji
+        #|endfor
+        
+    #
 
 #
 
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+"""@@@
+
+Main Module:   Ensemble.py
+
+Objects:       Ensemble
+
+Author:        Wayne Dawson
+creation date: 2026
+last update:   2026
+version:       0
+
+
+Purpose:
+
+Holds the whole ensemble of structures (threads, class LThread) from
+the traceback as a set of columns rather than as one LThread object
+with a list of LNode objects per structure.
+
+   per contact (node):   sid (structure), i, j, ctp, btp, dGij
+   per structure:        offset (first node), dG, p, TdS
+
+The ctp and btp strings are stored as codes into two small tables
+(ctps, btps). In this form, an ensemble of 10^5 structures takes a
+few MB rather than a few hundred, it is written to a file in one
+write (*.bens, see below) and a thread is only built again as an
+LThread (get_thread, iter_threads) when it is actually used, e.g.,
+to write its DBN, heat, chpair and simres files.
+
+The file also keeps the dot bracket string of each structure (add_dbn,
+as text in one column with its own offset table), which is the only
+part of the per structure output that needs the full calculation. So
+the file serves as an archive of all the structures (chreval -archive):
+extract_structures.py writes the DBN, heat, chpair and simres files of
+any of them from it. The heatmap of a structure is just its contacts
+(i, j), and read() maps the file rather than reading it, so only the
+part of the file that belongs to the structures extracted is touched.
+
+"""
+
+import sys
+import json
+import struct
+import mmap
+from array import array
+
+from LThread import LThread
+from LThread import LNode
+
+
+# Binary ensemble container (*.bens)
+#
+#   bytes 0-7    BENS_MAGIC
+#   bytes 8-11   H, length of the header (uint32, little endian)
+#   bytes 12-    header: JSON with the metadata (version, title,
+#                length N, nstruct, nnode, the ctp and btp tables and
+#                the list of columns [name, typecode, count]), padded with
+#                blanks so that the data start on an 8 byte boundary
+#   12 + H -     the columns in the order of the header, little
+#                endian, each one padded to an 8 byte boundary
+#
+# So a column can also be opened directly, e.g.,
+#
+#   np.memmap(flnm, dtype='<f8', mode='r', offset=..., shape=(nstruct,))
+
+BENS_MAGIC   = b"CHRBENSM"
+BENS_VERSION = "0.0"
+
+# name and typecode of the columns, in the order they are written
+NODE_COLUMNS   = [("sid", 'i'), ("i", 'i'), ("j", 'i'),
+                  ("ctp", 'B'), ("btp", 'B'), ("dGij", 'd')]
+STRUCT_COLUMNS = [("offset", 'q'), ("dG", 'd'), ("p", 'd'), ("TdS", 'd')]
+# dot bracket strings (utf-8) and the offset of each one in "dbn"
+TEXT_COLUMNS   = [("dbn_offset", 'q'), ("dbn", 'B')]
+ALL_COLUMNS    = NODE_COLUMNS + STRUCT_COLUMNS + TEXT_COLUMNS
+
+def is_ensemble_file(flnm):
+    try:
+        with open(flnm, 'rb') as fp:
+            return fp.read(len(BENS_MAGIC)) == BENS_MAGIC
+        #
+    except IOError:
+        return False
+    #
+#
+
+
+class Ensemble(object):
+    def __init__(self, N = 0, title = ''):
+        self.N = N # size of the heatmap
+        self.title = title # file header of the heatmap
+        # tables of the ctp and btp strings (code = position)
+        self.ctps = []
+        self.btps = []
+        self.ctp_code = {}
+        self.btp_code = {}
+        self.cols = {}
+        for name, tc in ALL_COLUMNS:
+            self.cols[name] = array(tc)
+        #|endfor
+
+        self.cols["offset"].append(0)
+        self.cols["dbn_offset"].append(0)
+        self.mm = None # the mapped file (read)
+    #
+
+    def __len__(self):
+        return len(self.cols["dG"])
+    #
+
+    def nnodes(self):
+        return self.cols["offset"][-1]
+    #
+
+    def get_code(self, v, table, code):
+        if not v in code:
+            if len(table) == 255:
+                print ("ERROR(Ensemble): too many distinct ctp/btp values")
+                sys.exit(1)
+            #
+
+            code[v] = len(table)
+            table += [v]
+        #
+
+        return code[v]
+    #
+
+    def add_thread(self, ltk):
+        # ltk: class LThread with dG, p and TdS set
+        cols = self.cols
+        sid = len(self)
+        for tr in ltk.thread:
+            cols["sid"].append(sid)
+            cols["i"].append(tr.ij_ndx[0])
+            cols["j"].append(tr.ij_ndx[1])
+            cols["ctp"].append(self.get_code(tr.ctp, self.ctps, self.ctp_code))
+            cols["btp"].append(self.get_code(tr.btp, self.btps, self.btp_code))
+            cols["dGij"].append(tr.dGij_B)
+        #|endfor
+
+        cols["offset"].append(len(cols["sid"]))
+        cols["dG"].append(ltk.dG)
+        cols["p"].append(ltk.p)
+        cols["TdS"].append(ltk.TdS)
+    #
+
+    def get_thread(self, k, molsys):
+        """@
+
+        builds structure k (0, 1, ...) again as an LThread (with
+        molsys, class MolSystem, which is the same for the whole
+        ensemble and therefore not stored).
+
+        """
+
+        cols = self.cols
+        ci = cols["i"]; cj = cols["j"]; cc = cols["ctp"]; cb = cols["btp"]
+        cg = cols["dGij"]
+        ctps = self.ctps; btps = self.btps
+
+        ltk = LThread(self.N, molsys)
+        ltk.thread = [LNode((ci[n], cj[n]), cg[n], ctps[cc[n]], btps[cb[n]])
+                      for n in range(cols["offset"][k], cols["offset"][k+1])]
+        ltk.dG  = cols["dG"][k]
+        ltk.p   = cols["p"][k]
+        ltk.TdS = cols["TdS"][k]
+        return ltk
+    #
+
+    def add_dbn(self, dbstring):
+        # dot bracket string of the next structure (in order)
+        self.cols["dbn"].frombytes(dbstring.encode("utf-8"))
+        self.cols["dbn_offset"].append(len(self.cols["dbn"]))
+    #
+
+    def get_dbn(self, k):
+        # dot bracket string of structure k ('' if it was not kept)
+        o = self.cols["dbn_offset"]
+        if not k + 1 < len(o):
+            return ''
+        #
+
+        return bytes(self.cols["dbn"][o[k]:o[k+1]]).decode("utf-8")
+    #
+
+    def iter_threads(self, molsys):
+        for k in range(0, len(self)):
+            yield self.get_thread(k, molsys)
+        #|endfor
+
+    #
+
+    def write(self, flnm):
+        """@
+
+        writes the ensemble as a binary ensemble file (*.bens), all of
+        it in one write.
+
+        """
+
+        columns = []
+        for name, tc in ALL_COLUMNS:
+            columns += [[name, tc, len(self.cols[name])]]
+        #|endfor
+
+        header = { "version" : BENS_VERSION,
+                   "title"   : self.title,
+                   "length"  : self.N,
+                   "nstruct" : len(self),
+                   "nnode"   : self.nnodes(),
+                   "ctps"    : self.ctps,
+                   "btps"    : self.btps,
+                   "columns" : columns }
+
+        shdr = json.dumps(header).encode("utf-8")
+        # pad so the data start on an 8 byte boundary
+        shdr += b' ' * ((8 - (12 + len(shdr)) % 8) % 8)
+
+        buf = bytearray(BENS_MAGIC)
+        buf += struct.pack("<I", len(shdr))
+        buf += shdr
+        for name, tc in ALL_COLUMNS:
+            a = self.cols[name]
+            if not sys.byteorder == "little":
+                a = array(tc, a)
+                a.byteswap()
+            #
+
+            buf += a.tobytes()
+            buf += b'\0' * ((8 - len(buf) % 8) % 8)
+        #|endfor
+
+        try:
+            fp = open(flnm, 'wb')
+        except IOError:
+            print ("ERROR: cannot open file '%s'." % flnm)
+            sys.exit(1)
+        #
+
+        fp.write(buf)
+        fp.close()
+    #
+
+    def read(self, flnm):
+        """@
+
+        opens a binary ensemble file (*.bens) written by write(). The
+        file is memory mapped and the columns are memoryviews on it
+        (no copy is made), so nothing can be added to the ensemble
+        afterwards.
+
+        """
+
+        try:
+            fp = open(flnm, 'rb')
+        except IOError:
+            print ("ERROR: cannot open file '%s'." % flnm)
+            sys.exit(1)
+        #
+
+        buf = mmap.mmap(fp.fileno(), 0, access = mmap.ACCESS_READ)
+        fp.close()
+        self.mm = buf
+
+        if not buf[0:len(BENS_MAGIC)] == BENS_MAGIC:
+            print ("ERROR: %s is not a binary ensemble file" % flnm)
+            sys.exit(1)
+        #
+
+        H = struct.unpack("<I", buf[8:12])[0]
+        try:
+            header = json.loads(buf[12:12+H].decode("utf-8"))
+        except ValueError:
+            print ("ERROR: %s, header of the binary ensemble cannot be read." % flnm)
+            sys.exit(1)
+        #
+
+        self.N     = header["length"]
+        self.title = header["title"]
+        self.ctps = header["ctps"]
+        self.btps = header["btps"]
+        self.ctp_code = dict((v, k) for k, v in enumerate(self.ctps))
+        self.btp_code = dict((v, k) for k, v in enumerate(self.btps))
+
+        p = 12 + H
+        for name, tc, n in header["columns"]:
+            q = p + n*array(tc).itemsize
+            if q > len(buf):
+                print ("ERROR: %s, binary ensemble is truncated or damaged." % flnm)
+                sys.exit(1)
+            #
+
+            if sys.byteorder == "little":
+                a = memoryview(buf)[p:q].cast(tc)
+            else:
+                a = array(tc, buf[p:q])
+                a.byteswap()
+            #
+
+            self.cols[name] = a
+            p = q + (8 - q % 8) % 8
+        #|endfor
+
+        if not (len(self) == header["nstruct"] and self.nnodes() == header["nnode"]):
+            print ("ERROR: %s, binary ensemble is truncated or damaged." % flnm)
+            sys.exit(1)
+        #
+
+    #
+
+#
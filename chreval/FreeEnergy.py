@@ -29,6 +29,7 @@ Well, mainly that as of 190403, it is still directed to chromatin.
 """
 
 from math import log
+from array import array
 import sys
 import os
 import string
@@ -311,6 +312,15 @@ class FreeEnergy(object):
         self.w        = self.seg_len*self.xi/(self.lmbd)**2
         #                            weight used in TdS
         
+        # lookup tables: TdS by span j - i (one table for each T)
+        # and dH by heatmap count (see TdS() and dH())
+        self.TdS_table = {}
+        self.dH_table  = {}
+        
+        # stem run lengths along the diagonals (see build_stem_index())
+        self.stem_aa = {}
+        self.stem_pp = None
+        
         self.kBT      = self.kB * self.T # [kcal/mol] kB*T
         
         # constants: weights for the enthalpy of binding (used with
@@ -443,14 +453,37 @@ class FreeEnergy(object):
             sys.exit(1)
         #
         
-        # calculate the CLE
-        n = float(j - i + 1)
+        # TdS only depends on the span j - i (for a given T), so it
+        # is looked up from a table that is built once for each T
+        tds_T = self.TdS_table.get(T)
+        if tds_T == None or j - i >= len(tds_T):
+            tds_T = self.build_TdS_table(T, j - i)
+        #
+        
+        return tds_T[j - i]
+    #
+    
+    def calc_TdS(self, d, T):
+        # calculate the CLE for the span d = j - i
+        n = float(d + 1)
         ps_n = self.w*n # xi*N/lmbd**2, where N = n * self.seg_len
         # math.log
         tds = self.kB*T*(self.gmm*log(ps_n) - (self.gmm+0.5)*(1.0 - 1.0/ps_n))/self.xi
         return tds
     #
     
+    def build_TdS_table(self, T, d):
+        # table of TdS for the spans 1 to max(N - 1, d) at T
+        n_max = max(d + 1, self.N)
+        tds_T = [0.0] # d = 0 is not defined
+        for dd in range(1, n_max):
+            tds_T += [self.calc_TdS(dd, T)]
+        #|endfor
+        
+        self.TdS_table[T] = tds_T
+        return tds_T
+    #
+    
     def initialize_btype(self, N):
         """
         This has the form and function of ptype in vsfold5, but it allows
@@ -503,8 +536,15 @@ class FreeEnergy(object):
     # enthalpy of binding calculation
     def dH(self, v_ij):
         # print (v_ij)
-        # math.log
-        dh = self.base - log(self.shift + float(v_ij))
+        # a heatmap only holds a limited number of distinct counts,
+        # so dH is kept in a table by count
+        dh = self.dH_table.get(v_ij)
+        if dh == None:
+            # math.log
+            dh = self.base - log(self.shift + float(v_ij))
+            self.dH_table[v_ij] = dh
+        #
+        
         return dh
     #
     
@@ -724,6 +764,10 @@ class FreeEnergy(object):
         
         self.all_ctcf.update(self.edge_ctcf)
         
+        # sparse (CSR) index of the contacts and the stem runs
+        self.build_contact_index()
+        self.build_stem_index()
+        
         if debug_assign_btypes:
             print ("ctcf_setv:        ", self.ctcf_setv)
             print ("pssbl_ctcf:       ", self.pssbl_ctcf)
@@ -741,6 +785,104 @@ class FreeEnergy(object):
     #
     
     
+    def build_contact_index(self):
+        """@
+        
+        Compressed sparse row (CSR) index of the contacts
+        (btype[i][j].pair > 0) in the upper triangle. The contacts of
+        row i are
+        
+           ctc_j[ctc_ptr[i]:ctc_ptr[i+1]]     (ascending j)
+        
+        ctc_reach[i] is the smallest j of any contact (p,q) with
+        p >= i (N if there is none), so the region (i,j) contains no
+        contact at all when ctc_reach[i] > j.
+        
+        """
+        
+        N = self.N
+        self.ctc_ptr = array('l', [0]*(N+1))
+        self.ctc_j   = array('l')
+        for i in range(0, N):
+            btpi = self.btype[i]
+            for j in range(i+1, N):
+                if btpi[j].pair > 0:
+                    self.ctc_j.append(j)
+                #
+                
+            #|endfor
+            
+            self.ctc_ptr[i+1] = len(self.ctc_j)
+        #|endfor
+        
+        self.ctc_reach = array('l', [N]*(N+1))
+        for i in range(N-1, -1, -1):
+            self.ctc_reach[i] = self.ctc_reach[i+1]
+            if self.ctc_ptr[i+1] > self.ctc_ptr[i]:
+                jmin = self.ctc_j[self.ctc_ptr[i]]
+                if jmin < self.ctc_reach[i]:
+                    self.ctc_reach[i] = jmin
+                #
+                
+            #
+            
+        #|endfor
+        
+    #
+    
+    def build_stem_index(self):
+        """@
+        
+        Run-length index of the antiparallel stems. stem_aa[(i,j)] is
+        the number of consecutive cells (i,j), (i+1,j-1), (i+2,j-2),
+        ... with btype dGp < 0 (cells with no run are not stored), so
+        find_ifStem() reads the extent of a stem directly instead of
+        walking inward from every cell.
+        
+        The parallel runs (stem_pp) are only needed by the parallel
+        stem option, so they are built on first use.
+        
+        """
+        
+        N = self.N
+        self.stem_aa = {}
+        self.stem_pp = None
+        for i in range(N-1, -1, -1):
+            btpi = self.btype[i]
+            for j in range(i+1, N):
+                if btpi[j].dGp < 0.0:
+                    self.stem_aa[(i,j)] = self.stem_aa.get((i+1,j-1), 0) + 1
+                #
+                
+            #|endfor
+            
+        #|endfor
+        
+    #
+    
+    def build_stem_index_pp(self):
+        """@
+        
+        stem_pp[(i,j)] is the number of consecutive cells (i,j),
+        (i+1,j+1), ... with btype dGp > 0 that stay inside the map.
+        
+        """
+        
+        N = self.N
+        self.stem_pp = {}
+        for i in range(N-1, -1, -1):
+            btpi = self.btype[i]
+            for j in range(N-1, i, -1):
+                if btpi[j].dGp > 0.0:
+                    self.stem_pp[(i,j)] = self.stem_pp.get((i+1,j+1), 0) + 1
+                #
+                
+            #|endfor
+            
+        #|endfor
+        
+    #
+    
     def add_hv(self, vs):
         """
         This is used with the map building function to generate heatmaps
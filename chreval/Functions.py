@@ -9,6 +9,9 @@ Classes:
 Functions:     hamming_bin 
                hamming_str 
                KahanSumExp
+               LogSumExp
+               LogSumExpProb
+               LogSumExpShift
                similar 
                
 
@@ -24,7 +27,7 @@ Important universal functions used by several program in this package
 """
 
 import sys
-from math import exp, log, ceil, floor
+from math import exp, log, ceil, floor, fsum
 from difflib import SequenceMatcher # for similar
 
 
@@ -118,10 +121,30 @@ def KahanSumExp(expvalues):
     if flag_KahanSumExp_USE_SORT:
         expvalues.sort() # gives precision improvement in certain cases
     #
-    shift = 0 
-    esum = 0.0 
-    carry = 0.0 
+    ksum = KahanSumExpAcc()
     for exponent in expvalues:
+        ksum.add(exponent)
+    #
+    return ksum.esum, ksum.shift
+#
+
+
+class KahanSumExpAcc:
+    """@
+    
+    the running form of KahanSumExp(): the exponents are added one at
+    a time (add), so the list of them need not be kept. The sum is
+    esum x 2^shift.
+    
+    """
+    def __init__(self):
+        self.shift = 0 
+        self.esum  = 0.0 
+        self.carry = 0.0 
+    #
+    
+    def add(self, exponent):
+        shift = self.shift; esum = self.esum; carry = self.carry
         if exponent - shift * log(float(2)) > 709.783:
             n = ceil((exponent - shift * log(2) - 709.783)/log(float(2)))
             shift += n
@@ -142,18 +165,103 @@ def KahanSumExp(expvalues):
             value /= float(2)
         #
         tmp = esum + value 
-        carry = (tmp - esum) - value 
-        esum = tmp
+        self.carry = (tmp - esum) - value 
+        self.esum  = tmp
+        self.shift = shift
     #
-    return esum, shift
 #
 
 
+
+"""@
+
+LogSumExp replaces the running 2^shift bookkeeping of KahanSumExp
+with the usual log-sum-exp:
+
+   log(sum_k exp(x_k)) = xmax + log(sum_k exp(x_k - xmax))
+
+Every term after the shift lies in (0,1], so nothing can overflow and
+the largest term is exactly 1. The terms are added with math.fsum
+(exactly rounded), so the result is at least as good as the Kahan sum
+and does not depend on the order of the exponents.
+
+LogSumExpProb gives log Z together with all the normalized weights
+exp(x_k) / Z from the same shifted terms, and LogSumExpShift converts
+log Z back to the (esum, shift) form of KahanSumExp (esum x 2^shift)
+for reporting.
+
+"""
+
+def LogSumExp(expvalues):
+    if len(expvalues) == 0:
+        return -float("inf")
+    #
+    xmax = max(expvalues)
+    return xmax + log(fsum([exp(x - xmax) for x in expvalues]))
+#
+
+def LogSumExpProb(expvalues):
+    if len(expvalues) == 0:
+        return -float("inf"), []
+    #
+    xmax = max(expvalues)
+    wts  = [exp(x - xmax) for x in expvalues]
+    wsum = fsum(wts)
+    return xmax + log(wsum), [w / wsum for w in wts]
+#
+
+def LogSumExpShift(lsum):
+    shift = 0
+    if lsum > 709.783:
+        shift = int(ceil((lsum - 709.783)/log(float(2))))
+    #
+    return exp(lsum - shift * log(float(2))), shift
+#
+
+
+class LogSumExpAcc:
+    """@
+    
+    the running form of LogSumExp(): the exponents are added one at a
+    time (add) and the sum is rescaled whenever a new maximum
+    appears. The sum is exp(xmax) x esum, with a Kahan carry.
+    
+    """
+    def __init__(self):
+        self.xmax  = -float("inf")
+        self.esum  = 0.0
+        self.carry = 0.0
+    #
+    
+    def add(self, exponent):
+        if exponent > self.xmax:
+            r = exp(self.xmax - exponent)
+            self.esum  *= r
+            self.carry *= r
+            self.xmax   = exponent
+        #
+        
+        value = exp(exponent - self.xmax) - self.carry
+        tmp = self.esum + value
+        self.carry = (tmp - self.esum) - value
+        self.esum  = tmp
+    #
+    
+    def logsum(self):
+        if self.esum == 0.0:
+            return -float("inf")
+        #
+        return self.xmax + log(self.esum)
+    #
+#
+
     
 def test1():
     values = [10, 37, 34, 0.1, 0.0004, 34, 37.1, 37.2, 36.9, 709, 710, 711]
     value, shift = KahanSumExp(values)
     print ("{0} x 2^{1}".format(value, shift))
+    value, shift = LogSumExpShift(LogSumExp(values))
+    print ("{0} x 2^{1}".format(value, shift))
 #
 
 if __name__ == "__main__":
@@ -170,6 +170,7 @@ class GetOpts(InputSettings):
         
         
         self.use_eheat   = False # read in *.eheat files instead of *.heat
+        self.resume      = False # analyze_loops: skip loops in the journal
         
         
         self.parser = None
@@ -208,7 +209,7 @@ class GetOpts(InputSettings):
         
         # extensions ok?
         self.EXTS = {}
-        self.EXTS.update({'chreval.py' : ["heat", "eheat"]}) # allowed for chreval.py
+        self.EXTS.update({'chreval.py' : ["heat", "eheat", "bheat"]}) # allowed for chreval.py
         self.EXTS.update({'analyze_loops.py'    : ["bed", "txt"] })
         # both "bed" and "txt" extensions are allowed for analyze_loops.py
         self.EXTS.update({'assemble_heatmaps_and_CCDs.py'    : ["bed"] })
@@ -398,6 +399,74 @@ class GetOpts(InputSettings):
         # Nenski data
         self.from_Nenski   = args.from_Nenski
         
+        # number of processes
+        self.jobs          = args.jobs
+        if self.jobs < 1:
+            emsg = "ERROR: -jobs requires a value of at least 1 (%d)." % self.jobs
+            self.error(emsg)
+        #
+        
+        # maximum number of links kept at each (i,j)
+        self.max_links     = args.max_links
+        if self.max_links < 0:
+            emsg = "ERROR: -max_links cannot be negative (%d)." % self.max_links
+            self.error(emsg)
+        #
+        
+        # CTCF islands solved for the best subset of anchors
+        self.island_max    = args.island_max
+        if self.island_max < 0:
+            emsg = "ERROR: -island_max cannot be negative (%d)." % self.island_max
+            self.error(emsg)
+        #
+        
+        # result cache (Manager results by heatmap content + settings)
+        self.cache         = args.cache
+        self.cache_max     = args.cache_max
+        if self.cache_max < 0:
+            emsg = "ERROR: -cache_max cannot be negative (%d)." % self.cache_max
+            self.error(emsg)
+        #
+        
+        # build the structures when used instead of keeping them all
+        self.stream        = args.stream
+        
+        # traceback limits (Trace.rank_list_M)
+        self.topK          = args.topK
+        if self.topK < 0:
+            emsg = "ERROR: -topK cannot be negative (%d)." % self.topK
+            self.error(emsg)
+        #
+        
+        self.dG_window     = args.dG_window
+        if self.dG_window < 0.0:
+            emsg = "ERROR: -dG_window cannot be negative (%g)." % self.dG_window
+            self.error(emsg)
+        #
+        
+        # *_BDwt.clust from the partition function (PartitionFunction)
+        self.pf            = args.pf
+        
+        # structures kept in a columnar store (Ensemble, *.bens)
+        self.ensemble      = args.ensemble
+        
+        # structures only in the archive (*_ensemble.bens)
+        self.archive       = args.archive
+        if self.archive:
+            self.ensemble = True
+        #
+        
+        # maximum span of the DP (banded mode)
+        self.max_span      = args.max_span
+        if not (self.max_span == "full" or self.max_span == "auto"):
+            if not self.max_span.isdigit() or int(self.max_span) < 1:
+                emsg  = "ERROR: -max_span must be \"full\", \"auto\" or a "
+                emsg += "positive integer (%s)." % self.max_span
+                self.error(emsg)
+            #
+            
+        #
+        
         
         if self.program == "analyze_loops.py" or \
            self.program == "assemble_heatmaps_and_CCDs.py" or \
@@ -406,6 +475,7 @@ class GetOpts(InputSettings):
             # assemble_heatmaps_and_CCDs
             
             self.use_eheat     = args.use_eheat # use the *.eheat file
+            self.resume        = args.resume    # continue from the journal
             
             self.basic         = args.basic 
             self.hamming       = args.hamming
@@ -525,8 +595,9 @@ class GetOpts(InputSettings):
                             dest='leadingEdge', type=int,
                             help='For PK search, how much of a \'hot lead\' you \
                             want to use ahead of the secondary structure search \
-                            (default is 10, probably not good -- or at least \
-                            expensive -- to request more than 20).')
+                            (default is 10). Only contacts below -pkThresh in \
+                            the hot lead are scanned, so longer leads (50 or \
+                            more) stay affordable.')
         
         parser.add_argument('-pkThresh',  action='store', default=dGpk_threshold,
                             dest='pk_threshold', type=float,
@@ -595,6 +666,125 @@ class GetOpts(InputSettings):
                             Rarely do we look beyond the first few structures, so \
                             why would we want to look at 10 of thousands of them?')
         
+        parser.add_argument('-jobs', action='store', default=1,
+                            dest='jobs', type=int,
+                            help='Number of processes used to fill the dynamic \
+                            programming tables (default 1, at most one per \
+                            processor). With more than one, \
+                            the tables are filled in stages of independent cells \
+                            and the branch scans of each stage are shared out over \
+                            the processes; the result is the same as with one. \
+                            A cell that can receive a pseudoknot link (-pkLead) \
+                            must wait for the scan of the previous column, so maps \
+                            with many pseudoknot candidates gain little. \
+                            In analyze_loops.py, N is \
+                            the number of loops evaluated at the same time (each \
+                            with one process, at most one per processor); the \
+                            results are written in the order of the input.')
+        
+        parser.add_argument('-max_links', action='store', default=0,
+                            dest='max_links', type=int,
+                            help='Maximum number of links (alternative motifs) \
+                            stored at each position (i,j) of the dynamic programming \
+                            tables (default 0 = keep all). The links of a cell are \
+                            kept in order of their free energy as they are added and \
+                            a link that falls behind the first max_links is not \
+                            stored, so the memory and the work at (i,j) are bounded \
+                            by this number; the best link of each cell is always \
+                            kept. The traceback can only pick from the stored \
+                            alternatives, so a small value can change the suboptimal \
+                            structures that are found.')
+        
+        parser.add_argument('-max_span', action='store', default="full",
+                            dest='max_span', type=str,
+                            help='Maximum span j - i of a contact in the dynamic \
+                            programming tables: "full" (default), an integer W, or \
+                            "auto" (W = the widest nonzero contact in the heatmap). \
+                            With W, only the band j - i <= W and the exterior row \
+                            (i = 0) are evaluated, and contacts wider than W are \
+                            ignored.')
+        
+        parser.add_argument('-island_max', action='store', default=30,
+                            dest='island_max', type=int,
+                            help='CTCF islands with at most this many anchors \
+                            (default 30) are built from the subset of anchors \
+                            that gives the island the lowest free energy in the \
+                            traceback (exact search), so the island is never \
+                            worse than the one with all the anchors. Larger \
+                            islands, or all of them with 0, assume that every \
+                            anchor binds.')
+        
+        parser.add_argument('-cache', action='store_true', default=False,
+                            dest='cache',
+                            help='Keep the results of each heatmap in the result \
+                            cache ($CHREVAL_CACHE/results, default \
+                            ~/.cache/chreval/results) and reuse them when the same \
+                            heatmap (by content) is run again with the same \
+                            settings and the same version of chreval (sources).')
+        
+        parser.add_argument('-cache_max', action='store', default=2000,
+                            dest='cache_max', type=int,
+                            help='Size limit of the result cache in MB (default \
+                            2000, 0 = no limit). The least recently used results \
+                            are removed first.')
+        
+        parser.add_argument('-stream', action='store_true', default=False,
+                            dest='stream',
+                            help='Do not keep the whole ensemble of structures in \
+                            memory: they are built from the traceback one at a \
+                            time each time they are needed (Boltzmann weights, \
+                            clusters, output), in the same order and with the same \
+                            results. Slower, but the memory no longer grows with \
+                            the number of structures. Not used with -cache.')
+        
+        parser.add_argument('-topK', action='store', default=0,
+                            dest='topK', type=int,
+                            help='Keep only the K structures of lowest free energy \
+                            (default 0 = all). NOTE: the Boltzmann probabilities \
+                            are then taken over these K structures. This only \
+                            limits the output: every candidate selected with \
+                            -dGrange is still built in the traceback, because \
+                            the estimate of the minFE tables is not a lower \
+                            bound to the free energy of the finished structure.')
+        
+        parser.add_argument('-dG_window', action='store', default=0.0,
+                            dest='dG_window', type=float,
+                            help='Keep only the structures with a free energy \
+                            within dG_window [kcal/mol] of the lowest free energy \
+                            structure (default 0 = no limit). Unlike -dGrange, which selects \
+                            the candidates by their estimated free energy, this \
+                            applies to the free energy of the finished structure, \
+                            so it only limits the output, not the traceback work \
+                            (see -topK).')
+        
+        parser.add_argument('-pf', action='store_true', default=False,
+                            dest='pf',
+                            help='Compute the contact probabilities of the \
+                            *_BDwt.clust map from the partition function of the \
+                            whole ensemble held in the minFE tables (inside and \
+                            outside passes, as in McCaskill) instead of summing \
+                            the Boltzmann weights of the enumerated structures. \
+                            The map is then not limited by -dGrange, -topK or \
+                            -dG_window. The structure list and *_BDwt.cpif are \
+                            unchanged.')
+        
+        parser.add_argument('-ensemble', action='store_true', default=False,
+                            dest='ensemble',
+                            help='Keep the structures in a compact columnar store \
+                            (Ensemble) rather than as one object per structure and \
+                            write the whole ensemble in one binary file, \
+                            <name>_ensemble.bens. The per structure files (DBN, \
+                            heat, chpair, simres) are built from the store as \
+                            they are written.')
+        
+        parser.add_argument('-archive', action='store_true', default=False,
+                            dest='archive',
+                            help='Write all the structures to one indexed archive, \
+                            <name>_ensemble.bens (implies -ensemble), rather than \
+                            a DBN, heat, chpair and simres file for each one (as \
+                            with -printAll1D). The files of any structure can be \
+                            written from the archive with extract_structures.py.')
+        
         flag_checkfile = False
         
         
@@ -722,6 +912,15 @@ class GetOpts(InputSettings):
                                 help='(analysis programs) Specifies the name of \
                                 the output file for the analysis program.')
             
+            parser.add_argument('-resume', action='store_true', default=False,
+                                dest='resume',
+                                help='(analyze_loops) Keep a journal of the finished \
+                                loops (*_journal.dat, next to the output file) and \
+                                continue an interrupted run: loops recorded in the \
+                                journal are not calculated again. The journal is only \
+                                used if the header and all the settings that can \
+                                change the results are the same.')
+            
         #
         
         
@@ -10,6 +10,8 @@ Classes:        HeatMapData
                 CSVmaps
 
 Functions:      convert_to_basic_heatmap 
+                convert_to_binary_heatmap 
+                is_binary_heatmap 
                 (tools for analyzing ctcf weights)
                 get_energydist_histogram 
                 disp_energydist_histogram 
@@ -35,6 +37,11 @@ from math import exp
 from math import log
 
 import sys
+import os
+import json
+import mmap
+import struct
+from array import array
 from copy import deepcopy
 from FileTools  import FileTools
 from FileTools  import getHeadExt
@@ -62,11 +69,80 @@ def usage():
     print ("                     \"exp\"       -- exponential rescaling")
     print ("       -opcsv_scale  N             -- maximum of the data set")
     print ("       -histogram <file>           -- histogram of heatmap <file>")
+    print ("       -binary_hm    <file>        -- convert heatmap <file> to <file>.bheat")
      
 #
 
 
 
+# Binary heatmap container (*.bheat)
+# 
+#   bytes 0-7    BHEAT_MAGIC
+#   bytes 8-11   H, length of the header (uint32, little endian)
+#   bytes 12-    header: JSON with the metadata of the map (version,
+#                resolution, position, length, g_bgn, g_end and the
+#                CTCF cluster table (taglist, bedlines)), the layout of
+#                the data and the list of columns [name, typecode,
+#                count], padded with blanks so that the data start on
+#                an 8 byte boundary
+#   12 + H -     the nonzero elements of the map, row by row, as three
+#                little endian columns, each one padded to an 8 byte
+#                boundary:
+#                   rowptr  (N+1, uint32): row i is [rowptr[i], rowptr[i+1])
+#                   col     (uint16 or uint32): column j of each element
+#                   val     value of each element
+# 
+# With layout "upper" (symmetric map), a row i only holds j >= i;
+# with "full" (a map that is not symmetric), it holds all j. The
+# values are written with the smallest type that keeps them exactly
+# (bheat_value_typecode()). So a column can also be opened directly,
+# e.g.,
+# 
+#   np.memmap(flnm, dtype='<u2', mode='r', offset=..., shape=(nnz,))
+
+BHEAT_MAGIC   = b"CHRBHEAT"
+BHEAT_VERSION = "0.1"
+
+# the columns, in the order they are written
+BHEAT_COLUMNS = ["rowptr", "col", "val"]
+
+def bheat_value_typecode(vals):
+    # smallest array typecode that keeps all the values exactly:
+    # unsigned 8, 16 or 32 bit integers for counts, else float32 or
+    # float64
+    if len(vals) == 0:
+        return 'B'
+    #
+    
+    if min(vals) >= 0 and all(float(v).is_integer() for v in vals):
+        vmax = max(vals)
+        for tc, vlim in [('B', 2**8), ('H', 2**16), ('I', 2**32)]:
+            if vmax < vlim:
+                return tc
+            #
+            
+        #|endfor
+        
+    #
+    
+    if array('f', vals).tolist() == list(vals):
+        return 'f'
+    #
+    
+    return 'd'
+#
+
+def is_binary_heatmap(flnm):
+    try:
+        with open(flnm, 'rb') as fp:
+            return fp.read(len(BHEAT_MAGIC)) == BHEAT_MAGIC
+        #
+    except IOError:
+        return False
+    #
+#
+
+
 # This was introduced to handle different versions of heatmaps and
 # types of content. Presumably, the program that creates the map would
 # explain what the contents in the file are.
@@ -83,6 +159,8 @@ class HeatMapData(object):
         self.g_end         = -1 
         self.set_HeatMapData = False
         self.fileformat = "none"
+        self.taglist     = [] # CTCF cluster table of eheat files:
+        self.bedlines    = [] # column tags and the split lines
     #
     
     def set_heatmap(self, hmap):
@@ -476,6 +554,14 @@ class HeatMapTools(object):
         flhd, ext = getHeadExt(flnm)
         self.fileformat = ext
         
+        # binary heatmaps are recognized by their content
+        if is_binary_heatmap(flnm):
+            self.fileformat = "bheat"
+            gmtrx = self.read_binary_heatmap(flnm, PROGRAM, flag_display)
+            self.N = gmtrx.length
+            return gmtrx
+        #
+        
         if debug_read_heatmap:
             print ("file name: %s" % flnm)
         #
@@ -743,6 +829,7 @@ class HeatMapTools(object):
             print ("loading in CTCF loop info:")
             # read taglist
             taglist = lfp[k].strip().split(':')[1].strip().split()
+            gmtrx.taglist = taglist
             #print (taglist)
             
             
@@ -762,6 +849,7 @@ class HeatMapTools(object):
                 else:
                     chrmtn = assign_bed_tags(taglist, sbedfl)
                     gmtrx.clusters += [chrmtn]
+                    gmtrx.bedlines += [sbedfl]
                     print ("%s" % (chrmtn.disp_data()))
                     #print ("k = %2d, %s" % (k, chrmtn.disp_data()))
                     k += 1
@@ -848,23 +936,249 @@ class HeatMapTools(object):
     
     
     # this does the actual reading of the heatmap matrix
-    def read_matrix(self, start, N, lfp):
-        debug_read_martix = False # True # 
-        if debug_read_martix:
-            print ("entered read_matrix():")
+    def read_binary_sparse(self, flnm):
+        """@
+        
+        Opens a binary heatmap (*.bheat) and returns its header
+        (dict) and the columns (dict) rowptr, col and val as
+        memoryviews on the memory mapped file (no copy is made). The
+        elements of row i are (col[k], val[k]) for rowptr[i] <= k <
+        rowptr[i+1]; with header["layout"] = "upper", the map is
+        symmetric and only j >= i is stored.
+        
+        """
+        try:
+            fp = open(flnm, 'rb')
+        except IOError:
+            print ("ERROR: cannot open file '%s'." % flnm)
+            sys.exit(1)
         #
         
-        s = ''
-        mtrx = []
-        ij_min = 100000.0
-        for k in range(start,N+start):
-            mtrxj = []
-            if self.fileformat == "csv":
-                s = lfp[k].strip().split(',')
+        mm = mmap.mmap(fp.fileno(), 0, access = mmap.ACCESS_READ)
+        fp.close()
+        
+        if not mm[0:len(BHEAT_MAGIC)] == BHEAT_MAGIC:
+            print ("ERROR: %s is not a binary heatmap file" % flnm)
+            sys.exit(1)
+        #
+        
+        H = struct.unpack("<I", mm[8:12])[0]
+        try:
+            header = json.loads(mm[12:12+H].decode("utf-8"))
+        except ValueError:
+            print ("ERROR: %s, header of the binary heatmap cannot be read." % flnm)
+            sys.exit(1)
+        #
+        
+        if not header.get("bheat") == BHEAT_VERSION:
+            print ("ERROR: %s, binary heatmap version %s is not supported (%s)." \
+                % (flnm, header.get("bheat"), BHEAT_VERSION))
+            sys.exit(1)
+        #
+        
+        cols = {}
+        p = 12 + H
+        for name, tc, n in header["columns"]:
+            q = p + n*array(tc).itemsize
+            if q > len(mm):
+                print ("ERROR: %s, binary heatmap is truncated or damaged." % flnm)
+                sys.exit(1)
+            #
+            
+            if sys.byteorder == "little":
+                cols[name] = memoryview(mm)[p:q].cast(tc)
             else:
-                s = lfp[k].strip().split()
+                cols[name] = array(tc, mm[p:q])
+                cols[name].byteswap()
             #
             
+            p = q + (8 - q % 8) % 8
+        #|endfor
+        
+        N = header["length"]
+        if not (len(cols["rowptr"]) == N + 1 and
+                cols["rowptr"][N] == len(cols["col"]) == len(cols["val"])):
+            print ("ERROR: %s, binary heatmap is truncated or damaged." % flnm)
+            sys.exit(1)
+        #
+        
+        return header, cols
+    #
+    
+    
+    def read_binary_heatmap(self, flnm, PROGRAM = "read_heatmap", flag_display = False):
+        """@
+        
+        Reads a binary heatmap (*.bheat) into the usual HeatMapData
+        (heatmap as a list of lists). See read_binary_sparse() for
+        direct access to the data.
+        
+        """
+        
+        header, cols = self.read_binary_sparse(flnm)
+        
+        gmtrx = HeatMapData(header["version"])
+        gmtrx.resolution = header["resolution"]
+        gmtrx.position   = header["position"]
+        gmtrx.length     = header["length"]
+        gmtrx.g_bgn      = header["g_bgn"]
+        gmtrx.g_end      = header["g_end"]
+        gmtrx.taglist    = header["taglist"]
+        gmtrx.bedlines   = header["bedlines"]
+        for sbedfl in gmtrx.bedlines:
+            gmtrx.clusters += [assign_bed_tags(gmtrx.taglist, sbedfl)]
+        #
+        
+        if flag_display:
+            print ("file name: %s" % flnm)
+            print ("size of matrix: %d" % gmtrx.length)
+        #
+        
+        N = gmtrx.length
+        rowptr = cols["rowptr"]; col = cols["col"]; val = cols["val"]
+        flag_upper = header["layout"] == "upper"
+        mtrx = [[0.0]*N for i in range(0, N)]
+        for i in range(0, N):
+            for k in range(rowptr[i], rowptr[i+1]):
+                j = col[k]; v = float(val[k])
+                mtrx[i][j] = v
+                if flag_upper:
+                    mtrx[j][i] = v
+                #
+                
+            #|endfor
+            
+        #|endfor
+        
+        gmtrx.heatmap = mtrx
+        return gmtrx
+    #
+    
+    
+    def write_BinHeatMap(self, flnm, gmtrx):
+        """@
+        
+        Writes gmtrx (HeatMapData) as a binary heatmap (*.bheat). Only
+        the nonzero elements are stored, and only those of the upper
+        triangle (i <= j) when the map is symmetric; a map that is not
+        symmetric is kept as it is (layout "full").
+        
+        """
+        
+        N = gmtrx.length
+        hm = gmtrx.heatmap
+        
+        flag_upper = True
+        for i in range(0, N):
+            for j in range(i+1, N):
+                if not hm[i][j] == hm[j][i]:
+                    flag_upper = False
+                    break
+                #
+                
+            #|endfor
+            
+            if not flag_upper:
+                break
+            #
+            
+        #|endfor
+        
+        rowptr = array('I', [0])
+        cols = []
+        vals = []
+        for i in range(0, N):
+            j0 = i if flag_upper else 0
+            for j in range(j0, N):
+                if not hm[i][j] == 0.0:
+                    cols += [j]
+                    vals += [hm[i][j]]
+                #
+                
+            #|endfor
+            
+            rowptr.append(len(cols))
+        #|endfor
+        
+        tc = bheat_value_typecode(vals)
+        if tc in "BHI":
+            vals = [int(v) for v in vals]
+        #
+        
+        data = { "rowptr" : rowptr,
+                 "col"    : array('H' if N < 2**16 else 'I', cols),
+                 "val"    : array(tc, vals) }
+        
+        columns = []
+        for name in BHEAT_COLUMNS:
+            columns += [[name, data[name].typecode, len(data[name])]]
+        #|endfor
+        
+        header = { "bheat"      : BHEAT_VERSION,
+                   "version"    : gmtrx.version,
+                   "resolution" : gmtrx.resolution,
+                   "position"   : gmtrx.position,
+                   "length"     : N,
+                   "g_bgn"      : gmtrx.g_bgn,
+                   "g_end"      : gmtrx.g_end,
+                   "taglist"    : gmtrx.taglist,
+                   "bedlines"   : gmtrx.bedlines,
+                   "layout"     : "upper" if flag_upper else "full",
+                   "columns"    : columns }
+        
+        shdr = json.dumps(header).encode("utf-8")
+        # pad so the data start on an 8 byte boundary
+        shdr += b' ' * ((8 - (12 + len(shdr)) % 8) % 8)
+        
+        buf = bytearray(BHEAT_MAGIC)
+        buf += struct.pack("<I", len(shdr))
+        buf += shdr
+        for name in BHEAT_COLUMNS:
+            a = data[name]
+            if not sys.byteorder == "little":
+                a = array(a.typecode, a)
+                a.byteswap()
+            #
+            
+            buf += a.tobytes()
+            buf += b'\0' * ((8 - len(buf) % 8) % 8)
+        #|endfor
+        
+        try:
+            fp = open(flnm, 'wb')
+        except IOError:
+            print ("ERROR: cannot open file '%s'." % flnm)
+            sys.exit(1)
+        #
+        
+        fp.write(buf)
+        fp.close()
+    #
+    
+    
+    def read_matrix_array(self, start, N, lfp):
+        """@
+        
+        Reads the N x N matrix in lines lfp[start:start+N] into a
+        single flat array('d'), with line (row) j of the file at
+        [j*N:(j+1)*N]. Each line is converted in one pass (map(float))
+        and checked for negative (or NaN) values in one scan; only a
+        line that does not convert (e.g., 'x' entries, which read as
+        0) is parsed element by element.
+        
+        """
+        
+        ext = self.fileformat
+        
+        sep = None
+        if ext == "csv":
+            sep = ','
+        #
+        
+        mtrx = array('d')
+        ij_min = 100000.0
+        for k in range(start,N+start):
+            s = lfp[k].strip().split(sep)
             
             if not len(s) == N:
                 # probably should make sure that the dimensions are
@@ -875,42 +1189,52 @@ class HeatMapTools(object):
             #
             
             j = k - start
-            for i in range(0,N):
-                try:
-                    w = float(s[i])
-                    
-                    if not (w >= 0.0 or ext == "clust"):
-                        # just so stupid stuff doesn't get in.
-                        print ("ERROR: Encountered a negative value in the chromatin ")
-                        print ("       input data. ")
-                        print ("       This cannot be heat map data for chromatin!")
-                        print ("       => position (i,j) = (%d,%d), value = " % (i, j), w)
-                        print ("       -- all data in the heat map must be positive")
-                        print ("       Please verify or correct the file '%s'." % flnm)
-                        sys.exit(1)
-                    #
-                    
-                    if w < ij_min:
-                        ij_min = w
-                    #
-                    
-                    mtrxj += [w]
-                    
-                except ValueError:
+            try:
+                mtrxj = array('d', map(float, s))
+            except ValueError:
+                mtrxj = array('d')
+                for i in range(0,N):
                     if s[i] == 'x':
-                        mtrxj += [0.0]
+                        mtrxj.append(0.0)
                     else:
-                        print ("ERROR: matrix contains unrecognized terms")
-                        print ("       from ", s)
-                        print ("       cannot recognize '%s'" % s[i])
-                        sys.exit(1)
+                        try:
+                            mtrxj.append(float(s[i]))
+                        except ValueError:
+                            print ("ERROR: matrix contains unrecognized terms")
+                            print ("       from ", s)
+                            print ("       cannot recognize '%s'" % s[i])
+                            sys.exit(1)
+                        #
+                        
                     #
                     
+                #|endfor
+                
+            #
+            
+            # written as not (w >= 0.0) so that NaN is caught too
+            if not (ext == "clust" or all(w >= 0.0 for w in mtrxj)):
+                # just so stupid stuff doesn't get in.
+                i = 0
+                while mtrxj[i] >= 0.0:
+                    i += 1
                 #
                 
-            #|endfor
+                print ("ERROR: Encountered a negative value in the chromatin ")
+                print ("       input data. ")
+                print ("       This cannot be heat map data for chromatin!")
+                print ("       => position (i,j) = (%d,%d), value = " % (i, j), mtrxj[i])
+                print ("       -- all data in the heat map must be positive")
+                print ("       Please verify or correct the input file.")
+                sys.exit(1)
+            #
             
-            mtrx += [mtrxj]
+            wmin = min(mtrxj)
+            if wmin < ij_min:
+                ij_min = wmin
+            #
+            
+            mtrx.extend(mtrxj)
             
         #|endfor
         
@@ -920,9 +1244,9 @@ class HeatMapTools(object):
             print ("unshifting free energy data by ", shift)
             for j in range(0, N):
                 for i in range(0, N):
-                    if not mtrx[i][j] == 0.0:
-                        mtrx[i][j] += shift
-                        mtrx[j][i] += shift
+                    if not mtrx[i*N + j] == 0.0:
+                        mtrx[i*N + j] += shift
+                        mtrx[j*N + i] += shift
                     #
                     
                 #|endfor
@@ -931,6 +1255,25 @@ class HeatMapTools(object):
             
         #
         
+        return mtrx
+    #
+    
+    
+    def read_matrix(self, start, N, lfp):
+        """@
+        
+        list of lists version of read_matrix_array() (mtrx[j][i]),
+        as expected by the existing callers.
+        
+        """
+        debug_read_martix = False # True # 
+        if debug_read_martix:
+            print ("entered read_matrix():")
+        #
+        
+        flat = self.read_matrix_array(start, N, lfp)
+        mtrx = [flat[k*N:(k+1)*N].tolist() for k in range(0, N)]
+        
         if debug_read_martix:
             print ("finished read_matrix()")
         #
@@ -1796,9 +2139,29 @@ def convert_to_basic_heatmap(flnm):
 #
 
 
-        
 
 
+def convert_to_binary_heatmap(flnm):
+    """
+    writes the heatmap (and, for eheat files, the header and CTCF
+    cluster information) to the binary format <file>.bheat, which
+    all the heatmap readers recognize.
+    
+    """
+    mtools = HeatMapTools()
+    gmtrx = mtools.read_heatmap(flnm, 
+                                ["heat","eheat","clust","csv"], "HeatMapTools")
+    
+    flhd, ext = getHeadExt(flnm)
+    flnm_rev = flhd + ".bheat"
+    print ("new file name: ", flnm_rev)
+    
+    mtools.write_BinHeatMap(flnm_rev, gmtrx)
+#
+
+
+        
+
 def get_energydist_histogram(hm, span = 10.0):
     N = len(hm)
     histogram = {}
@@ -2094,6 +2457,14 @@ def main(cl):
                 print (inflnm)
             #
         
+        elif arg == '-binary_hm':
+            in_option = "convert_to_binary_hm"
+            k += 1
+            if k < n:
+                inflnm = cl[k]
+                print (inflnm)
+            #
+            
         elif arg == '-fcsv':
             in_option = "format_csv_heatmap_file"
             k += 1
@@ -2155,6 +2526,9 @@ def main(cl):
     if in_option == "convert_to_basic_hm":
         convert_to_basic_heatmap(inflnm)
     
+    elif in_option == "convert_to_binary_hm":
+        convert_to_binary_heatmap(inflnm)
+    
     elif in_option == "format_csv_heatmap_file":
         b = CSVmaps(csv_weight, csv_scale)
         b.process_csv_file(inflnm, outflnm, 100.0)
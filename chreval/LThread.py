@@ -138,6 +138,11 @@ may be more useful than Pair, which carries even less information.
 
 class LNode(object):
     # this is basically a structure
+    
+    # one per contact of every structure in the ensemble, so no
+    # per-instance __dict__
+    __slots__ = ('ij_ndx', 'dGij_B', 'ctp', 'btp', 'ch_i', 'ch_j')
+    
     def __init__(self, ij_ndx, dGij_B, ctp, btp):
         self.ij_ndx = ij_ndx # (i, j) This is very important!
         # probably should have ij_ndx.i, ij_ndx.j calling it a pair.
@@ -180,6 +185,8 @@ class LNode(object):
 
 
 class LThread(object):
+    __slots__ = ('molsys', 'sqlen', 'thread', 'dG', 'nbp', 'TdS', 'p')
+    
     def __init__(self, N, molsys):
         # int
         # class MolSystem
@@ -40,7 +40,7 @@ from Constants import T_0C  # [K] absolute temp at  0 C.
 
 from gammafcn   import GammaFcn
 from Xi_L       import Xi_stem
-from RConstants import xi_max
+from ChrConstants import xi_max
 
 
 
@@ -131,12 +131,41 @@ def calc_dGlocal_exact(T, slen, delta, gmm, nu, xi_mn = 4.0):
     
     # print ("xi = %8.2f" % xi_v)
     xi_wt.set_tolerance(1.0e-4)
-    dGxi = kB*T*((2.25)/3.0)*xi_wt.rx_functSmpsn(1., xi_v, 2.0, 1.75, 0.5)
+    dGxi = kB*T*((2.25)/3.0)*xi_wt.rx_functSmpsn(1., xi_v, delta, gmm, nu)
     dGxi = (float(slen)/xi_v)*dGxi
     return dGxi
 #
 
 
+def calc_dGlocal_table(T, slens, delta, gmm, nu, xi_mn = 4.0):
+    """@
+    
+    same as calc_dGlocal_exact() for a whole list of lengths
+    (slens). The integral only depends on the clamped Kuhn length, so
+    each distinct upper limit is integrated once, all of them together
+    in one batch (GammaFcn.rx_functSmpsn_batch). Returns {slen : dGxi}.
+    
+    """
+    
+    xi_v = {}
+    for slen in slens:
+        xi_v[slen] = max(x_stem.f_wlc(float(slen)), xi_mn)
+    #
+    
+    xi_wt.set_tolerance(1.0e-4)
+    xi_u = sorted(set(xi_v.values()))
+    w_xi = dict(zip(xi_u, xi_wt.rx_functSmpsn_batch(1., xi_u, delta, gmm, nu)))
+    
+    table = {}
+    for slen in slens:
+        xi = xi_v[slen]
+        dGxi = kB*T*((2.25)/3.0)*w_xi[xi]
+        table[slen] = (float(slen)/xi)*dGxi
+    #
+    
+    return table
+#
+
 
 def setup_dGl_stm_xpress(T):
     
@@ -333,7 +362,8 @@ def setup_dGl_stm_xpress(T):
 
 
 
-def setup_dGl_stm(T, xi_mn, stem_len_max):
+def setup_dGl_stm(T, xi_mn, stem_len_max,
+                  delta = 2.0, gmm = 1.75, nu = 0.5):
     """@
     
     Setup program for pre-calculation of the local entropy. This is
@@ -341,7 +371,7 @@ def setup_dGl_stm(T, xi_mn, stem_len_max):
     list of values and interpolate between them. When non-Gaussian
     parameters are requested (delta != 2 and/or nu != 1/2), this
     program must be called to determine the proper values for the
-    local entropy.
+    local entropy (delta, gmm and nu; the defaults are Gaussian).
     
     In general, this is what should be used, and if a larger maximum
     Kuhn length is required, it should be set up with such values
@@ -373,51 +403,43 @@ def setup_dGl_stm(T, xi_mn, stem_len_max):
     
     print ("setting up the local variable stem Kuhn length")
     
-    delta = 2.0
-    gmm = 1.75
-    nu = 0.5
+    """@
     
-    # calculate stem weights
-    for k in range(1, int(stem_len_max + 0.5)):
-        # integer just in case someone includes an idiotic value
-        
-        # print (k)
-        length = float(k)
-        if length < xi_mn:
-            length = xi_mn
-        #
-        
-        """@
-        
-        calc_dGlocal_exact(T, length, delta, gmm, nu, xi_mn)
-        
-        T      = temperature (in Kelvin)
-        length = upper limit of integration (length)
-        delta  = exponential weight (gaussian is 2)
-        gmm    = self avoiding walk parameter (default 1.75)
-        nu     = excluded volume weight (default 0.5)
-        xi_mn  = minimum stem Kuhn length 
-        
-        This tool should not be necessary to use in most reasonable
-        cases. The only issue presently is for cases where the Kuhn
-        length can be longer than 24 nt or if one requires a different
-        value for the minimum Kuhn length. For most real RNA cases,
-        this would not be likely.
-        
-        Anyway, one problem that this tool presently has is that it
-        does not consider temperature and, because it is expensive to
-        do these integral calculations, it also relies on already
-        fitted parameters and these values must be added manually.
-        
-        """
-        dG = calc_dGlocal_exact(T, length, delta, gmm, nu, xi_mn)
+    calc_dGlocal_table(T, lengths, delta, gmm, nu, xi_mn)
+    
+    T      = temperature (in Kelvin)
+    length = upper limit of integration (length)
+    delta  = exponential weight (gaussian is 2)
+    gmm    = self avoiding walk parameter (default 1.75)
+    nu     = excluded volume weight (default 0.5)
+    xi_mn  = minimum stem Kuhn length 
+    
+    This tool should not be necessary to use in most reasonable
+    cases. The only issue presently is for cases where the Kuhn
+    length can be longer than 24 nt or if one requires a different
+    value for the minimum Kuhn length. For most real RNA cases,
+    this would not be likely.
+    
+    Lengths below xi_mn are all integrated at xi_mn and then scaled
+    linearly.
+    
+    """
+    
+    # integer just in case someone includes an idiotic value
+    ks = list(range(1, int(stem_len_max + 0.5)))
+    w_len = calc_dGlocal_table(T, [max(float(k), xi_mn) for k in ks],
+                               delta, gmm, nu, xi_mn)
+    
+    table = {}
+    for k in ks:
+        dG = w_len[max(float(k), xi_mn)]
         if float(k) < xi_mn:
             dG *= (float(k)/xi_mn)
         #
-        
-        dGl_stm.update({k : dG})
+        table.update({k : dG})
     #
     
+    dGl_stm.update(table)
     
     print ("finished building local entropy weights")
     return dGl_stm
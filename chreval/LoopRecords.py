@@ -34,6 +34,8 @@ class Branch(object):
     writing it is branch[k][0] and branch[k][1], you express it as
     branch[k].i and branch[k].j
     """
+    __slots__ = ('i', 'j')
+    
     def __init__(self, i, j):
         self.i = i
         self.j = j
@@ -58,6 +60,9 @@ class MBLptr(object):
     ChromatinModules [or ProteinModules]) to compute I-loops and
     M-loops.
     """ 
+    # (Qbranches is only set by pushBranchlist(flag_reset = True))
+    __slots__ = ('i', 'j', 'nm', 'dr', 'V', 'Q', 'n', 'Qbranches')
+    
     def __init__(self, i, j):
         self.i    = i
         self.j    = j
@@ -74,7 +74,7 @@ dProgList = {"cantata"           : "evaluation",
              "generator"         : "generator" }
 
 dEXTS = { "RNA" :       ["par",  "gMtrx" ],
-          "Chromatin" : ["heat", "eheat"] }
+          "Chromatin" : ["heat", "eheat", "bheat"] }
 
 
 def explain_JobTypes():
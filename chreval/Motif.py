@@ -336,6 +336,10 @@ def motif_error(name, Ob):
 
 
 class Motif(object):
+    # minFE stores one or more of these for every link at every (i,j)
+    __slots__ = ('Ob', 'Vij', 'ctp', 'btp', 'branching', 'tlen', 'xi',
+                 'base', 'pk', 'wyspa')
+    
     def __init__(self, i, j, Vij, ctp, btp, branching, pk = [], wyspa = []):
         self.Ob        = None    # <<<=== transition to objects Stem, MBL, XLoop
         self.Vij       = Vij     # the free energy
@@ -540,7 +544,8 @@ class Motif(object):
 # This carries the fundamental information that is needed to construct
 # the various "secondary structure" elements in this approach.
 class Link:
-
+    __slots__ = ('motif', 'Vij')
+    
     # #############################################################
     # 190618; this should now take on the functions that we have
     # defined in Motif. Right now, we are in transition, but I think
@@ -611,19 +616,58 @@ class Link:
     
 #
 
-# This is used as a push down stack for links at (i,j). It is only
-# used in Map().
+def link_Vij(link):
+    # sort key of mergeSortLinks
+    return link.Vij
+#
+
+# This is used as the store of the links at (i,j). It is only used in
+# Map().
 class LGroup:
-    def __init__(self):
+    def __init__(self, max_links = 0):
         self.lg = []
         self.nlg = 0
-        # I think there should also be a maximum number of links on
-        # the stack (at least in principle). However, presently, it
-        # doesn't seem to be so necessary.
+        # the maximum number of links kept at (i,j) (0 = all), set in
+        # Map (-max_links)
+        self.max_links = max_links
     #
+    
     def add_link(self, link):
-        self.lg = [link] + self.lg
-        self.nlg += 1
+        """@
+        
+        inserts link in front of the links with a Vij that is not
+        better than its own, so lg stays ordered by Vij and, among the
+        links of equal Vij, the newest comes first as it did on the
+        push down stack that this replaced. At most max_links links
+        are kept: a link that falls behind the first max_links is
+        never stored. The place is found by bisection, so the work
+        and the memory at (i,j) stay bounded by max_links.
+        
+        """
+        
+        lg = self.lg
+        V  = link.Vij
+        lo = 0; hi = len(lg)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if lg[mid].Vij < V:
+                lo = mid + 1
+            else:
+                hi = mid
+            #
+            
+        #
+        
+        if self.max_links > 0 and lo >= self.max_links:
+            return
+        #
+        
+        lg.insert(lo, link)
+        if self.max_links > 0 and len(lg) > self.max_links:
+            del lg[self.max_links:]
+        #
+        
+        self.nlg = len(lg)
     #
     
 #
@@ -657,7 +701,7 @@ class ndx:
 # program. It stores a set of free energy values at _each_ position
 # (i,j).
 class Map:
-    def __init__(self, N):
+    def __init__(self, N, max_links = 0):
         self.N  = N
         if N <= 0:
             print ("ERROR: size of requested matrix (%d) makes no sense" % N)
@@ -666,6 +710,7 @@ class Map:
         
         self.ij = []
         self.glink = []
+        self.max_links = max_links # links kept at each (i,j) (0 = all)
         
         k = 0
         # build NxN matrix
@@ -674,7 +719,7 @@ class Map:
             glink_row = []
             for j in range(0,N):
                 ij_row   += [ndx(i,j,k)]
-                glink_row += [LGroup()]
+                glink_row += [LGroup(max_links)]
                 k += 1
             #
             
@@ -690,46 +735,46 @@ class Map:
     # is also used to sort the distribution of free energies when
     # obtaining the suboptimal structures
     def mergeSortLinks(self, alist):
-        # print("Splitting ",alist)
-        if len(alist)>1:
-            mid = len(alist)//2 # division for integers in python
-            lefthalf = alist[:mid]
-            righthalf = alist[mid:]
-            
-            self.mergeSortLinks(lefthalf)
-            self.mergeSortLinks(righthalf)
-            
-            i=0
-            j=0
-            k=0
-            while i < len(lefthalf) and j < len(righthalf):
-                if lefthalf[i].Vij < righthalf[j].Vij:
-                    alist[k]=lefthalf[i]
-                    i=i+1
-                else:
-                    alist[k]=righthalf[j]
-                    j=j+1
-                k=k+1
-            #
-            
-            while i < len(lefthalf):
-                alist[k]=lefthalf[i]
-                i=i+1
-                k=k+1
-            #
-            
-            while j < len(righthalf):
-                alist[k]=righthalf[j]
-                j=j+1
-                k=k+1
-            # print("Merging ",alist)
+        """@
+        
+        Sorts alist (in place) by Vij and returns it.
+        
+        This used to be a hand written recursive merge sort that
+        takes the right half on ties (Vij equal). That is the same as
+        a stable sort of the reversed list, so the order of degenerate
+        links is kept exactly while the work is done by the built-in
+        sort without allocating the slices. On a list kept by
+        LGroup.add_link(), this only reverses the runs of equal Vij.
+        
+        """
+        if len(alist) > 1:
+            alist[:] = sorted(reversed(alist), key = link_Vij)
         #
         
         return alist
-    #    
+    #
+    
+    def sort_links(self, i, j):
+        # sorts the links at (i,j); they are already ordered by Vij
+        # and within max_links (LGroup.add_link), so this settles the
+        # order of the degenerate links (and a list that was set
+        # directly) and keeps at most max_links of them. The cap
+        # drops alternatives behind the best link, i.e., the ones the
+        # traceback looks at in Trace.get_kref(); it does not bound
+        # the number of structures (see Trace.rank_list_M).
+        lgij = self.glink[i][j]
+        self.mergeSortLinks(lgij.lg)
+        if self.max_links > 0 and len(lgij.lg) > self.max_links:
+            del lgij.lg[self.max_links:]
+            lgij.nlg = len(lgij.lg)
+        #
+        
+    #
+    
     
 #
 
+
 # ####################################################################
 # ####################################################################
 # ####################################################################
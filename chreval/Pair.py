@@ -124,6 +124,8 @@ def is_pp_stem(ndx, Xlist):
 
 
 class Pair(object):
+    __slots__ = ('name', 'ch_i', 'i', 'ch_j', 'j', 'v', 'contacts')
+    
     def __init__(self):
         self.name = "bp"
         self.ch_i = ''
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+"""@@@
+
+Main Module:   PartitionFunction.py
+
+Objects:       PartitionFunction
+
+Author:        Wayne Dawson
+creation date: 2026 (separated from the Boltzmann/Cluster tools)
+last update:   2026
+version:       0
+
+
+Purpose:
+
+Computes the contact probabilities of the whole ensemble stored in
+the minFE tables (Calculate.minFE), in the manner of McCaskill's
+partition function, without enumerating structures.
+
+Cluster.ensemblelist() builds the *_BDwt.clust map by adding the
+Boltzmann weight of every thread that Trace enumerates. The threads
+are only the top level alternatives within dGrange, each completed
+with the best (minimum free energy) substructures, so the map is both
+costly and truncated. Here, each cell (i,j) is instead given its own
+partition function
+
+   Q(i,j) = sum_m exp(-dG_m/kBT) prod_b Q(b)
+
+where m runs over the motifs stored at (i,j) in smap.glink, b over
+the branches (subdomains) of m that Trace would descend into and dG_m
+is the free energy of m less the best free energies of its branches
+(the part of V_m that belongs to m itself). The outside pass then
+gives the probability of every motif at every cell, and the contact
+probability of (p,q) is the sum of the probabilities of the motifs
+that place (p,q).
+
+Which pairs a motif places and which branches it opens follow
+Trace.get_traces() and its make_Stemtrace(), make_PKtrace() and
+make_Islandtrace(), so that the contacts counted here are the same
+ones that Cluster.add_cluster() counts for a thread.
+
+Everything is carried as logarithms (Functions.LogSumExp), so large
+ensembles cannot overflow.
+
+"""
+
+import sys
+from math import exp
+
+from Functions import LogSumExp
+from BasicTools import initialize_matrix
+
+# for entropy calculations
+from Constants import kB # [kcal/molK] (Boltzmann constant)
+
+
+class PartitionFunction:
+    def __init__(self, calc):
+        self.calc = calc
+        self.N    = calc.N
+        self.smap = calc.fe.smap
+        self.kB   = kB
+        self.lnQ  = {}     # ln Q(i,j) of the cells in the ensemble
+        self.lnZ  = 0.0    # ln Q(0,N-1)
+        self.P    = []     # contact probabilities
+        self.debug = False
+    #
+
+    def Vbest(self, i, j):
+        lg = self.smap.glink[i][j].lg
+        if len(lg) == 0:
+            return 0.0
+        #
+
+        return lg[0].Vij
+    #
+
+    def decompose(self, i, j, mtf):
+        """@
+
+        returns (contacts, branches) of motif mtf at (i,j): the pairs
+        it places itself and the cells whose substructures it
+        contains. Branches are always strictly inside (i,j).
+
+        """
+
+        ctp = mtf.get_ctp()
+        btp = mtf.get_btp()
+        contacts = []
+        branches = []
+        if ctp == 'B':
+            contacts = [(i,j)]
+        elif ctp == 'I':
+            contacts = [(i,j)]
+            branches = mtf.get_branches()[:1]
+        elif ctp == 'M':
+            contacts = [(i,j)]
+            branches = mtf.get_branches()
+        elif ctp == 'J':
+            branches = mtf.get_branches()[:1]
+        elif ctp == 'P':
+            branches = mtf.get_branches()
+        elif ctp == 'S':
+            stem = mtf.get_branches()
+            stmlen = len(stem) - 1
+            if btp == 'sa' or btp == 'c':
+                # antiparallel: the head of the stem is its own cell
+                contacts = stem[:-1]
+                branches = [(i + stmlen, j - stmlen)]
+            else:
+                # parallel: the whole stem, then whatever is inside
+                contacts = stem
+                ihh = i + stmlen + 1; jhh = j - stmlen - 1
+                if ihh < jhh and len(self.smap.glink[ihh][jhh].lg) > 0:
+                    branches = [(ihh, jhh)]
+                #
+
+            #
+
+        elif ctp == 'K':
+            contacts = [x[0] for x in mtf.get_pks()]
+            branches = mtf.get_branches()
+        elif ctp == 'W':
+            contacts = list(mtf.get_wyspa())
+            branches = mtf.get_branches()
+        #
+
+        inside = []
+        for b in branches:
+            p = b[0]; q = b[1]
+            if i <= p and q <= j and q - p < j - i \
+               and len(self.smap.glink[p][q].lg) > 0:
+                inside += [(p, q)]
+            #
+
+        #|endfor
+
+        return contacts, inside
+    #
+
+    def get_motifs(self, i, j):
+        """@
+
+        the distinct motifs stored at (i,j) as a list of (lw,
+        contacts, branches), where lw = -dG_m/kBT is the log weight of
+        the motif itself (see the module comments).
+
+        """
+
+        kBT = self.kB * self.calc.T
+        mlist = []
+        seen  = set()
+        for lk in self.smap.glink[i][j].lg:
+            for mtf in lk.motif:
+                contacts, branches = self.decompose(i, j, mtf)
+                key = (mtf.get_ctp(), mtf.get_btp(),
+                       tuple(contacts), tuple(branches))
+                if key in seen:
+                    # the same structure reached by two searches
+                    continue
+                #
+
+                seen.add(key)
+                dG = lk.Vij
+                for b in branches:
+                    dG -= self.Vbest(b[0], b[1])
+                #|endfor
+
+                mlist += [(-dG / kBT, contacts, branches)]
+            #|endfor
+
+        #|endfor
+
+        return mlist
+    #
+
+    def calc_PF(self):
+        """@
+
+        inside (ln Q) and outside passes from the top cell (0,N-1);
+        sets lnZ and the contact probability matrix P.
+
+        """
+
+        N = self.N
+        top = (0, N-1)
+
+        # the cells that are part of the ensemble
+        motifs = {top: self.get_motifs(0, N-1)}
+        stack = [top]
+        while len(stack) > 0:
+            c = stack.pop()
+            for mm in motifs[c]:
+                for b in mm[2]:
+                    if not b in motifs:
+                        motifs[b] = self.get_motifs(b[0], b[1])
+                        stack += [b]
+                    #
+
+                #|endfor
+
+            #|endfor
+
+        #
+
+        cells = sorted(motifs, key = lambda v: (v[1] - v[0], v[0]))
+
+        # inside: smaller cells first
+        lnQ = {}
+        for c in cells:
+            terms = []
+            for mm in motifs[c]:
+                t = mm[0]
+                for b in mm[2]:
+                    t += lnQ[b]
+                #|endfor
+
+                terms += [t]
+            #|endfor
+
+            lnQ[c] = LogSumExp(terms)
+        #|endfor
+
+        self.lnQ = lnQ
+        self.lnZ = lnQ[top]
+        lnZ = self.lnZ
+
+        # outside: larger cells first
+        self.P = initialize_matrix([], N, 0.0)
+        outside = {top: [0.0]}
+        for c in reversed(cells):
+            lnO = LogSumExp(outside[c])
+            for mm in motifs[c]:
+                t = lnO + mm[0]
+                for b in mm[2]:
+                    t += lnQ[b]
+                #|endfor
+
+                p = exp(t - lnZ)
+                for v in mm[1]:
+                    self.P[v[0]][v[1]] += p
+                #|endfor
+
+                for b in mm[2]:
+                    outside.setdefault(b, []).append(t - lnQ[b])
+                #|endfor
+
+            #|endfor
+
+        #|endfor
+
+        if self.debug:
+            print ("PartitionFunction: %d cells, ln Z = %.6g" % (len(cells), lnZ))
+        #
+
+        return self.P
+    #
+
+    def ensemble_dG(self):
+        # free energy of the ensemble, -kBT ln Z
+        return - self.kB * self.calc.T * self.lnZ
+    #
+#
@@ -226,6 +226,48 @@ class InputSettings(object):
         # this re-scales the data by some fraction
         self.rescale_wt          = 1.0
         
+        # number of processes (Calculate.minFE: 1 = serial)
+        self.jobs                = 1
+        
+        # maximum span j - i of the DP ("full", "auto" or an integer)
+        self.max_span            = "full"
+        
+        # maximum number of links kept at each (i,j) (0 = all); this
+        # does not bound the number of structures (see topK)
+        self.max_links           = 0
+        
+        # CTCF islands with at most this many anchors take the best
+        # subset of anchors (0 = all anchors always bind)
+        self.island_max          = 30
+        
+        # keep the finished results (Manager) in the result cache,
+        # limited to cache_max MB (least recently used go first)
+        self.cache               = False
+        self.cache_max           = 2000
+        
+        # build the structures when they are used rather than keeping
+        # the whole ensemble (Trace.iter_traces_top)
+        self.stream              = False
+        
+        # traceback limits: keep only the topK structures of lowest
+        # free energy (0 = all) and only those within dG_window of the
+        # structure of lowest free energy (0 = no limit)
+        self.topK                = 0
+        self.dG_window           = 0.0
+        
+        # contact probabilities (*_BDwt.clust) from the partition
+        # function of the whole ensemble (PartitionFunction) rather
+        # than from the enumerated structures
+        self.pf                  = False
+        
+        # keep the structures in a columnar store (Ensemble) and write
+        # it to *_ensemble.bens
+        self.ensemble            = False
+        
+        # write the structures only to that file (an archive, see
+        # extract_structures.py) rather than one set of files each
+        self.archive             = False
+        
         
         # AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
         # AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
@@ -104,6 +104,17 @@ def usage():
 # ################################################################
 
 
+class TraceRef:
+    # a thread of Trace.iter_traces_top() by its place in list_M (k)
+    # and its free energy, for sorting without keeping the thread
+    def __init__(self, k, dG):
+        self.k  = k
+        self.dG = dG
+        self.lt = None # the thread, when it is kept
+    #
+#
+
+
 class Trace:
     def __init__(self, calc):
         # calc: the object Calculate()
@@ -118,6 +129,12 @@ class Trace:
         
         # the linkage thread variable
         self.lt = [] # [LThread()] # 
+        self.lt_dG = [] # dG of the threads (iter_traces_top)
+        self.lt_src = None # how to build them again (iter_traces)
+        
+        # traceback limits (see rank_list_M)
+        self.topK      = self.calc.topK      # 0: all structures
+        self.dG_window = self.calc.dG_window # 0: no limit
         self.debug_traces_top = DEBUG_get_traces_top
         # find hot spot regions for further search
         self.debug_get_traces = DEBUG_get_traces
@@ -797,6 +814,66 @@ class Trace:
     # find the minimum free energy
     def get_traces_top(self, hs, ndx, layer, flag_filter):
         
+        i_top, j_top, list_M = self.get_list_M(hs, layer)
+        
+        if self.debug_traces_top:
+            print ("add_localscan_for_M: enter")
+        #
+        
+        if self.topK > 0 or self.dG_window > 0.0:
+            refs = self.rank_list_M(i_top, j_top, list_M, True)
+            self.lt = [ref.lt for ref in refs]
+        else:
+            self.add_localscan_for_M(i_top, j_top, list_M)
+        #
+        
+        if self.debug_traces_top:
+            print ("get_traces_top -> add_localscan_for_M")
+            a = DispLThread(self.calc.N)
+            a.disp_LThread(self.lt)
+            print ("finished add_localscan_for_M")
+            #print ("Stop at 4 in get_traces_top"); sys.exit(0)
+        #endif
+        
+        # VVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVV
+        # VVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVV
+        # VVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVV
+        
+        # 190128: I think this part is unnecessary because the task
+        # should have already been done when I ran prune_list_M().
+        
+        use_prune_lt = False
+        if use_prune_lt:
+            if self.debug_traces_top:
+                print ("get_traces_top -> prune_lt")
+            #
+            
+            self.lt = self.prune_lt(self.lt)
+            if self.debug_traces_top:
+                print ("finished get_traces_top -> prune_lt: -----------")
+                a = DispLThread(self.calc.N)
+                a.disp_LThread(self.lt)
+                print ("----------- :finished get_traces_top -> prune_lt")
+                #print ("Stop at 5 in get_traces_top"); sys.exit(0)
+            #
+            
+            if self.debug_traces_top:
+                print ("add_localscan_for_M: exit")
+                #print ("Stop at 6 in get_traces_top"); sys.exit(0)
+            #
+            
+        #
+        
+        # AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
+        # AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
+        # AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
+        #
+    #
+    
+    def get_list_M(self, hs, layer):
+        # the candidate structures (list_M) of the top (hot spot) hs,
+        # sorted by free energy and without duplicates
+        
         i_top = hs[0][0]; j_top = hs[0][1]
         ctp_top = hs[0][2]
         V_top   = hs[0][3]
@@ -847,52 +924,99 @@ class Trace:
             
         #
         
-        if self.debug_traces_top:
-            print ("add_localscan_for_M: enter")
-        #
+        return i_top, j_top, list_M
+    #
+    
+    def iter_traces_top(self, hs, ndx, layer, flag_filter):
+        """@
         
-        self.add_localscan_for_M(i_top, j_top, list_M)
-        if self.debug_traces_top:
-            print ("get_traces_top -> add_localscan_for_M")
-            a = DispLThread(self.calc.N)
-            a.disp_LThread(self.lt)
-            print ("finished add_localscan_for_M")
-            #print ("Stop at 4 in get_traces_top"); sys.exit(0)
-        #endif
+        generator version of get_traces_top(): yields the same threads
+        (LThread) in the same order (increasing dG, ties as in
+        mergeSortTraces), but builds them one at a time, so only the
+        thread being used is kept, not the whole ensemble.
+        
+        To know the order before the first thread is given out, each
+        candidate in list_M is first built once just for its free
+        energy. Only (index, dG) is kept from that pass (TraceRef), and
+        the free energies in the final order are in self.lt_dG (for
+        Boltzmann.calc_Z_dG()) when the first thread comes out. Each
+        thread is then built again when its turn comes. Building a
+        thread from list_M only touches that thread, so the result is
+        the same as in the full list. Later passes over the same
+        threads can use iter_traces().
         
-        # VVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVV
-        # VVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVV
-        # VVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVV
+        """
         
-        # 190128: I think this part is unnecessary because the task
-        # should have already been done when I ran prune_list_M().
+        i_top, j_top, list_M = self.get_list_M(hs, layer)
         
-        use_prune_lt = False
-        if use_prune_lt:
-            if self.debug_traces_top:
-                print ("get_traces_top -> prune_lt")
-            #
-            
-            self.lt = self.prune_lt(self.lt)
-            if self.debug_traces_top:
-                print ("finished get_traces_top -> prune_lt: -----------")
-                a = DispLThread(self.calc.N)
-                a.disp_LThread(self.lt)
-                print ("----------- :finished get_traces_top -> prune_lt")
-                #print ("Stop at 5 in get_traces_top"); sys.exit(0)
-            #
-            
-            if self.debug_traces_top:
-                print ("add_localscan_for_M: exit")
-                #print ("Stop at 6 in get_traces_top"); sys.exit(0)
+        refs = self.rank_list_M(i_top, j_top, list_M, False)
+        self.lt_dG = [ref.dG for ref in refs]
+        self.lt_src = (i_top, j_top, list_M, [ref.k for ref in refs])
+        
+        for ltk in self.iter_traces():
+            yield ltk
+        #|endfor
+        
+    #
+    
+    def rank_list_M(self, i_top, j_top, list_M, keep_lt):
+        """@
+        
+        builds the candidates in list_M one at a time and returns them
+        (TraceRef: place in list_M and dG, and the thread itself if
+        keep_lt) in the order of mergeSortTraces.
+        
+        With the limits topK and dG_window, only the topK threads of
+        lowest free energy within dG_window of the best thread are
+        kept. V in list_M (the estimate from the minFE tables) is not
+        a lower bound to the dG of the thread built from it (the
+        thread is evaluated again, e.g., the CTCF islands, and the
+        difference has no bound that could be known beforehand), so
+        every candidate is built and the limits are applied to the
+        finished threads: they limit the output, not the work.
+        
+        """
+        
+        dG_best = INFINITY
+        refs = []
+        for k in range(0, len(list_M)):
+            self.lt = []
+            self.add_localscan_for_M(i_top, j_top, [list_M[k]])
+            ltk = self.lt[0]
+            dG_best = min(dG_best, ltk.dG)
+            
+            ref = TraceRef(k, ltk.dG)
+            if keep_lt:
+                ref.lt = ltk
             #
             
+            refs += [ref]
+        #|endfor
+        
+        self.lt = []
+        refs = self.mergeSortTraces(refs)
+        if self.dG_window > 0.0:
+            refs = [ref for ref in refs if ref.dG <= dG_best + self.dG_window]
         #
         
-        # AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
-        # AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
-        # AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
-        # 
+        if self.topK > 0:
+            refs = refs[:self.topK]
+        #
+        
+        return refs
+    #
+    
+    def iter_traces(self):
+        # the threads of the last iter_traces_top(), built again
+        i_top, j_top, list_M, order = self.lt_src
+        for k in order:
+            self.lt = []
+            self.add_localscan_for_M(i_top, j_top, [list_M[k]])
+            ltk = self.lt[0]
+            self.lt = []
+            yield ltk
+        #|endfor
+        
     #
     
     # removes redundant solutions from the list obtained by
@@ -281,6 +281,9 @@ def compress_to_jbranches(plist):
                 del plist[l]
             elif jk < il:
                 flag_cont = False
+            else:
+                # (il,jl) crosses (ik,jk), keep it and move on
+                l += 1
             #
             
         #|endwhile
@@ -201,6 +201,28 @@ def usage():
 
 
 
+def saveDotBracketString(flnm, lt, dbstring):
+    # dbstring: from LThread2DotBracket.getLThread2DotBracket()
+    ff = flnm.split('.')
+    if not lt.p == -99.99:
+        s = "> %s    %8.3f   %10.8f\n" % (ff[0], lt.dG, lt.p)
+    else:
+        s = "> %s    %8.3f\n" % (ff[0], lt.dG)
+    #
+    
+    s += dbstring
+    try:
+        fp = open(flnm, 'w')
+    except IOError:
+        print ("ERROR: cannot open %s" % flnm)
+        sys.exit(1)
+    #
+    
+    fp.write(s)
+    fp.close()
+#
+
+
 class LThread2DotBracket(object):
     
     def __init__(self, N, fe):
@@ -331,23 +353,7 @@ class LThread2DotBracket(object):
     #
     
     def saveDotBracketString(self, flnm, lt, dbstring):
-        ff = flnm.split('.')
-        if not lt.p == -99.99:
-            s = "> %s    %8.3f   %10.8f\n" % (ff[0], lt.dG, lt.p)
-        else:
-            s = "> %s    %8.3f\n" % (ff[0], lt.dG)
-        #
-        
-        s += dbstring
-        try:
-            fp = open(flnm, 'w')
-        except IOError:
-            print ("ERROR: cannot open %s" % flnm)
-            sys.exit(1)
-        #
-        
-        fp.write(s)
-        fp.close()
+        saveDotBracketString(flnm, lt, dbstring)
     #
     
     
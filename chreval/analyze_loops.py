@@ -161,6 +161,10 @@ analyze_loops.py (ANALyze LOOPS)
 # python functions
 import sys
 import os
+import copy
+import json
+import hashlib
+import multiprocessing
 import chreval
 
 # local functions
@@ -174,17 +178,44 @@ from Functions import hamming_bin
 from Functions import hamming_str
 from Functions import similar
 
+from BasicTools import ncpu
+
 from LThread import DispLThread
 
 # labels
 PROGRAM = "analyze_loops.py"
 
+# settings that do not change the results of a loop (the journal of
+# -resume is keyed on all the others, see chreval.settings_digest())
+journal_skip = ["parser", "program", "allowed_extns", "EXTS", "f_output",
+                "resume", "jobs", "cache", "cache_max", "debug_GetOpts",
+                "set_GetOpts", "show_info"]
+
 def usage():
     print ("USAGE: %s -ff file.bed file.bed ... " % PROGRAM)
 #
 
 
 
+# ################################################################
+# ########  loop worker (used with -jobs N, see analyze_loops) ####
+# ################################################################
+
+# Each worker receives the AnalyzeLoops object and the settings once
+# (al_init); after that, only the keys go out, in chunks, and the
+# finished lines come back.
+al_tables = {}
+
+def al_init(an, cl):
+    al_tables['an'] = an
+    al_tables['cl'] = cl
+#
+
+def al_run_loop(ky):
+    return al_tables['an'].evaluate_loop(al_tables['cl'], ky)
+#
+
+
 class AnalyzeLoops:
     def __init__(self, data):
         self.debug        = False
@@ -198,6 +229,7 @@ class AnalyzeLoops:
         self.range_TddS   = 2.0
         self.range_ddG    = 2.0
         self.hm_missing   = []
+        self.jobs         = 1 # number of loops evaluated at once
     #
     
     def get_PET_wt(self, ky, wt):
@@ -269,6 +301,460 @@ class AnalyzeLoops:
     #
     
     
+    def evaluate_loop(self, cl, ky):
+        """@
+        
+        Runs chreval on the heatmap of the loop ky and builds the
+        lines that analyze_loops() writes to the main, *_dG.dat and
+        *_p.dat files. Nothing is written here, so this can run in the
+        worker processes of the pool (-jobs N).
+        
+        returns: flhd and either None (missing heatmap) or the tuple
+        (PET weight, epigenetic state, output, output_dG, output_p)
+        
+        """
+        
+        flag_basic       = self.flag_basic
+        flag_similar     = self.flag_similar
+        flag_hamming_bin = self.flag_hamming_bin
+        flag_hamming     = self.flag_hamming
+        flag_TdS         = self.flag_TdS
+        flag_ddG         = self.flag_ddG
+        flag_allwts      = self.flag_allwts
+        epilist          = self.epilist
+        wt_PETo          = self.wt_PETo
+        
+        p_active    = 0.0
+        p_open      = 0.0
+        p_repressed = 0.0
+        p_A         = 0.0
+        p_B         = 0.0
+        
+        # this now shows that I can extract whatever datapoint I
+        # desire from the set of experimental data. Therefore, I
+        # can read in all the data and extract it according to my
+        # needs.
+        
+        name = self.cdata[ky].name
+        bgn  = self.cdata[ky].bgn
+        end  = self.cdata[ky].end
+        
+        flhd = make_file_heading(name, bgn, end, self.res)
+        
+        # #######################################################
+        # verify that the files exist or not. If they are missing
+        # then skip any further analysis.
+        # #######################################################
+        
+        flnm = flhd + ".heat"
+        if self.use_eheat:
+            flnm = flhd + ".eheat"
+        #
+        
+        print ("file %s exists? %s" % (flnm, os.path.exists(flnm)))
+        
+        if not os.path.exists(flnm):
+            return flhd, None
+        #
+        
+        
+        
+        # ##################################################
+        # ########   compute the FE of the heatmap  ########
+        # ########      and epigenetic factors      ########
+        # ##################################################
+        
+        cl.PETwt = wt_PETo
+        if self.datatype == 'type1': 
+            p_active, p_open, p_repressed, p_A, p_B = self.data.get_type1_prob(ky)
+        elif self.datatype == 'type2':
+            p_active, p_open, p_repressed, p_A, p_B = self.data.get_type2_prob(ky)
+            cl.PETwt = self.get_PET_wt(ky, wt_PETo)
+        #
+        
+        self.cdata[ky].state["active"]    = p_active
+        self.cdata[ky].state["open"]      = p_open
+        self.cdata[ky].state["repressed"] = p_repressed
+        self.cdata[ky].state["A"]         = p_A
+        self.cdata[ky].state["B"]         = p_B
+        
+        # configuration settings
+        flnm = flhd + ".heat"
+        if self.use_eheat:
+            flnm = flhd + ".eheat"
+        #
+        
+        cl.f_heatmap     = [flnm]
+        cl.allowed_extns = cl.EXTS["chreval.py"]
+        # have to override the extension settings when calling
+        # programs such as chreval.py that involve heatmaps.
+        
+        
+        print ("\n\nfile name: %s" % flnm)
+        manager = chreval.Manager()
+        manager.runCalculations(cl)
+        # manager.printResults()
+        
+        # the structures in order of free energy (with -stream, they
+        # are built as they are used; see Manager.iter_threads)
+        lts    = manager.iter_threads()
+        lt_0   = next(lts)
+        
+        # (2,3) make a lists of all dG and p(dG) data
+        dG_list = "%10.2f " % lt_0.dG
+        p_list  = "%10.3g " % lt_0.p
+        
+        length = manager.N
+        dt     = DispLThread(manager.calc.N)
+        pr     = lt_0.p
+        pr_h   = pr
+        ham_include   = 0
+        pr_s   = pr
+        sim_include   = 0
+        pr_TdS = pr
+        dTdSp_include = 0
+        pr_ddG = pr 
+        ddGp_include  = 0
+        TdS_0  = lt_0.TdS
+        dG_0   = lt_0.dG
+        s_0    = dt.makeLThreadDotBracket_1b(lt_0, 0)
+        
+        
+        # True option produces only the structure string
+        
+        if flag_allwts:
+            print ("start-->[%4d]: %s   %8.3g" \
+                % (0, s_0,              pr))
+            sim_include += 1
+            ham_include += 1
+            dTdSp_include += 1
+            ddGp_include += 1
+        elif flag_hamming_bin:
+            print ("start-->[%4d]: %s   %8.4f   %3d   %8.3g" \
+                % (0, s_0, 1.0, 0,      pr))
+            ham_include += 1
+        elif flag_hamming:  # based on string edits
+            print ("start-->[%4d]: %s   %8.4f   %3d   %8.3g" \
+                % (0, s_0, 1.0, 0,      pr))
+            ham_include += 1
+        elif flag_TdS:
+            print ("start-->[%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
+                % (0, s_0, 1.0, 0, 0.0, pr))
+            dTdSp_include += 1
+        elif flag_ddG:
+            print ("start-->[%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
+                % (0, s_0, 1.0, 0, 0.0, pr))
+            ddGp_include += 1
+        elif flag_similar:
+            print ("start-->[%4d]: %s   %8.4f   %8.3g" \
+                % (0, s_0, 1.0,         pr))
+            sim_include += 1
+        elif flag_basic:
+            print ("start-->[%4d]: %s   %8.3g" \
+                % (0, s_0,              pr))
+        #
+        
+        cnt = 0
+        for ltk in lts:
+            cnt += 1
+            dG_list += "%10.2f " % ltk.dG
+            p_list  += "%10.3g " % ltk.p
+            
+            # I start to wonder what this is really doing. It
+            # doesn't seem to be adding any new information, or
+            # maybe I have missed something.
+            
+            s_cnt = dt.makeLThreadDotBracket_1b(ltk, True)
+            p_cnt = ltk.p
+            if flag_allwts:
+                if self.debug:
+                    print ("        [%4d]: %s   %8.3g" \
+                        % (cnt, s_cnt, p_cnt))
+                #
+                
+                if similar(s_0, s_cnt) > 0.95:
+                    if self.debug:
+                        print ("included[%4d]: %s   %8.4f   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), p_cnt))
+                    #
+                    
+                    pr_s += ltk.p
+                    sim_include += 1
+                #
+                
+                if hamming_str(s_0, s_cnt) < 5:
+                    if self.debug:
+                        print ("included[%4d]: %s   %8.4f   %3d   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), p_cnt))
+                    #
+                    
+                    pr_h += ltk.p
+                    ham_include += 1
+                #
+                
+                TdS_cnt = ltk.TdS
+                delta_TdS = TdS_0 - TdS_cnt
+                if -self.range_TddS < delta_TdS and delta_TdS < self.range_TddS:
+                    if self.debug:
+                        print ("included[%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), delta_TdS, p_cnt))
+                    #
+                    
+                    pr_TdS += ltk.p
+                    dTdSp_include += 1
+                #
+                
+                dG_cnt = ltk.dG
+                delta_dG = dG_cnt - dG_0
+                if delta_dG < self.range_ddG:
+                    if self.debug:
+                        print ("included[%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), delta_dG, p_cnt))
+                    #
+                    
+                    pr_ddG += ltk.p
+                    ddGp_include += 1
+                #
+                
+            elif flag_hamming_bin:
+                if hamming_bin(s_0, s_cnt) < 5:
+                    if self.debug:
+                        print ("included[%4d]: %s   %8.4f   %3d   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), hamming_bin(s_0,s_cnt), p_cnt))
+                    #
+                    
+                    pr_h += ltk.p
+                    ham_include += 1
+                else:
+                    if self.debug:
+                        print ("        [%4d]: %s   %8.4f   %3d   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), hamming_bin(s_0,s_cnt), p_cnt))
+                    #
+                    
+                #
+                
+            elif flag_hamming: # based on string edits
+                if hamming_str(s_0, s_cnt) < 5:
+                    if self.debug:
+                        print ("included[%4d]: %s   %8.4f   %3d   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), p_cnt))
+                    #
+                    
+                    pr_h += ltk.p
+                    ham_include += 1
+                    
+                else:
+                    if self.debug:
+                        print ("        [%4d]: %s   %8.4f   %3d   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), p_cnt))
+                    #
+                    
+                #
+                
+            elif flag_TdS:
+                TdS_cnt = ltk.TdS
+                delta_TdS = TdS_0 - TdS_cnt
+                if -self.range_TddS < delta_TdS and delta_TdS < self.range_TddS:
+                    if self.debug:
+                        print ("included[%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), delta_TdS, p_cnt))
+                    #
+                    
+                    pr_TdS += ltk.p
+                    dTdSp_include += 1
+                    
+                else:
+                    if self.debug:
+                        print ("        [%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), delta_TdS, p_cnt))
+                    #
+                    
+                #
+                
+            elif flag_ddG:
+                dG_cnt = ltk.dG
+                delta_dG = dG_cnt - dG_0
+                if delta_dG < self.range_ddG:
+                    if self.debug:
+                        print ("included[%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), delta_dG, p_cnt))
+                    #
+                    
+                    pr_ddG += ltk.p
+                    ddGp_include += 1
+                    
+                else:
+                    if self.debug:
+                        print ("        [%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), delta_dG, p_cnt))
+                    #
+                    
+                #
+                
+            elif flag_similar:
+                if similar(s_0, s_cnt) > 0.95:
+                    if self.debug:
+                        print ("included[%4d]: %s   %8.4f   %8.3g" \
+                               % (cnt, s_cnt, similar(s_0,s_cnt), p_cnt))
+                    #
+                    
+                    pr_s += ltk.p
+                    sim_include += 1
+                    
+                else:
+                    if self.debug:
+                        print ("        [%4d]: %s   %8.4f   %8.3g" \
+                            % (cnt, s_cnt, similar(s_0,s_cnt), p_cnt))
+                    #
+                    
+                #
+                
+            elif flag_basic:
+                # just the first boltzmann probability 
+                if self.debug:
+                    print ("        [%4d]: %s   %8.3g" \
+                        % (cnt, s_cnt, p_cnt))
+                #
+                
+            #
+            
+            else:
+                print ("analyze_loops(): Sorry, something is really fucked up")
+                sys.exit(1)
+            #
+            
+        #|endfor
+        
+        # self.datatype == 'type1': // self.datatype == 'type2':
+        # store the information in a temporary buffer
+        
+        # (1) the main file results for current calculation
+        dGbar = dG_0 / float(length)
+        TdSbar = TdS_0 / float(length)
+        output =  "%s  %5d  %8.2f  %8.2f  %8.3f  %8.3f   " \
+                  % (self.cdata[ky].disp_data(), length, dG_0, TdS_0, dGbar, TdSbar)
+        
+        if flag_allwts:
+            output +=  "%8.5f  " % pr
+            output +=  "%8.5f  %4d  " % (pr_s, sim_include)
+            output +=  "%8.5f  %4d  " % (pr_h, ham_include)
+            output +=  "%8.5f  %4d  " % (pr_TdS, dTdSp_include)
+            output +=  "%8.5f  %4d  " % (pr_ddG, ddGp_include)
+        elif flag_similar:
+            output +=  "%8.5f  %4d  " % (pr_s, sim_include)
+        elif flag_hamming:  # based on string edits
+            output +=  "%8.5f  %4d  " % (pr_h, ham_include)
+        elif flag_TdS:
+            output +=  "%8.5f  %4d  " % (pr_TdS, dTdSp_include)
+        elif flag_ddG:
+            output +=  "%8.5f  %4d  " % (pr_ddG, ddGp_include)
+        else:
+            # boltzmann probabity of the first structure
+            output +=  "%8.5f  " % pr
+        #
+        
+        
+        if self.datatype == 'type1':
+            output += "  %8.5f  %8.5f  %8.5f  %8.5f  %8.5f\n" \
+                      % (p_active, p_open, p_repressed, p_A, p_B)
+        else:
+            for kxs in epilist:
+                output += "  %8.5f" % self.cdata[ky].state[kxs]
+            #|endfor
+            
+            output += "\n" 
+        #
+        
+        # (2) the secondary information file results for current calculation
+        output_dG =  "%s  %5d    " % (self.cdata[ky].disp_data(), length)
+        output_dG += dG_list
+        output_dG += "\n" 
+        
+        # (3) the secondary information file results for current calculation
+        output_p =  "%s  %5d    " % (self.cdata[ky].disp_data(), length)
+        output_p += p_list
+        output_p += "\n" 
+        
+        return flhd, (cl.PETwt, dict(self.cdata[ky].state),
+                      output, output_dG, output_p)
+    #
+    
+    
+    def read_journal(self, flnm, header):
+        """@
+        
+        Reads the journal of an earlier (interrupted) run. The first
+        line holds the header of that run; each following line is one
+        finished loop, keyed by make_file_heading(name,bgn,end,res),
+        with everything that was written for it. If the header differs
+        from the present one, the journal is not used. A line that was
+        cut off by the interruption is ignored.
+        
+        """
+        
+        journal = {}
+        if not os.path.exists(flnm):
+            return journal
+        #
+        
+        fp = open(flnm, 'r')
+        lines = fp.readlines()
+        fp.close()
+        
+        try:
+            jheader = json.loads(lines[0])["header"]
+        except (IndexError, ValueError, KeyError):
+            jheader = None
+        #
+        
+        if not jheader == header:
+            print ("WARNING: the journal %s is from a run with other settings;" % flnm)
+            print ("         starting from the beginning")
+            return journal
+        #
+        
+        for ln in lines[1:]:
+            try:
+                rec = json.loads(ln)
+            except ValueError:
+                continue
+            #
+            
+            journal[rec["key"]] = (rec["PETwt"], rec["state"],
+                                   rec["output"], rec["output_dG"], rec["output_p"])
+        #|endfor
+        
+        return journal
+    #
+    
+    def write_journal(self, flnm, header, journal):
+        # (re)start the journal with the header and the loops kept
+        # from the earlier run
+        fp = open(flnm, 'w')
+        fp.write(json.dumps({"header" : header}) + '\n')
+        for flhd in journal:
+            self.write_journal_entry(fp, flhd, journal[flhd])
+        #|endfor
+        
+        fp.close()
+    #
+    
+    def append_journal(self, flnm, flhd, rslt):
+        fp = open(flnm, 'a')
+        self.write_journal_entry(fp, flhd, rslt)
+        fp.close()
+    #
+    
+    def write_journal_entry(self, fp, flhd, rslt):
+        PETwt, state, output, output_dG, output_p = rslt
+        fp.write(json.dumps({ "key"       : flhd,
+                              "PETwt"     : PETwt,
+                              "state"     : state,
+                              "output"    : output,
+                              "output_dG" : output_dG,
+                              "output_p"  : output_p }) + '\n')
+    #
+    
     def analyze_loops(self, cl):
         print ("analyze_loops()")
         keylist = self.keylist
@@ -285,6 +771,7 @@ class AnalyzeLoops:
         self.oflnm              = cl.f_output
         self.iflnms             = cl.f_activity
         self.use_eheat          = cl.use_eheat
+        self.jobs               = cl.jobs
         
         full_cmplxtydict = { 'cmplx1' : False,
                              'cmplx2' : False,
@@ -342,13 +829,9 @@ class AnalyzeLoops:
         
         self.hm_missing  = []
         
-        p_active    = 0.0
-        p_open      = 0.0
-        p_repressed = 0.0
-        p_A         = 0.0
-        p_B         = 0.0
         rPET_wt     = []
-        wt_PETo     = cl.PETwt
+        self.wt_PETo = cl.PETwt
+        self.epilist = epilist
         
         
         flag_basic        = cl.basic       # the first Boltzmann prob
@@ -361,6 +844,14 @@ class AnalyzeLoops:
         self.range_ddG    = cl.ddG_range   # sets either default or set value
         flag_allwts       = cl.allwts      # show all weights (default)
         
+        self.flag_basic       = flag_basic
+        self.flag_similar     = flag_similar
+        self.flag_hamming_bin = flag_hamming_bin
+        self.flag_hamming     = flag_hamming
+        self.flag_TdS         = flag_TdS
+        self.flag_ddG         = flag_ddG
+        self.flag_allwts      = flag_allwts
+        
         
         header = self.disp_header(cl)
         
@@ -435,358 +926,114 @@ class AnalyzeLoops:
         fp.close()
         
         
+        # (4) the journal of the finished loops (only with -resume)
+        flnm_journal = rflhd + "_journal.dat"
+        # the journal is only valid for the same settings: the header,
+        # the columns and the digest of all the settings that can
+        # change the results (DP, traceback, weights, ranges, ...)
+        jheader  = header
+        jheader += "%s%s%s\n" % (dlabel, plabel, edatfld)
+        jheader += "# settings = %s\n" \
+                   % chreval.settings_digest(hashlib.sha256(), cl, journal_skip).hexdigest()
+        journal = {}
+        if cl.resume:
+            journal = self.read_journal(flnm_journal, jheader)
+            print ("resume: %d loops already finished in %s" \
+                % (len(journal), flnm_journal))
+            self.write_journal(flnm_journal, jheader, journal)
+        #
+        
+        todo = []
         for ky in keylist:
-            # this now shows that I can extract whatever datapoint I
-            # desire from the set of experimental data. Therefore, I
-            # can read in all the data and extract it according to my
-            # needs.
-            
-            name = self.cdata[ky].name
-            bgn  = self.cdata[ky].bgn
-            end  = self.cdata[ky].end
-            
-            flhd = make_file_heading(name, bgn, end, self.res)
-            
-            # #######################################################
-            # verify that the files exist or not. If they are missing
-            # then skip any further analysis.
-            # #######################################################
-            
-            flnm = flhd + ".heat"
-            if self.use_eheat:
-                flnm = flhd + ".eheat"
-            #
-            
-            print ("file %s exists? %s" % (flnm, os.path.exists(flnm)))
-            
-            if not os.path.exists(flnm):
-                self.hm_missing += [ flhd ]
-                continue
+            flhd = make_file_heading(self.cdata[ky].name,
+                                     self.cdata[ky].bgn,
+                                     self.cdata[ky].end, self.res)
+            if not flhd in journal:
+                todo += [ky]
             #
             
-            
-            
-            # ##################################################
-            # ########   compute the FE of the heatmap  ########
-            # ########      and epigenetic factors      ########
-            # ##################################################
-            
-            cl.PETwt = wt_PETo
-            if self.datatype == 'type1': 
-                p_active, p_open, p_repressed, p_A, p_B = self.data.get_type1_prob(ky)
-            elif self.datatype == 'type2':
-                p_active, p_open, p_repressed, p_A, p_B = self.data.get_type2_prob(ky)
-                cl.PETwt = self.get_PET_wt(ky, wt_PETo)
-            #
-            
-            self.cdata[ky].state["active"]    = p_active
-            self.cdata[ky].state["open"]      = p_open
-            self.cdata[ky].state["repressed"] = p_repressed
-            self.cdata[ky].state["A"]         = p_A
-            self.cdata[ky].state["B"]         = p_B
-            rPET_wt += [ [ cl.PETwt, flhd ] ] 
-            
-            # configuration settings
-            flnm = flhd + ".heat"
-            if self.use_eheat:
-                flnm = flhd + ".eheat"
-            #
-            
-            cl.f_heatmap     = [flnm]
-            cl.allowed_extns = cl.EXTS["chreval.py"]
-            # have to override the extension settings when calling
-            # programs such as chreval.py that involve heatmaps.
-            
-            
-            print ("\n\nfile name: %s" % flnm)
-            manager = chreval.Manager()
-            manager.runCalculations(cl)
-            # manager.printResults()
-            
-            length = manager.N
-            dt     = DispLThread(manager.calc.N)
-            pr     = manager.trace.lt[0].p
-            pr_h   = pr
-            ham_include   = 0
-            pr_s   = pr
-            sim_include   = 0
-            pr_TdS = pr
-            dTdSp_include = 0
-            pr_ddG = pr 
-            ddGp_include  = 0
-            TdS_0  = manager.trace.lt[0].TdS
-            dG_0   = manager.trace.lt[0].dG
-            s_0    = dt.makeLThreadDotBracket_1b(manager.trace.lt[0], 0)
-            
-            
-            # True option produces only the structure string
-            
-            if flag_allwts:
-                print ("start-->[%4d]: %s   %8.3g" \
-                    % (0, s_0,              pr))
-                sim_include += 1
-                ham_include += 1
-                dTdSp_include += 1
-                ddGp_include += 1
-            elif flag_hamming_bin:
-                print ("start-->[%4d]: %s   %8.4f   %3d   %8.3g" \
-                    % (0, s_0, 1.0, 0,      pr))
-                ham_include += 1
-            elif flag_hamming:  # based on string edits
-                print ("start-->[%4d]: %s   %8.4f   %3d   %8.3g" \
-                    % (0, s_0, 1.0, 0,      pr))
-                ham_include += 1
-            elif flag_TdS:
-                print ("start-->[%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
-                    % (0, s_0, 1.0, 0, 0.0, pr))
-                dTdSp_include += 1
-            elif flag_ddG:
-                print ("start-->[%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
-                    % (0, s_0, 1.0, 0, 0.0, pr))
-                ddGp_include += 1
-            elif flag_similar:
-                print ("start-->[%4d]: %s   %8.4f   %8.3g" \
-                    % (0, s_0, 1.0,         pr))
-                sim_include += 1
-            elif flag_basic:
-                print ("start-->[%4d]: %s   %8.3g" \
-                    % (0, s_0,              pr))
+        #|endfor
+        
+        # each loop is independent of the others. With -jobs N, the
+        # loops are shared out over N worker processes (each running
+        # chreval with one process) in chunks of keys, and the results
+        # come back in the order of keylist, so the files are written
+        # in the same order as in the serial calculation. More
+        # processes than loops or processors would only add overhead.
+        
+        jobs = min(self.jobs, len(todo), ncpu())
+        if self.jobs > 1 and jobs < self.jobs:
+            print ("-jobs %d: using %d process(es) (%d loops, %d processors)" \
+                % (self.jobs, max(jobs, 1), len(todo), ncpu()))
+        #
+        
+        # (chreval itself runs with one process in either case)
+        cl_job = copy.copy(cl)
+        cl_job.jobs = 1
+        if jobs <= 1:
+            results = (self.evaluate_loop(cl_job, ky) for ky in todo)
+            pool = None
+        else:
+            # fork where the platform has it, spawn otherwise
+            method = "spawn"
+            if "fork" in multiprocessing.get_all_start_methods():
+                method = "fork"
             #
             
-            for cnt in range(1, len(manager.trace.lt)):
-                
-                # I start to wonder what this is really doing. It
-                # doesn't seem to be adding any new information, or
-                # maybe I have missed something.
-                
-                s_cnt = dt.makeLThreadDotBracket_1b(manager.trace.lt[cnt], True)
-                p_cnt = manager.trace.lt[cnt].p
-                if flag_allwts:
-                    if self.debug:
-                        print ("        [%4d]: %s   %8.3g" \
-                            % (cnt, s_cnt, p_cnt))
-                    #
-                    
-                    if similar(s_0, s_cnt) > 0.95:
-                        if self.debug:
-                            print ("included[%4d]: %s   %8.4f   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), p_cnt))
-                        #
-                        
-                        pr_s += manager.trace.lt[cnt].p
-                        sim_include += 1
-                    #
-                    
-                    if hamming_str(s_0, s_cnt) < 5:
-                        if self.debug:
-                            print ("included[%4d]: %s   %8.4f   %3d   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), p_cnt))
-                        #
-                        
-                        pr_h += manager.trace.lt[cnt].p
-                        ham_include += 1
-                    #
-                    
-                    TdS_cnt = manager.trace.lt[cnt].TdS
-                    delta_TdS = TdS_0 - TdS_cnt
-                    if -self.range_TddS < delta_TdS and delta_TdS < self.range_TddS:
-                        if self.debug:
-                            print ("included[%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), delta_TdS, p_cnt))
-                        #
-                        
-                        pr_TdS += manager.trace.lt[cnt].p
-                        dTdSp_include += 1
-                    #
-                    
-                    dG_cnt = manager.trace.lt[cnt].dG
-                    delta_dG = dG_cnt - dG_0
-                    if delta_dG < self.range_ddG:
-                        if self.debug:
-                            print ("included[%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), delta_dG, p_cnt))
-                        #
-                        
-                        pr_ddG += manager.trace.lt[cnt].p
-                        ddGp_include += 1
-                    #
-                    
-                elif flag_hamming_bin:
-                    if hamming_bin(s_0, s_cnt) < 5:
-                        if self.debug:
-                            print ("included[%4d]: %s   %8.4f   %3d   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), hamming_bin(s_0,s_cnt), p_cnt))
-                        #
-                        
-                        pr_h += manager.trace.lt[cnt].p
-                        ham_include += 1
-                    else:
-                        if self.debug:
-                            print ("        [%4d]: %s   %8.4f   %3d   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), hamming_bin(s_0,s_cnt), p_cnt))
-                        #
-                        
-                    #
-                    
-                elif flag_hamming: # based on string edits
-                    if hamming_str(s_0, s_cnt) < 5:
-                        if self.debug:
-                            print ("included[%4d]: %s   %8.4f   %3d   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), p_cnt))
-                        #
-                        
-                        pr_h += manager.trace.lt[cnt].p
-                        ham_include += 1
-                        
-                    else:
-                        if self.debug:
-                            print ("        [%4d]: %s   %8.4f   %3d   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), p_cnt))
-                        #
-                        
-                    #
-                    
-                elif flag_TdS:
-                    TdS_cnt = manager.trace.lt[cnt].TdS
-                    delta_TdS = TdS_0 - TdS_cnt
-                    if -self.range_TddS < delta_TdS and delta_TdS < self.range_TddS:
-                        if self.debug:
-                            print ("included[%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), delta_TdS, p_cnt))
-                        #
-                        
-                        pr_TdS += manager.trace.lt[cnt].p
-                        dTdSp_include += 1
-                        
-                    else:
-                        if self.debug:
-                            print ("        [%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), delta_TdS, p_cnt))
-                        #
-                        
-                    #
-                    
-                elif flag_ddG:
-                    dG_cnt = manager.trace.lt[cnt].dG
-                    delta_dG = dG_cnt - dG_0
-                    if delta_dG < self.range_ddG:
-                        if self.debug:
-                            print ("included[%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), delta_dG, p_cnt))
-                        #
-                        
-                        pr_ddG += manager.trace.lt[cnt].p
-                        ddGp_include += 1
-                        
-                    else:
-                        if self.debug:
-                            print ("        [%4d]: %s   %8.4f   %3d   %8.3f   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), hamming_str(s_0,s_cnt), delta_dG, p_cnt))
-                        #
-                        
-                    #
-                    
-                elif flag_similar:
-                    if similar(s_0, s_cnt) > 0.95:
-                        if self.debug:
-                            print ("included[%4d]: %s   %8.4f   %8.3g" \
-                                   % (cnt, s_cnt, similar(s_0,s_cnt), p_cnt))
-                        #
-                        
-                        pr_s += manager.trace.lt[cnt].p
-                        sim_include += 1
-                        
-                    else:
-                        if self.debug:
-                            print ("        [%4d]: %s   %8.4f   %8.3g" \
-                                % (cnt, s_cnt, similar(s_0,s_cnt), p_cnt))
-                        #
-                        
-                    #
-                    
-                elif flag_basic:
-                    # just the first boltzmann probability 
-                    if self.debug:
-                        print ("        [%4d]: %s   %8.3g" \
-                            % (cnt, s_cnt, p_cnt))
+            ctx = multiprocessing.get_context(method)
+            pool = ctx.Pool(jobs, al_init, (self, cl_job))
+            chunk = max(1, len(todo)//(4*jobs))
+            results = pool.imap(al_run_loop, todo, chunk)
+        #
+        
+        try:
+            for ky in keylist:
+                flhd = make_file_heading(self.cdata[ky].name,
+                                         self.cdata[ky].bgn,
+                                         self.cdata[ky].end, self.res)
+                if flhd in journal:
+                    rslt = journal[flhd]
+                else:
+                    flhd, rslt = next(results)
+                    if cl.resume and not rslt == None:
+                        self.append_journal(flnm_journal, flhd, rslt)
                     #
                     
                 #
                 
-                else:
-                    print ("analyze_loops(): Sorry, something is really fucked up")
-                    sys.exit(1)
+                if rslt == None:
+                    self.hm_missing += [ flhd ]
+                    continue
                 #
                 
-            #|endfor
-            
-            # self.datatype == 'type1': // self.datatype == 'type2':
-            # store the information in a temporary buffer
-            
-            # (1) write the main file results for current calculation
-            dGbar = dG_0 / float(length)
-            TdSbar = TdS_0 / float(length)
-            output =  "%s  %5d  %8.2f  %8.2f  %8.3f  %8.3f   " \
-                      % (self.cdata[ky].disp_data(), length, dG_0, TdS_0, dGbar, TdSbar)
-            
-            if flag_allwts:
-                output +=  "%8.5f  " % pr
-                output +=  "%8.5f  %4d  " % (pr_s, sim_include)
-                output +=  "%8.5f  %4d  " % (pr_h, ham_include)
-                output +=  "%8.5f  %4d  " % (pr_TdS, dTdSp_include)
-                output +=  "%8.5f  %4d  " % (pr_ddG, ddGp_include)
-            elif flag_similar:
-                output +=  "%8.5f  %4d  " % (pr_s, sim_include)
-            elif flag_hamming:  # based on string edits
-                output +=  "%8.5f  %4d  " % (pr_h, ham_include)
-            elif flag_TdS:
-                output +=  "%8.5f  %4d  " % (pr_TdS, dTdSp_include)
-            elif flag_ddG:
-                output +=  "%8.5f  %4d  " % (pr_ddG, ddGp_include)
-            else:
-                # boltzmann probabity of the first structure
-                output +=  "%8.5f  " % pr
-            #
-            
-            
-            if self.datatype == 'type1':
-                output += "  %8.5f  %8.5f  %8.5f  %8.5f  %8.5f\n" \
-                          % (p_active, p_open, p_repressed, p_A, p_B)
-            else:
-                for kxs in epilist:
-                    output += "  %8.5f" % self.cdata[ky].state[kxs]
-                #|endfor
+                PETwt, state, output, output_dG, output_p = rslt
+                self.cdata[ky].state.update(state)
+                rPET_wt += [ [ PETwt, flhd ] ] 
                 
-                output += "\n" 
-            #
-            
-            fp = open(rflnm, 'a')
-            fp.write(output)
-            fp.close()
+                # (1) write the main file results for current calculation
+                fp = open(rflnm, 'a')
+                fp.write(output)
+                fp.close()
+                
+                # (2) write the secondary information file results
+                fp = open(rflnm_dG, 'a')
+                fp.write(output_dG)
+                fp.close()
+                
+                # (3) write the secondary information file results
+                fp = open(rflnm_p, 'a')
+                fp.write(output_p)
+                fp.close()
+            #|endfor
             
-            # (2,3) make a lists of all dG and p(dG) data
-            dG_list = ''
-            p_list  = ''
-            for ltk in manager.trace.lt:
-                dG_list += "%10.2f " % ltk.dG
-                p_list  += "%10.3g " % ltk.p
+        finally:
+            if not pool == None:
+                pool.close()
+                pool.join()
             #
             
-            # (2) write the secondary information file results for current calculation
-            output_dG =  "%s  %5d    " % (self.cdata[ky].disp_data(), length)
-            output_dG += dG_list
-            output_dG += "\n" 
-            fp = open(rflnm_dG, 'a')
-            fp.write(output_dG)
-            fp.close()
-            
-            # (3) write the secondary information file results for current calculation
-            output_p =  "%s  %5d    " % (self.cdata[ky].disp_data(), length)
-            output_p += p_list
-            output_p += "\n" 
-            fp = open(rflnm_p, 'a')
-            fp.write(output_p)
-            fp.close()
+        #
+        
             
             
         #
@@ -830,6 +1077,10 @@ class AnalyzeLoops:
         print ("see results:           %s" % rflnm)
         print ("    missing files:     %s" % flnm_missing)
         print ("    chromatin weights: %s" % flnm_weights)
+        if cl.resume:
+            print ("    journal:           %s" % flnm_journal)
+        #
+        
         print ("DONE")
     #
     
@@ -30,9 +30,14 @@ directory contains (in separate files) all the calculated loop
 structures. These files have the extension "DBN" and can be read by
 the 3rd party program varna. Additionally, Chevral deposits two
 additional files: chrN_x_y_res5kb_BDwt.clust contains a matrix with
-the Boltzmann probabilities for different interactions and
-chrN_x_y_res5kb_summary.txt contains a shorthand list of the secondary
-structures.
+the Boltzmann probabilities for different interactions (with -pf,
+taken from the partition function of the whole ensemble; see
+PartitionFunction.py) and chrN_x_y_res5kb_summary.txt contains a shorthand list of the secondary
+structures. With -ensemble, all the structures are also written to
+chrN_x_y_res5kb_ensemble.bens, a binary columnar file (see
+Ensemble.py). With -archive, this file takes the place of the DBN,
+heat, chpair and simres files of the structures, which
+extract_structures.py then writes on demand.
 
 Presently, I think the name is rather unoriginal (i.e., "CHRomatin
 EVALuate"). Anyway, what is important is that it works, and maybe we
@@ -44,6 +49,10 @@ from math import exp, log
 import sys
 import os
 import string
+import time
+from itertools import chain
+import pickle
+import hashlib
 
 # main tool objects
 # from Functions import KahanSumExp
@@ -63,6 +72,8 @@ from Motif import Map # main map for all the FE and structures
 from Calculate import Calculate
 from Trace     import Trace
 from Boltzmann import Boltzmann
+from PartitionFunction import PartitionFunction
+from Ensemble  import Ensemble
 
 
 # LThread object representation
@@ -111,6 +122,27 @@ TEST2        = False  # for testing of objects
 
 # debugging options 
 SHOWMAIN     = False # True # 
+
+# result cache (-cache): finished Manager results keyed by the content
+# of the heatmap and the settings; set CHREVAL_CACHE to move it.
+result_cache_dir = os.path.join(os.environ.get("CHREVAL_CACHE",
+                                               os.path.join(os.path.expanduser("~"),
+                                                            ".cache", "chreval")),
+                                "results")
+RESULT_CACHE_VERSION = 2 # raise when the stored objects change (2: __slots__)
+# sha256 of the chreval sources (see source_digest()), so that results
+# from another version of the code are never taken from the cache
+result_cache_source = None
+
+# settings that do not change what runCalculations() produces (file
+# names, the options of the analysis programs and the cache itself)
+result_cache_skip = ["parser", "program", "allowed_extns", "EXTS",
+                     "f_heatmap", "flnm", "flhd", "ext", "f_output",
+                     "f_activity", "f_vseq", "resume", "use_eheat",
+                     "basic", "hamming", "similarity", "TdS", "TdS_range",
+                     "ddG", "ddG_range", "allwts", "debug_GetOpts",
+                     "set_GetOpts", "show_info", "source",
+                     "cache", "cache_max"]
 # Debugging in main()
 DEBUG_Trace  = False # True # 
 # Generally for checking Trace()
@@ -144,6 +176,164 @@ def usage():
 ################  CALCULATE BOLTZMANN DISTRIBUTION  #################
 #####################################################################
 
+def settings_digest(h, CL, skip):
+    # adds every plain setting in CL (name=value) other than those in
+    # skip to h (hashlib object)
+    plain = (bool, int, float, str, list, tuple, dict, type(None))
+    for k in sorted(vars(CL)):
+        v = getattr(CL, k)
+        if k in skip or not isinstance(v, plain):
+            continue
+        #
+        
+        h.update(("%s=%r\n" % (k, v)).encode())
+    #|endfor
+    
+    return h
+#
+
+
+def source_digest():
+    # sha256 of the sources of chreval (all the *.py next to this
+    # file, name and content); calculated once per run
+    global result_cache_source
+    if result_cache_source == None:
+        h = hashlib.sha256()
+        srcdir = os.path.dirname(os.path.abspath(__file__))
+        for flnm in sorted(os.listdir(srcdir)):
+            if not flnm.endswith(".py"):
+                continue
+            #
+            
+            h.update(("%s\n" % flnm).encode())
+            with open(os.path.join(srcdir, flnm), 'rb') as fp:
+                h.update(fp.read())
+            #
+            
+        #|endfor
+        
+        result_cache_source = h.hexdigest()
+    #
+    
+    return result_cache_source
+#
+
+
+def result_cache_key(CL):
+    """@
+    
+    sha256 of the chreval sources (source_digest), of the heatmap
+    file (its bytes, not its name) and of every plain setting in CL
+    other than those in result_cache_skip. Returns None when the
+    heatmap cannot be read.
+    
+    """
+    
+    h = hashlib.sha256()
+    h.update(("chreval result cache %d\n" % RESULT_CACHE_VERSION).encode())
+    h.update(("source %s\n" % source_digest()).encode())
+    try:
+        with open(CL.f_heatmap[0], 'rb') as fp:
+            for blk in iter(lambda: fp.read(1 << 20), b''):
+                h.update(blk)
+            #|endfor
+            
+        #
+        
+    except (IOError, OSError, IndexError):
+        return None
+    #
+    
+    settings_digest(h, CL, result_cache_skip)
+    return h.hexdigest()
+#
+
+
+def read_result_cache(key):
+    flpath = os.path.join(result_cache_dir, key + ".pkl")
+    if not os.path.isfile(flpath):
+        return None
+    #
+    try:
+        with open(flpath, 'rb') as fp:
+            data = pickle.load(fp)
+        #
+        os.utime(flpath) # most recently used
+        return data
+    except (IOError, OSError, EOFError, pickle.UnpicklingError,
+            AttributeError, ImportError):
+        # a damaged or outdated file is simply recomputed
+        return None
+    #
+#
+
+
+def write_result_cache(key, data, cache_max):
+    flpath = os.path.join(result_cache_dir, key + ".pkl")
+    try:
+        if not os.path.isdir(result_cache_dir):
+            os.makedirs(result_cache_dir)
+        #
+        # write then rename so concurrent runs never see half a file
+        tmppath = "%s.%d.tmp" % (flpath, os.getpid())
+        with open(tmppath, 'wb') as fp:
+            fp.write(data)
+        #
+        os.replace(tmppath, flpath)
+    except (IOError, OSError):
+        print ("WARNING(Manager): could not write result cache %s" % flpath)
+        return
+    #
+    
+    evict_result_cache(cache_max)
+#
+
+
+def evict_result_cache(cache_max):
+    # remove the least recently used results until the cache is no
+    # larger than cache_max MB (0 = no limit)
+    if cache_max <= 0:
+        return
+    #
+    
+    entries = []
+    total = 0
+    for flnm in os.listdir(result_cache_dir):
+        if not flnm.endswith(".pkl"):
+            continue
+        #
+        
+        flpath = os.path.join(result_cache_dir, flnm)
+        try:
+            st = os.stat(flpath)
+        except OSError:
+            continue # removed by another run
+        #
+        
+        entries += [(st.st_mtime, st.st_size, flpath)]
+        total += st.st_size
+    #|endfor
+    
+    entries.sort()
+    limit = cache_max * 1024 * 1024
+    for mtime, size, flpath in entries:
+        if total <= limit:
+            break
+        #
+        
+        try:
+            os.remove(flpath)
+        except OSError:
+            pass
+        #
+        
+        total -= size
+    #|endfor
+    
+#
+
+
+
 class Manager:
     def __init__(self):
         # important data variables
@@ -159,6 +349,11 @@ class Manager:
         self.btz   = None # boltzmann calculations
         self.dt    = None # data handling routines
         self.lt2db = None # LThread2DotBracket tool
+        self.stream = False # threads are built when used (-stream)
+        self.pf     = False # *_BDwt.clust from the partition function (-pf)
+        self.pf_dG  = 0.0   # ensemble free energy (-kBT ln Z) when pf
+        self.ens    = None  # columnar store of the threads (-ensemble)
+        self.archive = False # structures only in *_ensemble.bens (-archive)
         # other
         self.debug_Manager = SHOWMAIN
         
@@ -166,6 +361,16 @@ class Manager:
     
     def runCalculations(self, CL):
         
+        self.archive = CL.archive
+        cache_key = None
+        if CL.cache and not CL.stream:
+            cache_key = result_cache_key(CL)
+            if not cache_key == None and self.load_cached_results(cache_key, CL):
+                return
+            #
+            
+        #
+        
         self.calc = Calculate(CL)
         
         self.T    = self.calc.T
@@ -249,7 +454,14 @@ class Manager:
             #print ("stop at 5b in runCalculations");  sys.exit(0)
         #
         
-        self.trace.get_traces_top(hs, 0, 0, flag_filter)
+        self.stream = CL.stream
+        if self.stream:
+            # the threads are built one at a time (see iter_threads)
+            lts = self.trace.iter_traces_top(hs, 0, 0, flag_filter)
+            lt0 = next(lts, None) # also sets trace.lt_dG
+        else:
+            self.trace.get_traces_top(hs, 0, 0, flag_filter)
+        #
         
         if DEBUG_Trace: # self.debug_Manager:
             #self.calc.show_smap_xy(0,self.calc.N-1)
@@ -270,20 +482,206 @@ class Manager:
         #
         
         print ("size of matrix: %d" % self.N)
-        print ("found %d structures:" % len(self.trace.lt))
+        print ("found %d structures:" % self.count_threads())
         
         # new corrections
         self.lt2db = LThread2DotBracket(self.calc.N, self.calc.fe)
         
         
+        # contact probabilities of the whole ensemble (McCaskill-like)
+        self.pf = CL.pf
+        P = None
+        if self.pf:
+            pfun = PartitionFunction(self.calc)
+            P = pfun.calc_PF()
+            self.pf_dG = pfun.ensemble_dG()
+            print ("ensemble free energy (partition function): %10.3f" % self.pf_dG)
+        #
+        
         self.btz = Boltzmann(self.calc)
+        if self.stream:
+            # the same steps as below, one thread at a time
+            self.btz.calc_Z_dG(self.trace.lt_dG, self.T)
+            self.clust = Cluster(self.calc)
+            if not self.pf:
+                self.clust.start_clusters()
+            #
+            
+            ens = None
+            if CL.ensemble:
+                ens = Ensemble(self.N)
+            #
+            
+            kk = 0
+            if not lt0 == None:
+                for ltk in chain([lt0], lts):
+                    kk += 1
+                    self.set_thread_weights(ltk)
+                    if not self.pf:
+                        self.clust.add_cluster(ltk)
+                    #
+                    
+                    self.clust.add_cpif(ltk, kk)
+                    if not ens == None:
+                        ens.add_thread(ltk)
+                    #
+                    
+                #|endfor
+                
+            #
+            
+            # the output then comes from the store, not another traceback
+            self.ens = ens
+            
+            if self.pf:
+                self.clust.clusterpf(P)
+            else:
+                self.clust.finish_clusters()
+            #
+            
+            return
+        #
+        
         self.btz.calc_Z(self.trace.lt, self.T)
         self.trace.lt = self.btz.set_LThread_p(  self.trace.lt, self.T)
         self.trace.lt = self.btz.set_LThread_TdS(self.trace.lt, self.T)
         
         self.clust = Cluster(self.calc)
-        self.clust.clusterlist(self.trace.lt)
-        self.clust.cpiflist(self.trace.lt)
+        if self.pf:
+            self.clust.clusterpf(P)
+            self.clust.cpiflist(self.trace.lt)
+        else:
+            self.clust.ensemblelist(self.trace.lt)
+        #
+        
+        if CL.ensemble:
+            self.ens = Ensemble(self.N)
+            for ltk in self.trace.lt:
+                self.ens.add_thread(ltk)
+            #|endfor
+            
+            self.trace.lt = []
+        #
+        
+        
+        if not cache_key == None:
+            self.save_cached_results(cache_key, CL.cache_max)
+        #
+        
+    #
+    
+    def set_thread_weights(self, ltk):
+        # Boltzmann probability and entropy of one thread
+        ltk.p = self.btz.calc_p(ltk, self.T)
+        self.btz.set_TdS(ltk, self.T)
+    #
+    
+    def count_threads(self):
+        if not self.ens == None:
+            return len(self.ens)
+        #
+        if self.stream:
+            return len(self.trace.lt_dG)
+        #
+        return len(self.trace.lt)
+    #
+    
+    def iter_threads(self):
+        """@
+        
+        the threads (structures) in order of increasing free energy
+        with p and TdS set. Normally, this is just trace.lt. With
+        -stream, trace.lt is not kept, and each pass builds the
+        threads again from the traceback (Trace.iter_traces), so only
+        one of them is in memory at a time. With -ensemble, they are
+        built from the columnar store (Ensemble) as they are used.
+        
+        """
+        
+        if not self.ens == None:
+            for ltk in self.ens.iter_threads(self.trace.molsys):
+                yield ltk
+            #|endfor
+            
+            return
+        #
+        
+        if not self.stream:
+            for ltk in self.trace.lt:
+                yield ltk
+            #|endfor
+            
+            return
+        #
+        
+        for ltk in self.trace.iter_traces():
+            self.set_thread_weights(ltk)
+            yield ltk
+        #|endfor
+        
+    #
+    
+    def load_cached_results(self, key, CL):
+        """@
+        
+        takes the results of runCalculations() from the result cache
+        if this heatmap (by content) has already been run with the
+        same settings. Returns False if it is not in the cache.
+        
+        """
+        
+        data = read_result_cache(key)
+        if data == None:
+            return False
+        #
+        
+        self.__dict__.update(data)
+        
+        # the content is the same, but the file may have another name
+        self.flnm = CL.f_heatmap[0]
+        self.calc.flnm = self.flnm
+        self.calc.fe.flnm = self.flnm
+        self.calc.fe.f_heatmap = CL.f_heatmap
+        
+        print ("result cache: %s" % key)
+        print ("dGmin = %8.2f" % self.trace.dGmin)
+        print (''.join(self.calc.fe.opt_ss_seq))
+        print ("size of matrix: %d" % self.N)
+        print ("found %d structures:" % self.count_threads())
+        return True
+    #
+    
+    def save_cached_results(self, key, cache_max):
+        # The DP tables (smap, btype and the branch memo) are only
+        # needed to build the structures, and they are by far the
+        # largest part, so they are left out of the cache.
+        drop = [(self, "smap"), (self.trace, "smap"),
+                (self.calc, "branch_memo"),
+                (self.calc.fe, "smap"), (self.calc.fe, "btype")]
+        kept = []
+        for obj, attr in drop:
+            if hasattr(obj, attr):
+                kept += [(obj, attr, getattr(obj, attr))]
+                setattr(obj, attr, None)
+            #
+            
+        #|endfor
+        
+        try:
+            data = pickle.dumps(self.__dict__, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, RecursionError, TypeError) as e:
+            print ("WARNING(Manager): results not cached (%s)" % e)
+            data = None
+        finally:
+            for obj, attr, v in kept:
+                setattr(obj, attr, v)
+            #|endfor
+            
+        #
+        
+        if not data == None:
+            write_result_cache(key, data, cache_max)
+        #
         
     #
     
@@ -333,7 +731,7 @@ class Manager:
             header += "#     febase                  = %.3g [kcal/mol]\n" % self.calc.fe.base
             header += "#     feshift                 = %.3g\n" % self.calc.fe.shift
             header += "# statistics:\n"
-            header += "#   total number of structures:          %8d\n"  % len(self.trace.lt)
+            header += "#   total number of structures:          %8d\n"  % self.count_threads()
             header += "#   final fraction of structures extracted:    %6.3f\n" \
                       % self.trace.wt_HS
             header += "#   upper limit of the free energy:         %8.2f\n" \
@@ -361,8 +759,8 @@ class Manager:
         file_results = ''
         prnt_results = ''
         print ("output structures:")
-        print ("number of threads obtained: %d" % len(self.trace.lt))
-        for thrds in self.trace.lt:
+        print ("number of threads obtained: %d" % self.count_threads())
+        for thrds in self.iter_threads():
             
             file_results = "> %s    dG = %8.3f   p = %12.8f\n" \
                            % (str(k).zfill(5), thrds.dG, thrds.p)
@@ -408,7 +806,14 @@ class Manager:
                 prnt_results += file_results
             #
             
-            if self.calc.p_all_1D:
+            if not self.ens == None:
+                self.ens.add_dbn(str_result)
+            #
+            
+            if self.archive:
+                # only in the archive (see extract_structures.py)
+                pass
+            elif self.calc.p_all_1D:
                 outfile = flhd + '_%s.DBN' % str(k).zfill(5)
                 # python2: string.zfill(k, 5)
                 self.lt2db.saveDotBracketString(outfile, thrds, str_result)
@@ -515,6 +920,12 @@ class Manager:
         # print the results to the terminal
         print (prnt_results)
         
+        if not self.ens == None:
+            # the whole ensemble in one file
+            self.ens.title = flhd
+            self.ens.write(flhd + "_ensemble.bens")
+        #
+        
         
         try:
             pclusters = self.calc.fe.disp_fmatrix(self.clust.clusters, "clusters", False)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+"""@@@
+
+Main Module:   extract_structures.py
+
+Functions:     extract_structures
+
+Author:        Wayne Dawson
+creation date: 2026
+last update:   2026
+version:       0
+
+
+Purpose:
+
+Writes the per structure files of chreval (DBN, heat, chpair and
+simres) for some or all of the structures in an archive
+(*_ensemble.bens, chreval -archive or -ensemble; see Ensemble.py). The
+files are the same ones that chreval writes with -printAll1D.
+
+    command line example:
+    > extract_structures.py -f chrN_x_y_res5kb_ensemble.bens -k 1 10-20
+    > extract_structures.py -f chrN_x_y_res5kb_ensemble.bens -list
+
+"""
+
+import sys
+import argparse
+
+from Ensemble import Ensemble
+from Ensemble import is_ensemble_file
+from LThread  import DispLThread
+from ChPair   import LThread2ChPair
+from Chromatin2SimRNA import SimRNARestraints
+from Vienna2TreeNode  import saveDotBracketString
+
+PROGRAM = "extract_structures.py"
+
+
+def get_selection(slist, nstruct):
+    # structure numbers (1, 2, ...) from the list of "k" or "k1-k2"
+    sel = []
+    for v in slist:
+        try:
+            if '-' in v:
+                k1, k2 = v.split('-')
+                k1 = int(k1); k2 = int(k2)
+            else:
+                k1 = k2 = int(v)
+            #
+        except ValueError:
+            print ("ERROR: structure selection must be k or k1-k2 (%s)" % v)
+            sys.exit(1)
+        #
+
+        if k1 > k2:
+            print ("ERROR: structure selection must be k or k1-k2 (%s)" % v)
+            sys.exit(1)
+        #
+
+        for k in (k1, k2):
+            if not 0 < k <= nstruct:
+                print ("ERROR: structure %d is not in the archive (1 to %d)" % (k, nstruct))
+                sys.exit(1)
+            #
+
+        #|endfor
+
+        sel += list(range(k1, k2 + 1))
+    #|endfor
+
+    return sel
+#
+
+
+def extract_structures(cl):
+
+    # parse the command line
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-f', nargs=1, required=True,
+                        dest='f_archive',
+                        help="Input archive (*_ensemble.bens)")
+
+    parser.add_argument('-k', nargs='+', default=[],
+                        dest='select',
+                        help="Structures to write: numbers k (1 is the \
+                        lowest free energy) or ranges k1-k2.")
+
+    parser.add_argument('-all', action='store_true', default=False,
+                        dest='all',
+                        help="Write all the structures.")
+
+    parser.add_argument('-list', action='store_true', default=False,
+                        dest='list',
+                        help="List the structures (dG, p) in the archive.")
+
+    parser.add_argument('-o', nargs=1, default=None,
+                        dest='f_header',
+                        help="Header for the output files [default is the \
+                        header of the heatmap]")
+
+    #
+    # assign arguments
+    args = parser.parse_args(cl[1:])
+    flnm = args.f_archive[0]
+    if not is_ensemble_file(flnm):
+        print ("ERROR: %s is not an archive of structures (*.bens)" % flnm)
+        sys.exit(1)
+    #
+
+    ens = Ensemble()
+    ens.read(flnm)
+    nstruct = len(ens)
+
+    if args.list:
+        print ("%s: %d structures, N = %d" % (ens.title, nstruct, ens.N))
+        for k in range(0, nstruct):
+            print ("> %s    dG = %8.3f   p = %12.8f" \
+                   % (str(k+1).zfill(5), ens.cols["dG"][k], ens.cols["p"][k]))
+        #|endfor
+
+    #
+
+    if args.all:
+        sel = list(range(1, nstruct + 1))
+    else:
+        sel = get_selection(args.select, nstruct)
+    #
+
+    flhd = ens.title
+    if not args.f_header == None:
+        flhd = args.f_header[0]
+    #
+
+    dt = DispLThread(ens.N)
+    for k in sel:
+        ltk = ens.get_thread(k-1, None)
+        sk = str(k).zfill(5)
+        dbstring = ens.get_dbn(k-1)
+        if len(dbstring) > 0:
+            saveDotBracketString(flhd + '_%s.DBN' % sk, ltk, dbstring)
+        else:
+            print ("WARNING: no dot bracket string for structure %d" % k)
+        #
+
+        dt.printLThreadHeatMap(flhd + '_%s.heat' % sk, ltk, False)
+
+        chdt = LThread2ChPair(ltk, flhd)
+        chdt.print_ChPairData(flhd + '_%s.chpair' % sk)
+        srdt = SimRNARestraints()
+        srdt.ChPair2SimRes(chdt, ['N~N'])
+        srdt.print_SimRNArestraints(flhd + '_%s.simres' % sk, "slope", True)
+    #|endfor
+
+    if len(sel) > 0:
+        print ("wrote the files of %d structures" % len(sel))
+    #
+
+#
+
+
+# Main
+if __name__ == '__main__':
+    extract_structures(sys.argv)
+#
@@ -179,28 +179,13 @@ class GammaFcn:
         return wb;
     #
     
-    def rx_functSmpsn(self, xi_1, xi_2, delta, gmm, nu):
-        
+    def set_rx_weights(self, delta, gmm, nu):
         """@
         
-        This is the more recent integration method to calculate the
-        local entropy. It uses Simpson's rule, which is maybe not the
-        fastest way, but much faster and more reliable than the
-        original way that I used before where I used a fixed dx.
-
-        """
-        
-        
-        
-        # initial variables
-        x = 0.0
-        F = 0.0;  Fo = 0.0;
-        deltaF = 0.0
-        tolF = 0.0
-        flagm = False
-        k = 0
-        
+        sets zeta, w_bar and the (dnw1, dnw2) exponents used by f_cwt
+        for the requested (delta, gmm, nu).
         
+        """
         self.zeta = self.calc_zeta(gmm, delta)
         self.set_zeta = True;
         self.w_bar = (gmm + 0.5)/self.zeta;
@@ -221,84 +206,162 @@ class GammaFcn:
         #
         
         self.set_dnw = True;
-        if (xi_1 > xi_2):
-            tmp = xi_1
-            flagm = True
-            xi_1 = xi_2
-            xi_2 = tmp
+    #
+    
+    
+    def f_cwt_grid(self, xs, delta, gmm, nu):
+        """@
+        
+        f_cwt() evaluated on a whole list of points; the branch on
+        (delta, nu) is taken once for the grid instead of per point.
+        
+        """
+        if (((1.99999 < delta) and (delta < 2.00001)) 
+            and ((0.49999 < nu) and (nu < 0.500001))):
+            return [0.0 if (0.99999 < x and x < 1.00001)
+                    else log(x)/(1.0-x)+1.0 for x in xs]
         #
         
-        x =  xi_2/xi_1
-        count = 2
-        dx = (xi_2 - xi_1)/count
+        dnw1 = self.dnw1; dnw2 = self.dnw2; w_bar = self.w_bar
+        F = []
+        for x in xs:
+            if (0.99999 < x) and (x < 1.00001):
+                F += [0.0]
+            else:
+                Fx = pow(x,dnw2)*(1.0-pow(x,dnw1))*w_bar
+                Fx = Fx + log(x)
+                F += [Fx/(1.0-x)]
+            #
+        #|endfor
         
-        S_even = 0.0
-        S_edge = self.f_cwt(xi_1, delta, gmm, nu)  
-        + self.f_cwt(xi_2, delta, gmm, nu)
-        S_odd = self.f_cwt(xi_1+dx, delta, gmm, nu)
-        F = (S_edge + 4.0*S_odd)*(dx/3.0)
+        return F
+    #
+    
+    
+    def gamma_grid(self, xs, w):
+        return [exp(-x)*pow(x,w) for x in xs]
+    #
+    
+    
+    def smpsn_batch(self, fgrid, xi_1, xi_2, S_edge):
+        """@
         
+        Adaptive Simpson integration of many intervals
+        [xi_1[i], xi_2[i]] at the same time. fgrid(xs) must return the
+        integrand on a whole list of points. All the intervals start
+        with count = 2 and are halved together, so each refinement
+        gathers the new midpoints of every unfinished interval into
+        one grid and calls fgrid once. An interval stops refining
+        under the same condition as the scalar version (change in F
+        within self.tol*|F| and dx <= 0.1), so results are identical
+        to integrating each interval by itself.
         
-        if (F > Fo):
-            deltaF = F - Fo
-        else:
-            deltaF = Fo - F
-        #
+        S_edge holds the end point contribution of each interval.
         
+        """
         
-        if (F > 0):
-            tolF = F*self.tol
-        else:
-            tolF = -F*self.tol
-        #
+        n = len(xi_2)
+        count = 2
+        dx = [(xi_2[i] - xi_1[i])/count for i in range(n)]
+        S_even = [0.0]*n
+        S_odd  = fgrid([xi_1[i] + dx[i] for i in range(n)])
+        F = [(S_edge[i] + 4.0*S_odd[i])*(dx[i]/3.0) for i in range(n)]
         
+        # with Fo = 0 initially, deltaF = |F|
+        active = [i for i in range(n)
+                  if abs(F[i]) > abs(F[i])*self.tol or dx[i] > 0.1]
         
-        while ((deltaF > tolF) or (dx > 0.1)):
-            count = count*2;
-            dx = (xi_2 - xi_1)/count;
-            Fo = F;
-            S_even = S_even + S_odd;
-            S_odd = 0.0;
-            
-            
-            
-            
-            k = 1
-            while (k < count/2): 
-                x = xi_1 + (2*k-1)*dx
-                S_odd  = S_odd + self.f_cwt(x, delta, gmm, nu)
-                k = k + 1
-            #
-            F = (S_edge + 2.0*S_even + 4.0*S_odd)*(dx/3.0);
-            
-            # ###############
-            # exit conditions
+        while len(active) > 0:
+            count = count*2
+            m = count//2 - 1 # new points per interval (k = 1 .. m)
+            xs = []
+            for i in active:
+                dx[i] = (xi_2[i] - xi_1[i])/count
+                S_even[i] = S_even[i] + S_odd[i]
+                a = xi_1[i]; h = dx[i]
+                xs.extend([a + (2*k-1)*h for k in range(1, m+1)])
+            #|endfor
             
-            if (F > Fo):
-                deltaF = F - Fo
-            else:
-                deltaF = Fo - F
-            #
+            fx = fgrid(xs)
             
+            still = []
+            p = 0
+            for i in active:
+                S_odd[i] = sum(fx[p:p+m], 0.0)
+                p += m
+                Fo = F[i]
+                F[i] = (S_edge[i] + 2.0*S_even[i] + 4.0*S_odd[i])*(dx[i]/3.0)
+                if abs(F[i] - Fo) > abs(F[i])*self.tol or dx[i] > 0.1:
+                    still += [i]
+                #
+            #|endfor
             
-            if (F > 0):
-                tolF = F*self.tol
-            else:
-                tolF = -F*self.tol
-            # ################
+            active = still
         #
         
-        if (flagm == True):
-            tmp = xi_1
-            xi_1 = xi_2;
-            xi_2 = tmp;
-            F = -F;
+        return F
+    #
+    
+    
+    def rx_functSmpsn_batch(self, xi_1, xi_2, delta, gmm, nu):
+        """@
+        
+        rx_functSmpsn() for a list of upper limits xi_2 (xi_1 can be a
+        single lower limit or a matching list). All the intervals are
+        refined together through smpsn_batch(), so a whole table of
+        stem lengths costs one pass over shared grids. Returns the
+        list of integrals.
+        
+        """
+        
+        if not isinstance(xi_1, (list, tuple)):
+            xi_1 = [xi_1]*len(xi_2)
         #
         
+        self.set_rx_weights(delta, gmm, nu)
+        
+        # order each interval; integrals with xi_1 > xi_2 change sign
+        lo = []; hi = []; sgn = []
+        for a, b in zip(xi_1, xi_2):
+            if a > b:
+                lo += [b]; hi += [a]; sgn += [-1.0]
+            else:
+                lo += [a]; hi += [b]; sgn += [1.0]
+            #
+        #|endfor
+        
+        fgrid = lambda xs: self.f_cwt_grid(xs, delta, gmm, nu)
+        # NOTE: the edge sum has only ever included the lower limit
+        # (f_cwt(1) = 0 in the usual case); kept so tables reproduce.
+        S_edge = fgrid(lo)
+        F = self.smpsn_batch(fgrid, lo, hi, S_edge)
+        F = [F[i] if sgn[i] > 0.0 else -F[i] for i in range(len(F))]
+        
         if self.debug:
-            print ('f_Simpson(%10.3f, %10.3f, %10.3f)\n' % (xi_1, xi_2, F))
+            for i in range(len(F)):
+                print ('f_Simpson(%10.3f, %10.3f, %10.3f)\n'
+                       % (xi_1[i], xi_2[i], F[i]))
+            #|endfor
         #
-        return F;
+        return F
+    #
+    
+    
+    def rx_functSmpsn(self, xi_1, xi_2, delta, gmm, nu):
+        
+        """@
+        
+        This is the more recent integration method to calculate the
+        local entropy. It uses Simpson's rule, which is maybe not the
+        fastest way, but much faster and more reliable than the
+        original way that I used before where I used a fixed dx.
+        
+        To integrate many upper limits at once, use
+        rx_functSmpsn_batch().
+        
+        """
+        
+        return self.rx_functSmpsn_batch([xi_1], [xi_2], delta, gmm, nu)[0]
     #
     
     
@@ -310,71 +373,14 @@ class GammaFcn:
         * int_{0}^{\infty} exp( -x ) x^{z-1} dx
         
         """
-        x = 0.0;
-        
-        F = 0.0; Fo = 0.0;
-        deltaF = 1000.0;
-        tolF = 0.0;
-        
-        k = 0;
         
         xi_1 = 0.0;
         xi_2 = 10000.;
         w    = z - 1;
         
-        x =  xi_2;
-        count = 2;
-        dx = (xi_2 - xi_1)/count;
-        
-        S_even = 0.0;
+        fgrid = lambda xs: self.gamma_grid(xs, w)
         S_edge = self.gamma(xi_1, w) + self.gamma(xi_2, w);
-        S_odd = self.gamma(xi_1+dx, w);
-        F = (S_edge + 4.0*S_odd)*(dx/3.0);
-        if (F > Fo):
-            deltaF = F - Fo
-        else:
-            deltaF = Fo - F
-        #    
-        
-        if (F > 0):
-            tolF = F*self.tol
-        else:
-            tolF = -F*self.tol
-        #
-        
-        
-        while (deltaF > tolF) or (dx > 0.1):
-            count = count*2
-            dx = (xi_2 - xi_1)/count;
-            Fo = F;
-            S_even = S_even + S_odd;
-            S_odd = 0.0;
-            
-            
-            #for (k = 1; k < count/2; k++) {
-            k = 1
-            while (k < count/2): 
-                x = xi_1 + (2*k-1)*dx
-                S_odd = S_odd + self.gamma(x, w)
-                k = k + 1
-            #
-            F = (S_edge + 2.0*S_even + 4.0*S_odd)*(dx/3.0);
-            
-            # ###############
-            # exit conditions
-            
-            if (F > Fo):
-                deltaF = F - Fo
-            else:
-                deltaF = Fo - F
-            #
-            
-            if (F > 0):
-                tolF = F*self.tol
-            else:
-                tolF = -F*self.tol
-            # ################
-        #
+        F = self.smpsn_batch(fgrid, [xi_1], [xi_2], [S_edge])[0]
         
         if self.debug:
             print ('f_Simpson(%10.3f, %10.3f, %10.3f)\n' % (xi_1, xi_2, F))
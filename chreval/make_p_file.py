@@ -8,7 +8,8 @@ import argparse
 
 
 # main tool objects
-from Functions import KahanSumExp
+from Functions import LogSumExpProb
+from Functions import LogSumExpShift
 from FileTools import getHeadExt
 
 # for entropy calculations
@@ -33,18 +34,16 @@ def calc_Z(dGdata):
     # bit odd at first brush. After all, the mathematical formula
     # is really quite straight forward.
     
-    # The problem is that floats have a limit in size
-    # that can be easily exceeded. So we have first construct the
-    # exponents and then analyze them through a subsidiary
-    # function KahanSumExp() to add the exponentials together.
+    # The problem is that floats have a limit in size that can be
+    # easily exceeded. So we have first construct the exponents and
+    # then let LogSumExpProb() (the same function Boltzmann uses)
+    # return log Z and the probabilities together.
     
     # math.exp
-    explist = []
-    for dG_k in dGdata:
-        explist += [ -dG_k / kBT ]
-    #
+    explist = [ -dG_k / kBT for dG_k in dGdata ]
     
-    Z, shift = KahanSumExp(explist)
+    logZ, pdata = LogSumExpProb(explist)
+    Z, shift = LogSumExpShift(logZ)
     re_wt = float(2**shift)
     
     
@@ -69,40 +68,20 @@ def calc_Z(dGdata):
                       explist[k],
                       (-dGdata[k]/kBT),
                       dGdata[k],
-                      calc_p(dGdata[k], Z, shift)))
+                      pdata[k]))
         #
         
         #sys.exit(0)
     
     #
 
-    return Z, shift
+    return logZ, pdata
 
 #
 
-def calc_p(dG, Z, shift):
-    
+def calc_p(dG, logZ):
     # math.exp
-    if shift > 0:
-        # print ((float(self.shift)*log(2)))
-        exponent = - (dG / kBT)
-        if exponent - shift * log(2) < -708.396:
-            p = 0.0 # surely, this is neglectable
-        else:
-            p = exp( exponent - float(shift)*log(2) ) / Z
-        #
-        
-    else:
-        exponent = - (dG / kBT)
-        if exponent - shift * log(2) < -708.396:
-            p = 0.0 # surely, this is neglectable
-        else:
-            p = exp( exponent ) / Z
-        #
-        
-    #
-    
-    return p
+    return exp( -dG / kBT - logZ )
 #
 
 class Make_pFile(object):
@@ -195,12 +174,7 @@ class Make_pFile(object):
                 dGdata += [ float(sdG_k) ]
             #|endfor
             
-            Z, shift = calc_Z(dGdata)
-            
-            pdata = []
-            for dG_k in dGdata:
-                pdata += [ calc_p(dG_k, Z, shift) ]
-            #|endfor
+            logZ, pdata = calc_Z(dGdata)
             
             
             pdataline = leader
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+"""@@@
+
+Main Module:   bench_memory.py
+
+Functions:     bench_memory
+
+Author:        Wayne Dawson
+creation date: 2026
+last update:   2026
+version:       0
+
+
+Purpose:
+
+Measures the memory taken by the objects that chreval creates in
+large numbers (the __slots__ classes LNode, LThread, Link, Motif, ...)
+after Manager.runCalculations(): the deep size of the ensemble
+(trace.lt, per structure and per node), the deep size of the links
+stored by minFE (smap.glink, per link) and the peak of the memory
+traced by tracemalloc during the whole calculation.
+
+The deep size follows __dict__ and __slots__, and the shared objects
+(Calculate, its free energy map and the molecular system) are left
+out, so the numbers only reflect the objects themselves.
+
+    command line example:
+    > python3 tests/bench_memory.py                     (tests/*.heat)
+    > python3 tests/bench_memory.py -f map.heat -- -island_max 30
+
+Any option after "--" is passed on to chreval.
+
+"""
+
+import sys
+import os
+import io
+import gc
+import argparse
+import contextlib
+import tracemalloc
+from glob import glob
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(test_dir))
+
+PROGRAM = "bench_memory.py"
+
+
+def deep_size(o, seen):
+    # size of o and of everything it refers to that is not in seen
+    if id(o) in seen or isinstance(o, (int, float, str, bool, type(None))):
+        return 0
+    #
+
+    seen.add(id(o))
+    s = sys.getsizeof(o)
+    if isinstance(o, dict):
+        for k, v in o.items():
+            s += deep_size(k, seen) + deep_size(v, seen)
+        #|endfor
+
+    elif isinstance(o, (list, tuple, set)):
+        for v in o:
+            s += deep_size(v, seen)
+        #|endfor
+
+    else:
+        if hasattr(o, '__dict__'):
+            s += deep_size(o.__dict__, seen)
+        #
+
+        for c in type(o).__mro__:
+            for a in getattr(c, '__slots__', ()):
+                if hasattr(o, a):
+                    s += deep_size(getattr(o, a), seen)
+                #
+
+            #|endfor
+
+        #|endfor
+
+    #
+
+    return s
+#
+
+
+def measure(flnm, options):
+    # runs chreval on flnm and prints the sizes
+    import chreval
+    from GetOpts import GetOpts
+
+    sys.argv = ["chreval.py", "-f", flnm] + options
+    cl = GetOpts("chreval.py")
+
+    gc.collect()
+    tracemalloc.start()
+    m = chreval.Manager()
+    with contextlib.redirect_stdout(io.StringIO()):
+        m.runCalculations(cl)
+    #
+
+    gc.collect()
+    cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    lt = m.trace.lt
+    skip = set([id(m.calc), id(m.calc.fe)])
+    if len(lt) > 0:
+        skip.add(id(lt[0].molsys))
+    #
+
+    sz_lt = deep_size(lt, set(skip))
+    nodes = sum(len(ltk.thread) for ltk in lt)
+
+    sz_links = 0; nlinks = 0
+    seen = set(skip)
+    for i in range(0, m.calc.N):
+        for j in range(i, m.calc.N):
+            lg = m.calc.fe.smap.glink[i][j].lg
+            nlinks += len(lg)
+            sz_links += deep_size(lg, seen)
+        #|endfor
+
+    #|endfor
+
+    print ("%-38s %4d %6d %7d %8.0f %7.0f %8d %7.0f %9.1f" \
+        % (os.path.basename(flnm), m.calc.N, len(lt), nodes,
+           sz_lt/max(1, len(lt)), sz_lt/max(1, nodes),
+           nlinks, sz_links/max(1, nlinks), peak/2.0**20))
+#
+
+
+def bench_memory(cl):
+
+    # parse the command line
+    parser = argparse.ArgumentParser(
+        usage = "%s [-f file.heat ...] [-- chreval options]" % PROGRAM)
+
+    parser.add_argument('-f', nargs='+', default=None,
+                        dest='f_heatmap',
+                        help="Input heatmaps [default is tests/*.heat]")
+
+    args, options = parser.parse_known_args(cl[1:])
+    options = [v for v in options if not v == "--"]
+
+    flnms = args.f_heatmap
+    if flnms == None:
+        flnms = sorted(glob(os.path.join(test_dir, "*.heat")))
+    #
+
+    sys.setrecursionlimit(100000)
+    print ("%-38s %4s %6s %7s %8s %7s %8s %7s %9s" \
+        % ("map", "N", "struct", "nodes", "B/struct", "B/node",
+           "links", "B/link", "peak[MB]"))
+    for flnm in flnms:
+        measure(flnm, options)
+    #|endfor
+
+#
+
+
+# Main
+if __name__ == '__main__':
+    bench_memory(sys.argv)
+#
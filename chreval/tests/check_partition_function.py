@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""@@@
+
+Main Module:   check_partition_function.py
+
+Functions:     check_partition_function
+
+Author:        Wayne Dawson
+creation date: 2026
+last update:   2026
+version:       0
+
+
+Purpose:
+
+Checks the inside/outside passes of PartitionFunction (chreval -pf)
+against brute force: every structure of the ensemble stored in the
+minFE tables is enumerated (each cell takes one of its motifs, each
+branch of the motif one of the structures of that cell), and ln Z and
+the contact probabilities are summed directly. Both must agree to
+rounding.
+
+The enumeration grows as the product of the alternatives, so the
+default heatmap is the small chr11 test map (about 4 10^5 structures).
+
+    command line example:
+    > python3 tests/check_partition_function.py
+    > python3 tests/check_partition_function.py -f map.heat -max_struct 500000
+
+The exit status is 1 if ln Z or any contact probability differs.
+
+"""
+
+import sys
+import os
+import argparse
+from math import exp
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(test_dir))
+
+from Functions import LogSumExp
+from PartitionFunction import PartitionFunction
+
+PROGRAM = "check_partition_function.py"
+
+default_heatmap = os.path.join(test_dir, "chr11_111099793_111320552_res5kb.heat")
+
+
+def enumerate_cell(pfun, c, motifs, structs, max_struct):
+    # all the structures of cell c as a list of (ln weight, contacts);
+    # None if there are more than max_struct of them
+    if c in structs:
+        return structs[c]
+    #
+
+    if not c in motifs:
+        motifs[c] = pfun.get_motifs(c[0], c[1])
+    #
+
+    slist = []
+    for lw, contacts, branches in motifs[c]:
+        part = [(lw, tuple(contacts))]
+        for b in branches:
+            sb = enumerate_cell(pfun, b, motifs, structs, max_struct)
+            if sb == None or len(part)*len(sb) > max_struct:
+                structs[c] = None
+                return None
+            #
+
+            part = [(w1 + w2, ct1 + ct2) for w1, ct1 in part for w2, ct2 in sb]
+        #|endfor
+
+        slist += part
+        if len(slist) > max_struct:
+            structs[c] = None
+            return None
+        #
+
+    #|endfor
+
+    structs[c] = slist
+    return slist
+#
+
+
+def check_partition_function(cl):
+
+    # parse the command line
+    parser = argparse.ArgumentParser(
+        usage = "%s [-f file.heat] [-max_struct n] [-tol x]" % PROGRAM)
+
+    parser.add_argument('-f', nargs=1, default=[default_heatmap],
+                        dest='f_heatmap',
+                        help="Input heatmap [default is the chr11 test map]")
+
+    parser.add_argument('-max_struct', action='store', default=1000000,
+                        dest='max_struct', type=int,
+                        help="Give up when the ensemble has more structures \
+                        than this (default 10^6).")
+
+    parser.add_argument('-tol', action='store', default=1.0e-9,
+                        dest='tol', type=float,
+                        help="Largest difference accepted (default 1e-9).")
+
+    args = parser.parse_args(cl[1:])
+    flnm = args.f_heatmap[0]
+
+    # GetOpts (through Calculate) reads the chreval command line
+    sys.argv = ["chreval.py", "-f", flnm]
+    from GetOpts   import GetOpts
+    from Calculate import Calculate
+    calc = Calculate(GetOpts("chreval.py"))
+    calc.minFE(calc.T)
+
+    pfun = PartitionFunction(calc)
+    P = pfun.calc_PF()
+
+    top = (0, calc.N-1)
+    slist = enumerate_cell(pfun, top, {}, {}, args.max_struct)
+    if slist == None:
+        print ("ERROR: %s has more than %d structures, use a smaller map" \
+            % (flnm, args.max_struct))
+        sys.exit(1)
+    #
+
+    lnZ = LogSumExp([s[0] for s in slist])
+    Pb = {}
+    for lw, contacts in slist:
+        p = exp(lw - lnZ)
+        for v in contacts:
+            Pb[v] = Pb.get(v, 0.0) + p
+        #|endfor
+
+    #|endfor
+
+    dP = 0.0
+    for i in range(0, calc.N):
+        for j in range(i, calc.N):
+            dP = max(dP, abs(P[i][j] - Pb.get((i,j), 0.0)))
+        #|endfor
+
+    #|endfor
+
+    dlnZ = abs(pfun.lnZ - lnZ)
+    print ("%s: %d structures" % (os.path.basename(flnm), len(slist)))
+    print ("ln Z:   inside %.12f   brute force %.12f   |d| = %.3g" \
+        % (pfun.lnZ, lnZ, dlnZ))
+    print ("P(i,j): max |d| = %.3g" % dP)
+
+    if dlnZ > args.tol or dP > args.tol:
+        print ("partition function DIFFERS from brute force")
+        sys.exit(1)
+    #
+
+    print ("ok")
+#
+
+
+# Main
+if __name__ == '__main__':
+    check_partition_function(sys.argv)
+#
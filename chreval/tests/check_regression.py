@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+"""@@@
+
+Main Module:   check_regression.py
+
+Functions:     check_regression
+
+Author:        Wayne Dawson
+creation date: 2026
+last update:   2026
+version:       0
+
+
+Purpose:
+
+Runs chreval.py on each heatmap in this directory (tests/*.heat) and
+compares the summary of the structures (*_summary.txt: the settings,
+the statistics, and the dG, p and structure of every structure
+reported) with the reference in tests/reference. Any option that
+does not change the result (e.g., -jobs 4) should
+pass unchanged.
+
+    command line example:
+    > python3 tests/check_regression.py
+    > python3 tests/check_regression.py -jobs 4
+    > python3 tests/check_regression.py -update   (write new references)
+
+The exit status is 1 if any of the summaries differs.
+
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import subprocess
+import argparse
+from glob import glob
+
+PROGRAM = "check_regression.py"
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+ref_dir  = os.path.join(test_dir, "reference")
+chreval  = os.path.join(os.path.dirname(test_dir), "chreval.py")
+
+
+def run_chreval(flnm, options):
+    # returns the lines of the summary of flnm (None if chreval failed)
+    flhd = os.path.basename(flnm)[:-len(".heat")]
+    wdir = tempfile.mkdtemp(prefix = "chreval_check_")
+    try:
+        shutil.copy(flnm, wdir)
+        cmd = [sys.executable, chreval, "-f", flhd + ".heat"] + options
+        with open(os.path.join(wdir, flhd + ".log"), 'w') as fp:
+            rc = subprocess.call(cmd, cwd = wdir, stdout = fp, stderr = fp)
+        #
+
+        flsmry = os.path.join(wdir, flhd, flhd + "_summary.txt")
+        if not rc == 0 or not os.path.isfile(flsmry):
+            print ("ERROR: chreval failed on %s:" % flhd)
+            print (open(os.path.join(wdir, flhd + ".log")).read()[-2000:])
+            return None
+        #
+
+        return open(flsmry).read().splitlines()
+    finally:
+        shutil.rmtree(wdir)
+    #
+#
+
+
+def check_regression(cl):
+
+    # parse the command line
+    parser = argparse.ArgumentParser(
+        usage = "%s [-update] [chreval options]" % PROGRAM)
+
+    parser.add_argument('-update', action='store_true', default=False,
+                        dest='update',
+                        help="Write the summaries as the new references.")
+
+    args, options = parser.parse_known_args(cl[1:])
+
+    n_fail = 0
+    for flnm in sorted(glob(os.path.join(test_dir, "*.heat"))):
+        flhd = os.path.basename(flnm)[:-len(".heat")]
+        flref = os.path.join(ref_dir, flhd + "_summary.txt")
+        smry = run_chreval(flnm, options)
+        if smry == None:
+            n_fail += 1
+            continue
+        #
+
+        if args.update:
+            if not os.path.isdir(ref_dir):
+                os.makedirs(ref_dir)
+            #
+
+            with open(flref, 'w') as fp:
+                fp.write('\n'.join(smry) + '\n')
+            #
+
+            print ("%-40s reference written" % flhd)
+            continue
+        #
+
+        if not os.path.isfile(flref):
+            print ("%-40s no reference (%s)" % (flhd, flref))
+            n_fail += 1
+            continue
+        #
+
+        ref = open(flref).read().splitlines()
+        if smry == ref:
+            print ("%-40s ok" % flhd)
+            continue
+        #
+
+        n_fail += 1
+        print ("%-40s DIFFERS" % flhd)
+        for k in range(0, max(len(ref), len(smry))):
+            r = ref[k]  if k < len(ref)  else "(missing)"
+            s = smry[k] if k < len(smry) else "(missing)"
+            if not r == s:
+                print ("   line %d:" % (k+1))
+                print ("   reference: %s" % r)
+                print ("   result:    %s" % s)
+                break
+            #
+
+        #|endfor
+
+    #|endfor
+
+    if n_fail > 0:
+        print ("%d heatmap(s) failed" % n_fail)
+        sys.exit(1)
+    #
+
+#
+
+
+# Main
+if __name__ == '__main__':
+    check_regression(sys.argv)
+#
@@ -52,7 +52,7 @@ from Cluster   import ClustData
 # #####################################
 # vvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvv
 SHOWMAIN = False # for debugging main()
-EXT = ["clust","heat", "eheat", "cpif", "csv"] # extension for the input file
+EXT = ["clust","heat", "eheat", "bheat", "cpif", "csv"] # extension for the input file
 PROGRAM = "make_heatmap.py" # name of the program
 # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 